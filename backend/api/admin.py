@@ -1,6 +1,14 @@
+from datetime import date, timedelta
+from django.conf import settings
 from django.contrib import admin
+from django.http import HttpResponseBadRequest
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils import timezone
 from django.utils.safestring import mark_safe
-from .models import Category, Product, CakeOption, Order, OrderItem, SiteContent, UIAsset, SiteFeature, SiteGalleryImage
+from .models import Category, Product, CakeOption, DailyStock, Order, OrderItem, PickupSlot, ProductionLine, DailySales, Job, SiteContent, UIAsset, SiteFeature, SiteGalleryImage
+from . import analytics, exports, images, production, scheduling
+from .pagination import EstimatedCountPaginator
 
 admin.site.site_header = "Natalie Bakery Administration"
 admin.site.site_title = "Natalie Bakery Admin Portal"
@@ -16,6 +24,11 @@ class ProductAdmin(admin.ModelAdmin):
     list_display = ('image_preview', 'name', 'category', 'price', 'is_custom_cake', 'is_featured')
     list_display_links = ('image_preview', 'name')
     list_filter = ('category', 'is_custom_cake', 'is_featured')
+    list_select_related = ('category',)
+    date_hierarchy = 'created_at'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ('name', 'square_id')
     filter_horizontal = ('available_options',)
@@ -23,7 +36,7 @@ class ProductAdmin(admin.ModelAdmin):
     
     fieldsets = (
         (None, {
-            'fields': ('category', 'name', 'slug', 'description', 'price', 'unit', 'image', 'image_preview_large', 'square_id', 'created_at')
+            'fields': ('category', 'name', 'slug', 'description', 'price', 'unit', 'daily_batch', 'image', 'image_preview_large', 'square_id', 'created_at')
         }),
         ('Customization', {
             'fields': ('is_custom_cake', 'available_options'),
@@ -35,15 +48,20 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
 
+    # Previews load the smallest derivative that still covers 2x their display width.
+    # The changelist never falls back to the full-size original
     def image_preview(self, obj):
-        if obj.image:
-            return mark_safe(f'<img src="{obj.image.url}" width="50" height="50" style="object-fit: cover; border-radius: 4px;" />')
-        return "No Image"
+        if not obj.image:
+            return "No Image"
+        url = images.smallest_url(obj, "image", 100, original=False)
+        if url is None:
+            return "No thumbnail"
+        return mark_safe(f'<img src="{url}" width="50" height="50" loading="lazy" style="object-fit: cover; border-radius: 4px;" />')
     image_preview.short_description = 'Preview'
 
     def image_preview_large(self, obj):
         if obj.image:
-            return mark_safe(f'<img src="{obj.image.url}" width="200" style="border-radius: 8px;" />')
+            return mark_safe(f'<img src="{images.smallest_url(obj, "image", 400)}" width="200" style="border-radius: 8px;" />')
         return "No Image Preview available"
     image_preview_large.short_description = 'Image Preview'
 
@@ -55,12 +73,147 @@ class CakeOptionAdmin(admin.ModelAdmin):
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
+    # A search box instead of a <select> of the whole catalog on every row
+    autocomplete_fields = ('product',)
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'customer_name', 'pickup_datetime', 'status', 'total_price')
-    list_filter = ('status', 'pickup_datetime')
+    list_filter = ('status',)
+    # Drilling down by pickup date and sorting by it both use order_pickup_idx / order_status_pickup_idx
+    date_hierarchy = 'pickup_datetime'
+    ordering = ('-pickup_datetime',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    readonly_fields = ('pickup_slot', 'square_order_id')
     inlines = [OrderItemInline]
+    actions = ['export_csv', 'export_jsonl']
+
+    # Narrow with the status filter and pickup date hierarchy, then "select all" to export every match.
+    # The file is streamed in chunks, so its size does not depend on available memory
+    @admin.action(description="Export selected orders with their lines (CSV)")
+    def export_csv(self, request, queryset):
+        return exports.streaming_response('csv', queryset)
+
+    @admin.action(description="Export selected orders with their lines (JSONL)")
+    def export_jsonl(self, request, queryset):
+        return exports.streaming_response('jsonl', queryset)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Orders entered by staff take a place in their window even if it is full
+        order = form.instance
+        if not change and order.status != 'Cancelled':
+            try:
+                scheduling.reserve(order, scheduling.order_product_class(order), force=True)
+            except scheduling.SlotUnavailable:
+                pass
+
+@admin.register(PickupSlot)
+class PickupSlotAdmin(admin.ModelAdmin):
+    list_display = ('date', 'start', 'product_class', 'booked', 'capacity')
+    list_filter = ('product_class',)
+    list_editable = ('capacity',)
+    date_hierarchy = 'date'
+    readonly_fields = ('booked',)
+
+@admin.register(DailyStock)
+class DailyStockAdmin(admin.ModelAdmin):
+    # Rows appear with a day's first order; raise capacity here to bake more that day
+    list_display = ('date', 'product', 'reserved', 'capacity')
+    list_editable = ('capacity',)
+    list_select_related = ('product',)
+    date_hierarchy = 'date'
+    readonly_fields = ('reserved',)
+
+@admin.register(ProductionLine)
+class ProductionLineAdmin(admin.ModelAdmin):
+    # Maintained by api.production; repair with the rebuild_production_plan command
+    list_display = ('pickup_date', 'product', 'flavor', 'filling', 'size', 'quantity')
+    list_select_related = ('product',)
+    date_hierarchy = 'pickup_date'
+    ordering = ('-pickup_date', 'product__name')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(quantity__gt=0)
+
+    def get_urls(self):
+        return [
+            path('print/', self.admin_site.admin_view(self.print_view), name='api_productionline_print'),
+        ] + super().get_urls()
+
+    def print_view(self, request):
+        try:
+            day = date.fromisoformat(request.GET['date']) if request.GET.get('date') else timezone.localdate()
+        except ValueError:
+            return HttpResponseBadRequest("Provide a date as YYYY-MM-DD.")
+        return TemplateResponse(request, 'admin/api/productionline/print.html', {
+            'bakery': settings.BAKERY_METADATA['NAME'],
+            'day': day,
+            'previous': day - timedelta(days=1),
+            'next': day + timedelta(days=1),
+            'products': production.plan(day),
+        })
+
+@admin.register(DailySales)
+class DailySalesAdmin(admin.ModelAdmin):
+    """The sales dashboard. It reads only the rollup tables, never Order or OrderItem."""
+    DEFAULT_DAYS = 30
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        today = timezone.localdate()
+        try:
+            end = date.fromisoformat(request.GET['to']) if request.GET.get('to') else today
+            start = date.fromisoformat(request.GET['from']) if request.GET.get('from') else end - timedelta(days=self.DEFAULT_DAYS - 1)
+        except ValueError:
+            return HttpResponseBadRequest("Provide dates as YYYY-MM-DD.")
+        by = 'week' if request.GET.get('by') == 'week' else 'day'
+        summary = analytics.summary(start, end, by)
+        return TemplateResponse(request, 'admin/api/dailysales/dashboard.html', {
+            **self.admin_site.each_context(request),
+            'title': "Sales dashboard",
+            'opts': self.model._meta,
+            'start': start,
+            'end': end,
+            'by': by,
+            'summary': summary,
+            'peak': max((row['revenue'] for row in summary['series']), default=0) or 1,
+            'watermark': analytics.get_watermark(),
+        })
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'locked_by', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('idempotency_key',)
+    readonly_fields = ('attempts', 'locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
+    actions = ['retry']
+
+    @admin.action(description="Retry selected jobs now")
+    def retry(self, request, queryset):
+        count = queryset.exclude(status='running').update(
+            status='queued', attempts=0, run_at=timezone.now(), finished_at=None, last_error='',
+        )
+        self.message_user(request, f"{count} jobs queued again.")
 
 class SiteFeatureInline(admin.TabularInline):
     model = SiteFeature
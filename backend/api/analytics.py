@@ -0,0 +1,174 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, Exists, ExpressionWrapper, F, OuterRef, Q, Sum
+from django.db.models.functions import TruncDate, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from . import leases
+from .models import CategoryDailySales, DailySales, Order, OrderItem, ProductDailySales, SyncCursor
+
+WATERMARK = 'analytics:sales'
+LOCK_KEY = 'analytics:refresh:lock'
+LOCK_TIMEOUT = 10 * 60
+# Orders in these statuses are not sales
+SKIPPED_STATUSES = ('Cancelled',)
+ZERO = Decimal('0.00')
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def sales_date(created_at):
+    return timezone.localtime(created_at).date()
+
+
+def get_watermark():
+    value = SyncCursor.objects.filter(name=WATERMARK).values_list('value', flat=True).first()
+    return parse_datetime(value) if value else None
+
+
+def _aggregate(start, end):
+    """Daily, per-product and per-category rows for orders created in [start, end)."""
+    tz = timezone.get_current_timezone()
+    orders = Order.objects.exclude(status__in=SKIPPED_STATUSES).filter(created_at__lt=end)
+    items = OrderItem.objects.exclude(order__status__in=SKIPPED_STATUSES).filter(order__created_at__lt=end)
+    if start:
+        orders = orders.filter(created_at__gte=start)
+        items = items.filter(order__created_at__gte=start)
+
+    cakes = OrderItem.objects.filter(order=OuterRef('pk'), product__is_custom_cake=True)
+    days = {
+        row['day']: DailySales(
+            date=row['day'], orders=row['orders'], revenue=row['revenue'] or ZERO,
+            custom_cake_orders=row['custom_cake_orders'],
+        )
+        for row in orders.annotate(day=TruncDate('created_at', tzinfo=tz), has_cake=Exists(cakes))
+        .values('day')
+        .annotate(orders=Count('id'), revenue=Sum('total_price'), custom_cake_orders=Count('id', filter=Q(has_cake=True)))
+        .order_by()
+    }
+    line_revenue = ExpressionWrapper(F('price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2))
+    products, categories = [], defaultdict(lambda: [0, ZERO])
+    for row in (
+        items.annotate(day=TruncDate('order__created_at', tzinfo=tz))
+        .values('day', 'product_id', 'product__category_id', 'product__is_custom_cake')
+        .annotate(units=Sum('quantity'), revenue=Sum(line_revenue))
+        .order_by()
+    ):
+        day, revenue = row['day'], row['revenue'] or ZERO
+        products.append(ProductDailySales(date=day, product_id=row['product_id'], units=row['units'], revenue=revenue))
+        category = categories[day, row['product__category_id']]
+        category[0] += row['units']
+        category[1] += revenue
+        totals = days.get(day)
+        if totals is not None:
+            totals.units += row['units']
+            if row['product__is_custom_cake']:
+                totals.custom_cake_revenue += revenue
+    return (
+        list(days.values()),
+        products,
+        [CategoryDailySales(date=day, category_id=category_id, units=units, revenue=revenue)
+         for (day, category_id), (units, revenue) in categories.items()],
+    )
+
+
+def rebuild(start=None, end=None):
+    """
+    Replace the rollups of every day from ``start`` up to ``end`` (datetimes,
+    ``start`` on a day boundary; None for the beginning of time) with fresh
+    aggregates of the orders created in that span. Returns the days written.
+    """
+    last = sales_date(end - timedelta(microseconds=1))
+    with transaction.atomic():
+        days, products, categories = _aggregate(start, end)
+        for model in (DailySales, ProductDailySales, CategoryDailySales):
+            rows = model.objects.filter(date__lte=last)
+            if start:
+                rows = rows.filter(date__gte=sales_date(start))
+            rows.delete()
+        DailySales.objects.bulk_create(days, batch_size=1000)
+        ProductDailySales.objects.bulk_create(products, batch_size=1000)
+        CategoryDailySales.objects.bulk_create(categories, batch_size=1000)
+    return len(days)
+
+
+def refresh(full=False):
+    """
+    Bring the rollups up to date. Only the days since the watermark on
+    Order.created_at are aggregated, plus days marked stale by later edits,
+    so each run reads a day or two of orders however long the history is.
+    The watermark trails now by SETTLE_SECONDS so orders whose transaction
+    was still open are picked up by the next run rather than skipped.
+    Returns None if another refresh holds the lock.
+    """
+    if not leases.acquire(LOCK_KEY, LOCK_TIMEOUT):
+        return None
+    try:
+        upper = timezone.now() - timedelta(seconds=settings.ANALYTICS['SETTLE_SECONDS'])
+        watermark = None if full else get_watermark()
+        stale = set() if full else set(DailySales.objects.filter(stale=True).values_list('date', flat=True))
+        start = day_start(sales_date(watermark)) if watermark else None
+        written = rebuild(start, upper)
+        for day in sorted(stale):
+            if start is None or day < sales_date(start):
+                written += rebuild(day_start(day), min(day_start(day + timedelta(days=1)), upper))
+        SyncCursor.objects.update_or_create(name=WATERMARK, defaults={'value': upper.isoformat()})
+        return {'days': written, 'stale': len(stale), 'watermark': upper}
+    finally:
+        leases.release(LOCK_KEY)
+
+
+def mark_stale(order_created_at):
+    """Flag the sales day of an order changed after it was rolled up. Returns whether a refresh is needed."""
+    day = sales_date(order_created_at)
+    watermark = get_watermark()
+    if watermark is None or day >= sales_date(watermark):
+        return False  # the next refresh reads this day anyway
+    DailySales.objects.bulk_create([DailySales(date=day, stale=True)], ignore_conflicts=True)
+    DailySales.objects.filter(date=day).update(stale=True)
+    return True
+
+
+def summary(start, end, by='day'):
+    """
+    Dashboard figures for the ``start``..``end`` dates (inclusive), read
+    from the rollups only: totals, a day or week series, and products and
+    categories ranked by revenue.
+    """
+    days = DailySales.objects.filter(date__gte=start, date__lte=end)
+    sums = {
+        'orders': Sum('orders'), 'revenue': Sum('revenue'), 'units': Sum('units'),
+        'custom_cake_orders': Sum('custom_cake_orders'), 'custom_cake_revenue': Sum('custom_cake_revenue'),
+    }
+    totals = _with_ratios(days.aggregate(**sums))
+    if by == 'week':
+        series = days.annotate(period=TruncWeek('date')).values('period').annotate(**sums).order_by('period')
+    else:
+        series = days.annotate(period=F('date')).values('period', *sums).order_by('period')
+    ranked = {'units': Sum('units'), 'revenue': Sum('revenue')}
+    products = (
+        ProductDailySales.objects.filter(date__gte=start, date__lte=end)
+        .values('product_id', 'product__name').annotate(**ranked).order_by('-revenue')[:20]
+    )
+    categories = (
+        CategoryDailySales.objects.filter(date__gte=start, date__lte=end)
+        .values('category_id', 'category__name').annotate(**ranked).order_by('-revenue')
+    )
+    return {
+        'totals': totals,
+        'series': [_with_ratios(row) for row in series],
+        'products': list(products),
+        'categories': list(categories),
+    }
+
+
+def _with_ratios(row):
+    row = {key: (ZERO if key.endswith('revenue') else 0) if value is None else value for key, value in row.items()}
+    row['average_order_value'] = (row['revenue'] / row['orders']).quantize(ZERO) if row['orders'] else ZERO
+    row['custom_cake_share'] = row['custom_cake_orders'] / row['orders'] if row['orders'] else 0.0
+    return row
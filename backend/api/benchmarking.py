@@ -0,0 +1,156 @@
+import json
+import statistics
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from .models import Product
+
+# Metrics compared against a baseline, and which direction counts as worse
+HIGHER_IS_WORSE = ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request')
+LOWER_IS_WORSE = ('rps',)
+
+
+class Scenario:
+    """One endpoint to drive; ``build(i)`` returns the path and JSON body of the i-th request."""
+
+    def __init__(self, name, method, build):
+        self.name = name
+        self.method = method
+        self.build = build
+
+
+def default_scenarios():
+    slugs = list(Product.objects.order_by('id').values_list('slug', flat=True)[:500])
+    regular = list(Product.objects.filter(is_custom_cake=False).order_by('id').values('id', 'price')[:500])
+    pickup = (timezone.now() + timedelta(days=1)).replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def order(i):
+        product = regular[i % len(regular)]
+        return '/api/orders/', {
+            'customer_name': f"Bench {i}", 'email': "bench@example.com", 'phone': "555-0100",
+            'total_price': str(product['price']), 'pickup_datetime': pickup.isoformat(),
+            'items': [{'product': product['id'], 'quantity': 1, 'price': str(product['price'])}],
+        }
+
+    return [
+        Scenario('product_list', 'GET', lambda i: ('/api/products/', None)),
+        Scenario('product_list_page', 'GET', lambda i: ('/api/products/?limit=20', None)),
+        Scenario('product_detail', 'GET', lambda i: (f'/api/products/{slugs[i % len(slugs)]}/', None)),
+        Scenario('site_content', 'GET', lambda i: ('/api/site-content/', None)),
+        Scenario('order_create', 'POST', order),
+    ]
+
+
+def summarize(latencies, elapsed, queries=None):
+    """Percentiles in milliseconds, throughput and (when measured) queries per request."""
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def run_in_process(scenarios, requests, warmup=5):
+    """Drive each scenario through Django's in-process WSGI test client."""
+    client = Client()
+    results = {}
+    for scenario in scenarios:
+        def send(i):
+            path, body = scenario.build(i)
+            if scenario.method == 'GET':
+                return client.get(path)
+            return client.post(path, json.dumps(body), content_type='application/json')
+
+        for i in range(warmup):
+            send(i)
+
+        latencies, queries = [], []
+        started = time.perf_counter()
+        for i in range(warmup, warmup + requests):
+            with CaptureQueriesContext(connection) as ctx:
+                begin = time.perf_counter()
+                response = send(i)
+                latencies.append(time.perf_counter() - begin)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{scenario.name} returned {response.status_code}: {response.content[:200]!r}")
+            queries.append(len(ctx.captured_queries))
+        results[scenario.name] = summarize(latencies, time.perf_counter() - started, queries)
+    return results
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def run_server(scenarios, requests, concurrency=4, warmup=5):
+    """Drive each scenario over real HTTP against a threaded local server."""
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler, allow_reuse_address=False)
+    server.set_app(WSGIHandler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    results = {}
+    try:
+        for scenario in scenarios:
+            def send(i):
+                path, body = scenario.build(i)
+                data = json.dumps(body).encode() if body is not None else None
+                request = urllib.request.Request(
+                    base_url + path, data=data, method=scenario.method,
+                    headers={'Content-Type': 'application/json'},
+                )
+                begin = time.perf_counter()
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                return time.perf_counter() - begin
+
+            for i in range(warmup):
+                send(i)
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                latencies = list(pool.map(send, range(warmup, warmup + requests)))
+            results[scenario.name] = summarize(latencies, time.perf_counter() - started)
+    finally:
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+def compare(current, baseline, tolerance):
+    """
+    List every metric in ``current`` that is worse than ``baseline`` by more
+    than ``tolerance`` (a fraction, e.g. 0.15). Query counts allow no slack.
+    """
+    regressions = []
+    for mode, scenarios in current.get('results', {}).items():
+        for name, metrics in scenarios.items():
+            before = baseline.get('results', {}).get(mode, {}).get(name)
+            if not before:
+                continue
+            for metric in HIGHER_IS_WORSE:
+                old, new = before.get(metric), metrics.get(metric)
+                if old is None or new is None:
+                    continue
+                slack = 0 if metric == 'queries_per_request' else tolerance
+                if new > old * (1 + slack):
+                    regressions.append(f"{mode}/{name} {metric}: {old} -> {new}")
+            for metric in LOWER_IS_WORSE:
+                old, new = before.get(metric), metrics.get(metric)
+                if old and new is not None and new < old * (1 - tolerance):
+                    regressions.append(f"{mode}/{name} {metric}: {old} -> {new}")
+    return regressions
@@ -0,0 +1,71 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+SITE_CONTENT_CACHE = 'site-content'
+
+# Payloads are looked up under "<name>:<version>:<variant>". Bumping the
+# version orphans every stored variant at once, so invalidation never has
+# to know which keys exist. A small per-process dict sits in front of the
+# shared backend so a warm worker only pays for reading the version number.
+LOCAL_MAX_ENTRIES = 128
+_local = {}
+
+
+def model_token(model):
+    """Version name that changes whenever a row of ``model`` is written or deleted."""
+    return model._meta.label_lower
+
+
+def _version_key(name):
+    return f'{name}:version'
+
+
+def get_version(name):
+    """
+    Versions are nanosecond timestamps of the last change, so they double as
+    Last-Modified values. A missing version is seeded from the clock rather
+    than a counter, so a flushed backend can never hand out a number that is
+    still held in a local tier.
+    """
+    version = cache.get(_version_key(name))
+    if version is None:
+        cache.add(_version_key(name), time.time_ns(), None)
+        version = cache.get(_version_key(name))
+    return version
+
+
+def bump_version(name):
+    previous = cache.get(_version_key(name)) or 0
+    version = max(time.time_ns(), previous + 1)
+    cache.set(_version_key(name), version, None)
+    return version
+
+
+def bump_version_on_commit(name):
+    """
+    Bump ``name`` for a write that may still be uncommitted: now, and again
+    once the transaction commits. A read in between sees the old rows under
+    the first bump's version; the second bump orphans whatever it cached.
+    """
+    bump_version(name)
+    transaction.on_commit(lambda: bump_version(name))
+
+
+def cached_payload(name, variant, build):
+    """Return the payload stored for ``name``/``variant``, calling ``build()`` on a miss."""
+    key = f'{name}:{get_version(name)}:{variant}'
+    payload = _local.get(key)
+    if payload is not None:
+        return payload
+
+    payload = cache.get(key)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, settings.API_CACHE_TIMEOUT)
+
+    if len(_local) >= LOCAL_MAX_ENTRIES:
+        _local.clear()
+    _local[key] = payload
+    return payload
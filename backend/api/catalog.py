@@ -0,0 +1,202 @@
+import gzip
+import json
+import time
+from datetime import timedelta
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.fields import DateTimeField
+from . import images, leases
+from .cache import bump_version, cached_payload, get_version, model_token
+from .models import Category, Product, CakeOption
+
+CATALOG_CACHE = 'catalog'
+
+# The shop snapshot is kept as a host-independent structure of plain dicts
+# under STRUCTURE_KEY, and STATE_KEY records which model versions it reflects.
+# When a version moves, only rows whose updated_at is newer than the last
+# build are re-read. Rendered JSON and gzip bytes are cached per host under
+# the CATALOG_CACHE version, so a warm request is a cache read and a byte copy.
+STRUCTURE_KEY = 'catalog:structure'
+STATE_KEY = 'catalog:state'
+LOCK_KEY = 'catalog:lock'
+LOCK_TIMEOUT = 60
+# Re-read rows changed this long before the last build, so a save whose
+# transaction committed just after that build is not missed
+CHANGE_OVERLAP = timedelta(seconds=60)
+SOURCES = (Category, Product, CakeOption)
+PRODUCT_FIELDS = (
+    'id', 'category_id', 'name', 'slug', 'description', 'price', 'unit', 'image',
+    'image_derivatives', 'is_custom_cake', 'is_featured', 'created_at',
+)
+
+_datetime = DateTimeField()
+
+
+def _versions():
+    return {model_token(model): get_version(model_token(model)) for model in SOURCES}
+
+
+def _category(category):
+    return {'id': category.id, 'name': category.name, 'slug': category.slug}
+
+
+def _option(option):
+    return {
+        'id': option.id, 'option_type': option.option_type, 'name': option.name,
+        'price_modifier': str(option.price_modifier),
+    }
+
+
+def _product(product):
+    # Image URLs stay storage-relative here; render() makes them absolute per host
+    return {
+        'id': product.id,
+        'category': product.category_id,
+        'name': product.name,
+        'slug': product.slug,
+        'description': product.description,
+        'price': str(product.price),
+        'unit': product.unit,
+        'image': product.image.url if product.image else None,
+        'image_srcset': images.srcsets(product, 'image'),
+        'image_placeholder': images.placeholder(product, 'image'),
+        'is_custom_cake': product.is_custom_cake,
+        'is_featured': product.is_featured,
+        'created_at': _datetime.to_representation(product.created_at) if product.created_at else None,
+        'options': [],
+    }
+
+
+def _attach_options(products, links):
+    for entry in products.values():
+        entry['options'] = []
+    for product_id, option_id in links:
+        if product_id in products:
+            products[product_id]['options'].append(option_id)
+
+
+def _option_links():
+    through = Product.available_options.through
+    return through.objects.order_by('cakeoption_id').values_list('product_id', 'cakeoption_id')
+
+
+def build_structure():
+    """Read the whole catalog: one query per table plus one for the option links."""
+    structure = {
+        'categories': {c.id: _category(c) for c in Category.objects.all()},
+        'options': {o.id: _option(o) for o in CakeOption.objects.all()},
+        'products': {p.id: _product(p) for p in Product.objects.only(*PRODUCT_FIELDS)},
+    }
+    _attach_options(structure['products'], _option_links())
+    return structure
+
+
+def update_structure(structure, since):
+    """
+    Re-read only rows changed after ``since`` and drop rows that no longer
+    exist. Every row is in the structure, so a table whose count differs from
+    its entries lost (or gained unseen) rows; only then are its ids read.
+    Option links are re-read for changed products only: link edits stamp
+    their products' updated_at (signals.bump_product_options).
+    """
+    changed = []
+    for model, key, build, queryset in (
+        (Category, 'categories', _category, Category.objects.all()),
+        (CakeOption, 'options', _option, CakeOption.objects.all()),
+        (Product, 'products', _product, Product.objects.only(*PRODUCT_FIELDS)),
+    ):
+        entries = structure[key]
+        rows = list(queryset.filter(updated_at__gte=since))
+        if model.objects.count() != len(entries.keys() | {row.id for row in rows}):
+            existing = set(model.objects.values_list('id', flat=True))
+            for gone in entries.keys() - existing:
+                del entries[gone]
+            rows += queryset.filter(id__in=existing - entries.keys()).exclude(updated_at__gte=since)
+        for row in rows:
+            entries[row.id] = build(row)
+        if model is Product:
+            changed = [row.id for row in rows]
+    products, options = structure['products'], structure['options']
+    _attach_options({product_id: products[product_id] for product_id in changed}, _option_links().filter(product_id__in=changed))
+    # A deleted option takes its link rows with it, without touching the products
+    for entry in products.values():
+        if any(option_id not in options for option_id in entry['options']):
+            entry['options'] = [option_id for option_id in entry['options'] if option_id in options]
+    return structure
+
+
+def refresh():
+    """
+    Bring the stored structure up to date if any source model changed.
+    Only one process rebuilds at a time; others keep serving the previous
+    snapshot until it lands. Returns True when the snapshot is current.
+    """
+    versions = _versions()
+    state = cache.get(STATE_KEY)
+    if state and state['versions'] == versions:
+        return True
+    if not leases.acquire(LOCK_KEY, LOCK_TIMEOUT):
+        return False
+    try:
+        started = timezone.now()
+        structure = cache.get(STRUCTURE_KEY) if state else None
+        if structure is None:
+            structure = build_structure()
+        else:
+            structure = update_structure(structure, state['built_at'] - CHANGE_OVERLAP)
+        cache.set(STRUCTURE_KEY, structure, None)
+        cache.set(STATE_KEY, {'versions': versions, 'built_at': started}, None)
+        bump_version(CATALOG_CACHE)
+    finally:
+        leases.release(LOCK_KEY)
+    return True
+
+
+def render(structure, build_absolute_uri):
+    """The public document: categories with their products newest first, options as one lookup table."""
+    def absolute(url):
+        return build_absolute_uri(url) if url else url
+
+    grouped = {category_id: [] for category_id in structure['categories']}
+    for entry in structure['products'].values():
+        product = dict(entry)
+        product['image'] = absolute(product['image'])
+        if product['image_srcset']:
+            product['image_srcset'] = {
+                fmt: ', '.join(
+                    f'{absolute(url)} {width}' for url, width in (part.rsplit(' ', 1) for part in srcset.split(', '))
+                )
+                for fmt, srcset in product['image_srcset'].items()
+            }
+        grouped.setdefault(product.pop('category'), []).append(product)
+
+    categories = []
+    for category in sorted(structure['categories'].values(), key=lambda c: (c['name'], c['id'])):
+        products = sorted(grouped.get(category['id'], []), key=lambda p: (p['created_at'] or '', p['id']), reverse=True)
+        categories.append(dict(category, products=products))
+    return {
+        'categories': categories,
+        'options': {str(option_id): option for option_id, option in sorted(structure['options'].items())},
+    }
+
+
+def snapshot(build_absolute_uri):
+    """``{'json': bytes, 'gzip': bytes}`` for the requesting host, rendered once per catalog version."""
+    def build():
+        structure = cache.get(STRUCTURE_KEY)
+        if structure is None:
+            # Evicted between refresh() and here: rebuild synchronously
+            cache.delete(STATE_KEY)
+            refresh()
+            structure = cache.get(STRUCTURE_KEY) or build_structure()
+        body = json.dumps(render(structure, build_absolute_uri), separators=(',', ':')).encode()
+        return {'json': body, 'gzip': gzip.compress(body, mtime=0)}
+
+    return cached_payload(CATALOG_CACHE, build_absolute_uri('/'), build)
+
+
+def wait_for_refresh(timeout=5.0):
+    """Block until a snapshot exists, for the very first request when another process holds the lock."""
+    deadline = time.monotonic() + timeout
+    while not refresh() and cache.get(STATE_KEY) is None and time.monotonic() < deadline:
+        time.sleep(0.05)
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+
+
+@register(deploy=True)
+def shared_cache(app_configs, **kwargs):
+    """Cache versions must reach every process; an in-process cache keeps each one's writes to itself."""
+    if settings.CACHES['default']['BACKEND'] not in LOCAL_CACHES:
+        return []
+    return [Warning(
+        "The default cache is in-process, so ETags, cached payloads and the catalog snapshot "
+        "go stale when another process (web worker, run_worker, import_catalog, square_sync) writes.",
+        hint="Set REDIS_URL, or CACHE_DIR on a single host.",
+        id='api.W001',
+    )]
@@ -0,0 +1,50 @@
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from .cache import get_version, model_token
+
+
+class ConditionalGetMixin:
+    """
+    Adds ETag and Last-Modified to GET responses and answers matching
+    If-None-Match / If-Modified-Since requests with 304 before any ORM or
+    serializer work. The validators come from the signal-maintained versions
+    of every model listed in ``change_tokens`` (see ``api.signals``).
+    """
+    change_tokens = ()
+
+    def get_token_names(self):
+        return [t if isinstance(t, str) else model_token(t) for t in self.change_tokens]
+
+    def get_variant(self, request):
+        """Anything besides the URL, Accept and model versions that changes the body."""
+        return []
+
+    def get_validators(self, request):
+        versions = [get_version(name) for name in self.get_token_names()]
+        # Query string, host and Accept all change the rendered body
+        variant = '|'.join([
+            request.build_absolute_uri(),
+            request.META.get('HTTP_ACCEPT', ''),
+            *map(str, versions),
+            *self.get_variant(request),
+        ])
+        etag = '"%s"' % hashlib.sha1(variant.encode()).hexdigest()
+        last_modified = max(versions) // 1_000_000_000
+        return etag, last_modified
+
+    def conditional_response(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response.headers['ETag'] = etag
+            response.headers['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,120 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .models import Order, OrderItem
+
+# Orders are read in chunks: with a chunk_size, iterator() uses a server-side
+# cursor on Postgres and prefetches each chunk's items in one extra query, so
+# only CHUNK_SIZE orders and their lines are ever held in memory.
+CHUNK_SIZE = 500
+
+ORDER_COLUMNS = (
+    'order_id', 'created_at', 'pickup_datetime', 'status', 'customer_name', 'email', 'phone', 'total_price',
+)
+ITEM_COLUMNS = ('product_id', 'product_name', 'quantity', 'flavor', 'filling', 'size', 'price')
+# Free text typed by customers or staff; a spreadsheet would run a cell starting with one of
+# FORMULA_PREFIXES as a formula, so the CSV writes those with a leading quote
+TEXT_COLUMNS = frozenset(('customer_name', 'email', 'phone', 'product_name', 'flavor', 'filling', 'size'))
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+
+def filter_orders(queryset, start=None, end=None, statuses=None):
+    """Orders picked up between the ``start`` and ``end`` dates (both inclusive, local time) in ``statuses``."""
+    # Bounds are compared as datetimes so the pickup_datetime indexes stay usable
+    if start:
+        queryset = queryset.filter(pickup_datetime__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end:
+        queryset = queryset.filter(pickup_datetime__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    return queryset
+
+
+def iter_orders(queryset=None, chunk_size=CHUNK_SIZE):
+    items = OrderItem.objects.select_related('product').only(
+        'order_id', 'product_id', 'product__name', *ITEM_COLUMNS[2:],
+    ).order_by('id')
+    queryset = Order.objects.all() if queryset is None else queryset
+    queryset = queryset.select_related(None).prefetch_related(None).prefetch_related(Prefetch('items', queryset=items))
+    return queryset.order_by('pickup_datetime', 'id').iterator(chunk_size=chunk_size)
+
+
+def _order(order):
+    return {
+        'order_id': order.id,
+        'created_at': timezone.localtime(order.created_at).isoformat(),
+        'pickup_datetime': timezone.localtime(order.pickup_datetime).isoformat(),
+        'status': order.status,
+        'customer_name': order.customer_name,
+        'email': order.email,
+        'phone': order.phone,
+        'total_price': str(order.total_price),
+    }
+
+
+def _item(item):
+    return {
+        'product_id': item.product_id,
+        'product_name': item.product.name,
+        'quantity': item.quantity,
+        'flavor': item.flavor,
+        'filling': item.filling,
+        'size': item.size,
+        'price': str(item.price),
+    }
+
+
+def _cells(values):
+    cells = []
+    for column, value in values.items():
+        if value is None:
+            value = ''
+        elif column in TEXT_COLUMNS and value.startswith(FORMULA_PREFIXES):
+            value = "'" + value
+        cells.append(value)
+    return cells
+
+
+class _Echo:
+    """File-like object for csv.writer that hands each row back instead of buffering it."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(orders):
+    """One row per order line, order columns repeated; an order without lines gets one row."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ORDER_COLUMNS + ITEM_COLUMNS)
+    empty = [''] * len(ITEM_COLUMNS)
+    for order in orders:
+        head = _cells(_order(order))
+        lines = order.items.all()
+        if not lines:
+            yield writer.writerow(head + empty)
+        for item in lines:
+            yield writer.writerow(head + _cells(_item(item)))
+
+
+def jsonl_lines(orders):
+    """One JSON object per order with its lines nested under ``items``."""
+    for order in orders:
+        yield json.dumps(dict(_order(order), items=[_item(item) for item in order.items.all()])) + '\n'
+
+
+def export_lines(fmt, queryset=None, chunk_size=CHUNK_SIZE):
+    lines = csv_lines if fmt == 'csv' else jsonl_lines
+    return lines(iter_orders(queryset, chunk_size))
+
+
+def streaming_response(fmt, queryset=None, chunk_size=CHUNK_SIZE):
+    content_type, extension = FORMATS[fmt]
+    response = StreamingHttpResponse(export_lines(fmt, queryset, chunk_size), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="orders-{timezone.localdate():%Y%m%d}.{extension}"'
+    return response
@@ -0,0 +1,114 @@
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+class FieldSelection:
+    """The top-level keys a client asked for with ``?fields=a,b`` and/or ``?omit=c``."""
+
+    def __init__(self, fields=None, omit=()):
+        self.fields = set(fields) if fields is not None else None
+        self.omit = set(omit)
+
+    def __contains__(self, name):
+        return (self.fields is None or name in self.fields) and name not in self.omit
+
+    def filter(self, names):
+        return [name for name in names if name in self]
+
+    @property
+    def key(self):
+        """Stable text form, for cache keys."""
+        fields = ','.join(sorted(self.fields)) if self.fields is not None else '*'
+        return f"{fields};{','.join(sorted(self.omit))}"
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+class SparseFieldsMixin:
+    """
+    Serializer side: fields the request did not select are dropped when the
+    serializer is built, so their sources are never read. Only the top-level
+    serializer sees ``field_selection``; declared nested serializers are
+    re-created without a context and stay whole.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.field_selection = self.context.get('field_selection')
+        if self.field_selection is not None:
+            for name in list(self.fields):
+                if name not in self.field_selection:
+                    self.fields.pop(name)
+
+    @classmethod
+    def sparse_field_names(cls):
+        """Every top-level key the serializer can emit, including computed extras."""
+        if '_sparse_field_names' not in cls.__dict__:
+            extra = getattr(cls, 'extra_field_names', lambda: ())()
+            cls._sparse_field_names = [*cls().fields, *extra]
+        return cls._sparse_field_names
+
+
+class SparseFieldsetMixin:
+    """
+    View side: parses ``?fields=`` / ``?omit=`` on reads, rejects unknown
+    names with a 400, hands the selection to the serializer and prunes the
+    queryset to ``.only()`` the selected columns plus the joins and
+    prefetches those fields need.
+
+    ``sparse_sources`` maps fields that are not plain model columns to what
+    they read: ``only`` paths, ``select_related`` and ``prefetch`` lookups.
+    """
+    sparse_sources = {}
+    sparse_always = ('id',)
+
+    def get_field_selection(self):
+        if hasattr(self, '_field_selection'):
+            return self._field_selection
+        params = self.request.query_params
+        selection = None
+        if self.request.method in ('GET', 'HEAD') and (FIELDS_PARAM in params or OMIT_PARAM in params):
+            fields = _split(params[FIELDS_PARAM]) if FIELDS_PARAM in params else None
+            omit = _split(params.get(OMIT_PARAM, ''))
+            known = set(self.get_serializer_class().sparse_field_names())
+            unknown = sorted(set(fields or ()) - known) + sorted(set(omit) - known)
+            if unknown:
+                raise serializers.ValidationError({FIELDS_PARAM: [f"Unknown field: {name}" for name in unknown]})
+            selection = FieldSelection(fields, omit)
+        self._field_selection = selection
+        return selection
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['field_selection'] = self.get_field_selection()
+        return context
+
+    def prune_queryset(self, queryset, selection):
+        only, related, prefetch = set(self.sparse_always), [], []
+        for name in selection.filter(self.get_serializer_class().sparse_field_names()):
+            source = self.sparse_sources.get(name, {'only': (name,)})
+            only.update(source.get('only', ()))
+            related.extend(source.get('select_related', ()))
+            prefetch.extend(source.get('prefetch', ()))
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset.only(*only)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        selection = self.get_field_selection()
+        return self.prune_queryset(queryset, selection) if selection is not None else queryset
+
+
+def image_sources(fields):
+    """``sparse_sources`` entries for the srcset/placeholder keys ResponsiveImagesMixin adds."""
+    return {
+        f'{field}_{suffix}': {'only': (field, 'image_derivatives')}
+        for field in fields for suffix in ('srcset', 'placeholder')
+    }
@@ -0,0 +1,131 @@
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = IdempotencyKey._meta.get_field('key').max_length
+
+
+class Superseded(Exception):
+    """A retry took the claim over while this request was still running."""
+
+
+def fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder).encode()).hexdigest()
+
+
+def claim(key, request_hash):
+    """
+    Take ``key`` for a new request. Returns ``(record, claimed)``; when
+    ``claimed`` is False the record belongs to an earlier request. The unique
+    index decides between concurrent duplicates: exactly one insert wins and
+    the others read its row. Expired or abandoned rows are taken over with a
+    conditional UPDATE on created_at, so only one of several racing retries
+    gets them.
+    """
+    now = timezone.now()
+    record, created = IdempotencyKey.objects.get_or_create(
+        key=key, defaults={'request_hash': request_hash, 'created_at': now},
+    )
+    if created:
+        return record, True
+    config = settings.IDEMPOTENCY
+    expired = record.created_at < now - timedelta(seconds=config['TTL_SECONDS'])
+    abandoned = record.status_code is None and record.created_at < now - timedelta(seconds=config['LOCK_SECONDS'])
+    if (expired or abandoned) and IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at).update(
+        request_hash=request_hash, status_code=None, response=None, created_at=now,
+    ):
+        record.created_at = now
+        return record, True
+    return record, False
+
+
+def _held(record):
+    # Still our claim: not answered, and not taken over since (a takeover moves created_at)
+    return IdempotencyKey.objects.filter(pk=record.pk, created_at=record.created_at, status_code__isnull=True)
+
+
+def store(record, response):
+    """Record ``response`` for replay. Returns False if the claim was taken over meanwhile."""
+    return bool(_held(record).update(status_code=response.status_code, response=response.data))
+
+
+def release(record):
+    # The request failed on our side; a retry should run it again
+    _held(record).delete()
+
+
+def replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return Response(
+            {'detail': f"This {HEADER} was already used for a different order."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.status_code is None:
+        return Response(
+            {'detail': "This order is still being placed. Try again in a moment."},
+            status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'},
+        )
+    return Response(record.response, status=record.status_code, headers={REPLAYED_HEADER: 'true'})
+
+
+def prune():
+    """Delete keys past their TTL. Returns the number removed."""
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY['TTL_SECONDS'])
+    return IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()[0]
+
+
+class IdempotentCreateMixin:
+    """
+    Makes ``create`` safe to retry. A request carrying an Idempotency-Key
+    header runs once; its response (success or validation error) is stored
+    and handed back, unvalidated and without writes, to any retry with the
+    same key and body until TTL_SECONDS pass. A duplicate arriving while the
+    first is still running gets 409, and reusing a key for a different body
+    gets 422. Server errors release the key so the retry runs again.
+
+    A successful response is stored in the order's own transaction: an order
+    never commits without it, so a committed order's key is never mistaken
+    for abandoned, and a request whose claim was taken over (it outlived
+    LOCK_SECONDS) rolls its order back instead of committing a second one.
+    """
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return super().create(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters."}, status=status.HTTP_400_BAD_REQUEST,
+            )
+        request_hash = fingerprint(request.data)
+        record, claimed = claim(key, request_hash)
+        if not claimed:
+            return replay(record, request_hash)
+        try:
+            with transaction.atomic():
+                response = super().create(request, *args, **kwargs)
+                if not store(record, response):
+                    raise Superseded
+        except Superseded:
+            # Released again by the newer request leaves our unanswered claim, which replays as a 409
+            return replay(IdempotencyKey.objects.filter(pk=record.pk).first() or record, request_hash)
+        except Exception as exc:
+            # Render validation errors here, as dispatch would, so they are stored too
+            try:
+                response = self.handle_exception(exc)
+            except Exception:
+                release(record)
+                raise
+            if response.status_code >= 500:
+                release(record)
+            else:
+                store(record, response)
+        return response
@@ -0,0 +1,254 @@
+import base64
+import hashlib
+import io
+import logging
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageFilter, ImageOps, features
+from .models import Product, SiteContent, SiteGalleryImage, UIAsset
+
+logger = logging.getLogger(__name__)
+
+# Image fields that get responsive derivatives, per model
+IMAGE_FIELDS = {
+    Product: ('image',),
+    SiteContent: ('hero_main_image', 'about_side_image', 'about_side_image_2'),
+    SiteGalleryImage: ('image',),
+    UIAsset: ('image',),
+}
+
+# Pillow format name and MIME type of each derivative format
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'avif': ('AVIF', 'image/avif'),
+}
+
+
+def enabled_formats():
+    # AVIF needs a Pillow build with libavif, so it is skipped where that is missing
+    return [fmt for fmt in settings.IMAGE_DERIVATIVES['FORMATS'] if fmt != 'avif' or features.check('avif')]
+
+
+def derivative_name(name, width, fmt):
+    """``products/cake.png`` -> ``products/cake.640w.webp``, stored next to the original."""
+    return f'{os.path.splitext(name)[0]}.{width}w.{fmt}'
+
+
+def target_widths(original_width):
+    """Breakpoints narrower than the original; a small original gets one copy at its own width."""
+    widths = [w for w in settings.IMAGE_DERIVATIVES['WIDTHS'] if w < original_width]
+    return widths or [original_width]
+
+
+def blur_placeholder(image):
+    """A blurred ``data:`` URI of a few hundred bytes that pages can inline while the image loads."""
+    size = settings.IMAGE_DERIVATIVES['PLACEHOLDER_WIDTH']
+    thumb = image.convert('RGB')
+    thumb.thumbnail((size, size))
+    buffer = io.BytesIO()
+    thumb.filter(ImageFilter.GaussianBlur(1)).save(buffer, 'JPEG', quality=50)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+
+def render_derivatives(data, formats=None):
+    """
+    Decode ``data`` once and encode every width and format. Returns
+    ``(original_width, [(width, fmt, bytes), ...], placeholder)``. Output
+    carries no EXIF, ICC or XMP metadata because none is passed to the encoders.
+    """
+    formats = formats or enabled_formats()
+    quality = settings.IMAGE_DERIVATIVES['QUALITY']
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    rendered = []
+    for width in target_widths(image.width):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for fmt in formats:
+            frame = resized
+            if fmt == 'jpeg' and has_alpha:
+                # JPEG has no alpha channel, so flatten onto white
+                frame = Image.new('RGB', resized.size, 'white')
+                frame.paste(resized, mask=resized.getchannel('A'))
+            buffer = io.BytesIO()
+            frame.save(buffer, FORMATS[fmt][0], quality=quality, optimize=fmt == 'jpeg', progressive=fmt == 'jpeg')
+            rendered.append((width, fmt, buffer.getvalue()))
+    return image.width, rendered, blur_placeholder(image)
+
+
+def store_derivatives(storage, source, rendered):
+    for width, fmt, payload in rendered:
+        name = derivative_name(source, width, fmt)
+        if storage.exists(name):
+            storage.delete(name)
+        storage.save(name, ContentFile(payload))
+
+
+def delete_derivatives(storage, entry):
+    for fmt in entry.get('formats', []):
+        for width in entry.get('widths', []):
+            name = derivative_name(entry['source'], width, fmt)
+            if storage.exists(name):
+                storage.delete(name)
+
+
+def build_entry(storage, name, previous_hash=None):
+    """
+    Render, store and describe the derivatives of one image. Returns None,
+    without decoding anything, when the file's SHA-256 equals ``previous_hash``.
+    """
+    with storage.open(name, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    if digest == previous_hash:
+        return None
+    original_width, rendered, placeholder = render_derivatives(data)
+    store_derivatives(storage, name, rendered)
+    return {
+        'source': name,
+        'hash': digest,
+        'width': original_width,
+        'widths': sorted({width for width, _, _ in rendered}),
+        'formats': list(dict.fromkeys(fmt for _, fmt, _ in rendered)),
+        'placeholder': placeholder,
+    }
+
+
+def stamp_fields(model):
+    """
+    The fields a derivatives write touches. update() and bulk_update() skip
+    auto_now, so updated_at is set by hand; the catalog's delta refresh only
+    re-reads rows whose updated_at moved.
+    """
+    fields = ['image_derivatives']
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        fields.append('updated_at')
+    return fields
+
+
+def refresh(instance, force=False):
+    """
+    Bring ``instance.image_derivatives`` in line with its image fields:
+    render new uploads, drop entries (and files) for replaced or cleared
+    images. Returns the names of the fields that were re-rendered.
+    """
+    manifest = dict(instance.image_derivatives or {})
+    changed, rendered = False, []
+    for field_name in IMAGE_FIELDS[type(instance)]:
+        field_file = getattr(instance, field_name)
+        entry = manifest.get(field_name)
+        if entry and not force and field_file and entry.get('source') == field_file.name:
+            continue
+        if entry:
+            delete_derivatives(field_file.storage, entry)
+            del manifest[field_name]
+            changed = True
+        if not field_file:
+            continue
+        if not field_file.storage.exists(field_file.name):
+            logger.warning("Image file %s is missing; skipping derivatives", field_file.name)
+            continue
+        try:
+            manifest[field_name] = build_entry(field_file.storage, field_file.name)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.exception("Could not render derivatives for %s.%s (pk=%s)", type(instance).__name__, field_name, instance.pk)
+            continue
+        changed = True
+        rendered.append(field_name)
+    if changed:
+        instance.image_derivatives = manifest
+        # update() rather than save() so the post_save that triggered this does not fire again
+        values = {'image_derivatives': manifest, 'updated_at': timezone.now()}
+        type(instance).objects.filter(pk=instance.pk).update(**{field: values[field] for field in stamp_fields(type(instance))})
+    return rendered
+
+
+def pending_images(models=None, force=False, chunk_size=500):
+    """
+    Yield ``(model, pk, field_name, name, previous_hash)`` for every stored
+    image. ``previous_hash`` is the hash its current derivatives were rendered
+    from (None when there are none, or with ``force``). Pages by primary key
+    so the caller can write results while iterating.
+    """
+    for model, fields in IMAGE_FIELDS.items():
+        if models and model not in models:
+            continue
+        last_pk = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_pk).order_by('pk').values('pk', 'image_derivatives', *fields)[:chunk_size]
+            )
+            if not rows:
+                break
+            for row in rows:
+                for field_name in fields:
+                    name = row[field_name]
+                    if not name:
+                        continue
+                    entry = (row['image_derivatives'] or {}).get(field_name) or {}
+                    previous_hash = None if force or entry.get('source') != name else entry.get('hash')
+                    yield model, row['pk'], field_name, name, previous_hash
+            last_pk = rows[-1]['pk']
+
+
+def render_task(name, previous_hash=None):
+    """
+    Process-pool entry point: render one file from default storage (every
+    image field here uses it). Returns ``(entry, error)``; both are None when
+    the file is unchanged.
+    """
+    try:
+        return build_entry(default_storage, name, previous_hash), None
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        return None, f'{type(e).__name__}: {e}'
+
+
+def srcsets(instance, field_name, build_url=None):
+    """``{'webp': 'url 320w, url 640w', 'jpeg': ...}`` for a field, or None until derivatives exist."""
+    field_file = getattr(instance, field_name)
+    entry = (instance.image_derivatives or {}).get(field_name)
+    return srcsets_for(field_file.storage, field_file.name, entry, build_url)
+
+
+def srcsets_for(storage, name, entry, build_url=None):
+    """srcsets() for a bare file name and manifest entry, as read by ``.values()``."""
+    if not name or not entry or entry.get('source') != name:
+        return None
+    build_url = build_url or (lambda url: url)
+    return {
+        fmt: ', '.join(
+            f'{build_url(storage.url(derivative_name(name, width, fmt)))} {width}w' for width in entry['widths']
+        )
+        for fmt in entry['formats']
+    }
+
+
+def placeholder(instance, field_name):
+    field_file = getattr(instance, field_name)
+    entry = (instance.image_derivatives or {}).get(field_name)
+    if not field_file or not entry or entry.get('source') != field_file.name:
+        return None
+    return entry.get('placeholder')
+
+
+def smallest_url(instance, field_name, min_width, fmt='webp', original=True):
+    """
+    URL of the narrowest derivative at least ``min_width`` wide, falling back
+    to the original unless ``original`` is False, in which case it is None.
+    """
+    field_file = getattr(instance, field_name)
+    if not field_file:
+        return None
+    entry = (instance.image_derivatives or {}).get(field_name)
+    if not entry or entry.get('source') != field_file.name or fmt not in entry['formats']:
+        return field_file.url if original else None
+    width = next((w for w in entry['widths'] if w >= min_width), entry['widths'][-1])
+    return field_file.storage.url(derivative_name(entry['source'], width, fmt))
@@ -0,0 +1,242 @@
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from .cache import bump_version_on_commit, model_token
+from .models import Category, Product, CakeOption
+from . import catalog
+
+CENT = Decimal('0.01')
+BATCH_SIZE = 500
+
+# Product columns an import row sets; everything else (images, created_at) is left alone
+FIELDS = ('name', 'slug', 'category_id', 'description', 'price', 'unit', 'is_custom_cake', 'is_featured', 'square_id')
+UNITS = {unit for unit, _ in Product.UNIT_CHOICES}
+TRUE = {'1', 'true', 'yes', 'y', 't'}
+FALSE = {'0', 'false', 'no', 'n', 'f', ''}
+
+
+class CatalogImportError(Exception):
+    """Raised with every invalid row at once, before anything is written."""
+
+    def __init__(self, errors):
+        super().__init__('\n'.join(errors))
+        self.errors = errors
+
+
+def read_rows(stream, fmt):
+    """
+    CSV rows, or a JSON list of objects (optionally under ``"products"``).
+    In CSV, ``options`` is a ``|``-separated list of ``TYPE:Name`` references.
+    """
+    if fmt == 'json':
+        data = json.load(stream)
+        return data['products'] if isinstance(data, dict) else data
+    rows = []
+    for row in csv.DictReader(stream):
+        if row.get('options') is not None:
+            row['options'] = [ref for ref in row['options'].split('|') if ref.strip()]
+        rows.append(row)
+    return rows
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else '').strip().lower()
+    if text in TRUE:
+        return True
+    if text in FALSE:
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+def _option_key(ref):
+    option_type, _, name = str(ref).partition(':')
+    return option_type.strip().upper(), name.strip()
+
+
+def clean_row(raw):
+    """Normalise one input row. ``options`` stays None when the row does not mention them."""
+    name = str(raw.get('name') or '').strip()
+    if not name:
+        raise ValueError("name is required")
+    category = str(raw.get('category') or '').strip()
+    if not category:
+        raise ValueError("category is required")
+    try:
+        price = Decimal(str(raw.get('price'))).quantize(CENT)
+    except InvalidOperation:
+        raise ValueError(f"invalid price: {raw.get('price')!r}")
+    unit = str(raw.get('unit') or 'ea').strip()
+    if unit not in UNITS:
+        raise ValueError(f"unknown unit: {unit!r}")
+    options = raw.get('options')
+    return {
+        'name': name,
+        'slug': str(raw.get('slug') or '').strip() or slugify(name),
+        'category': category,
+        'description': str(raw.get('description') or ''),
+        'price': price,
+        'unit': unit,
+        'is_custom_cake': _bool(raw.get('is_custom_cake')),
+        'is_featured': _bool(raw.get('is_featured')),
+        'square_id': str(raw.get('square_id') or '').strip() or None,
+        'options': None if options is None else [_option_key(ref) for ref in options],
+    }
+
+
+def _resolve_categories(rows, dry_run):
+    """
+    Map each row's category name to an id, creating missing categories in one
+    insert. A dry run gives each missing category a negative stand-in id
+    instead, shared by every row naming it, so the plan compares as the real
+    import would.
+    """
+    ids = dict(Category.objects.values_list('slug', 'id'))
+    names = {slugify(row['category']): row['category'] for row in rows}
+    missing = [Category(name=name, slug=slug) for slug, name in names.items() if slug not in ids]
+    if missing and dry_run:
+        ids.update((category.slug, -number) for number, category in enumerate(missing, start=1))
+    elif missing:
+        Category.objects.bulk_create(missing, batch_size=BATCH_SIZE)
+        ids = dict(Category.objects.values_list('slug', 'id'))
+    for row in rows:
+        row['category_id'] = ids.get(slugify(row['category']))
+    return len(missing)
+
+
+def _plan(rows, errors):
+    """Split rows into new and changed products by square_id, then slug; drop unchanged ones."""
+    existing = {row['id']: row for row in Product.objects.values('id', *FIELDS)}
+    by_slug = {row['slug']: pk for pk, row in existing.items()}
+    by_square = {row['square_id']: pk for pk, row in existing.items() if row['square_id']}
+    created, updated, unchanged = [], [], []
+    for number, row in rows:
+        pk = by_square.get(row['square_id']) or by_slug.get(row['slug'])
+        if pk is None:
+            created.append(row)
+            continue
+        holder = by_slug.get(row['slug'])
+        if holder is not None and holder != pk:
+            errors.append(f"row {number}: slug {row['slug']!r} belongs to another product")
+            continue
+        row['id'] = pk
+        if any(existing[pk][field] != row[field] for field in FIELDS):
+            updated.append(row)
+        else:
+            unchanged.append(row)
+    return created, updated, unchanged
+
+
+def _sync_links(rows, product_ids, dry_run=False):
+    """
+    Make each listed product's options exactly the ones in its row, in two
+    bulk statements. A dry run only counts; ``product_ids`` may then map new
+    products to their slug.
+    """
+    through = Product.available_options.through
+    targets = {product_ids[row['slug']]: row['option_ids'] for row in rows if row['options'] is not None}
+    current = {}
+    for link_id, product_id, option_id in through.objects.values_list('id', 'product_id', 'cakeoption_id'):
+        if product_id in targets:
+            current.setdefault(product_id, {})[option_id] = link_id
+    stale, fresh, changed = [], [], set()
+    for product_id, wanted in targets.items():
+        have = current.get(product_id, {})
+        stale.extend(link_id for option_id, link_id in have.items() if option_id not in wanted)
+        fresh.extend(
+            through(product_id=product_id, cakeoption_id=option_id) for option_id in wanted if option_id not in have
+        )
+        if set(have) != set(wanted):
+            changed.add(product_id)
+    if not dry_run:
+        for start in range(0, len(stale), BATCH_SIZE):
+            through.objects.filter(id__in=stale[start:start + BATCH_SIZE]).delete()
+        through.objects.bulk_create(fresh, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return changed, len(fresh), len(stale)
+
+
+def import_catalog(raw_rows, dry_run=False):
+    """
+    Upsert products from ``raw_rows`` in one transaction and return counts.
+    Bulk writes send no signals, so cache versions and the catalog snapshot
+    are refreshed here once the transaction commits.
+    """
+    errors, rows, seen = [], [], set()
+    for number, raw in enumerate(raw_rows, start=1):
+        try:
+            row = clean_row(raw)
+        except (TypeError, ValueError) as e:
+            errors.append(f"row {number}: {e}")
+            continue
+        if row['slug'] in seen:
+            errors.append(f"row {number}: duplicate slug {row['slug']!r}")
+            continue
+        seen.add(row['slug'])
+        rows.append((number, row))
+
+    options = {(o['option_type'], o['name']): o['id'] for o in CakeOption.objects.values('id', 'option_type', 'name')}
+    for number, row in rows:
+        if row['options'] is None:
+            continue
+        unknown = [f'{t}:{n}' for t, n in row['options'] if (t, n) not in options]
+        if unknown:
+            errors.append(f"row {number}: unknown options {', '.join(unknown)}")
+        row['option_ids'] = {options[key] for key in row['options'] if key in options}
+    if errors:
+        raise CatalogImportError(errors)
+
+    with transaction.atomic():
+        categories_created = _resolve_categories([row for _, row in rows], dry_run)
+        created, updated, unchanged = _plan(rows, errors)
+        if errors:
+            raise CatalogImportError(errors)
+        result = {
+            'created': len(created), 'updated': len(updated), 'unchanged': len(unchanged),
+            'categories_created': categories_created, 'links_added': 0, 'links_removed': 0,
+        }
+        if dry_run:
+            # Link changes are counted, and move products between counts, as in the real run
+            product_ids = {row['slug']: row.get('id', row['slug']) for _, row in rows}
+            relinked, result['links_added'], result['links_removed'] = _sync_links(
+                [row for _, row in rows], product_ids, dry_run=True,
+            )
+            moved = [row for row in unchanged if row['id'] in relinked]
+            result['updated'] += len(moved)
+            result['unchanged'] -= len(moved)
+            return result
+
+        # auto_now only runs on save(), so updated_at is set explicitly; the catalog reads it for deltas
+        now = timezone.now()
+        Product.objects.bulk_update(
+            [Product(id=row['id'], updated_at=now, **{f: row[f] for f in FIELDS}) for row in updated],
+            [*FIELDS, 'updated_at'], batch_size=BATCH_SIZE,
+        )
+        # Upsert on slug so a concurrent insert of the same product updates rather than fails
+        Product.objects.bulk_create(
+            [Product(updated_at=now, **{f: row[f] for f in FIELDS}) for row in created],
+            batch_size=BATCH_SIZE, update_conflicts=True, unique_fields=['slug'],
+            update_fields=[f for f in FIELDS if f != 'slug'] + ['updated_at'],
+        )
+
+        product_ids = dict(Product.objects.values_list('slug', 'id'))
+        relinked, result['links_added'], result['links_removed'] = _sync_links(
+            [row for _, row in rows], product_ids,
+        )
+        # Products whose only change is their options move from unchanged to updated
+        moved = [row for row in unchanged if row['id'] in relinked]
+        for start in range(0, len(moved), BATCH_SIZE):
+            Product.objects.filter(id__in=[row['id'] for row in moved[start:start + BATCH_SIZE]]).update(updated_at=now)
+        if moved:
+            result['updated'] += len(moved)
+            result['unchanged'] -= len(moved)
+
+        if created or updated or moved:
+            bump_version_on_commit(model_token(Product))
+        if categories_created:
+            bump_version_on_commit(model_token(Category))
+        transaction.on_commit(catalog.refresh)
+    return result
@@ -0,0 +1,191 @@
+import json
+import logging
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+logger = logging.getLogger('api.requests')
+
+# Upper bounds, in milliseconds, of the per-route latency histogram buckets
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+# Slowest queries quoted in a slow-request log line
+SLOW_REQUEST_QUERIES = 10
+
+_current = ContextVar('request_metrics', default=None)
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def caller_stack(depth):
+    """The innermost ``depth`` frames of project code, skipping Django and other libraries."""
+    frames = [
+        f'{frame.filename}:{frame.lineno} in {frame.name}'
+        for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(str(settings.BASE_DIR)) and 'site-packages' not in frame.filename
+        and not frame.filename.endswith('instrumentation.py')
+    ]
+    return frames[-depth:]
+
+
+class RequestMetrics:
+    """Counters for one request, filled in by the DB execute wrapper and the serializer hook."""
+
+    def __init__(self, config):
+        self.config = config
+        self.queries = []
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.db_time += duration
+            query = {'sql': sql, 'ms': round(duration * 1000, 3)}
+            if duration * 1000 >= self.config['SLOW_QUERY_MS']:
+                query['stack'] = caller_stack(self.config['STACK_DEPTH'])
+            self.queries.append(query)
+
+
+def _timed_data(prop):
+    def data(self):
+        metrics = _current.get()
+        # Only the outermost .data is timed; nested serializers run inside it
+        if metrics is None or metrics.serializing:
+            return prop.fget(self)
+        metrics.serializing = True
+        start = time.perf_counter()
+        try:
+            return prop.fget(self)
+        finally:
+            metrics.serialize_time += time.perf_counter() - start
+            metrics.serializing = False
+    data.timed = True
+    return property(data)
+
+
+def install():
+    """Time DRF serialization; a no-op context lookup while metrics are disabled."""
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        prop = cls.__dict__['data']
+        if not getattr(prop.fget, 'timed', False):
+            cls.data = _timed_data(prop)
+
+
+def record(route, total_ms, queries):
+    index = bisect_left(BUCKETS_MS, total_ms)
+    with _histograms_lock:
+        entry = _histograms.setdefault(
+            route, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'queries': 0, 'buckets': [0] * len(BUCKETS_MS)}
+        )
+        entry['count'] += 1
+        entry['total_ms'] += total_ms
+        entry['max_ms'] = max(entry['max_ms'], total_ms)
+        entry['queries'] += queries
+        entry['buckets'][index] += 1
+
+
+def _percentile(buckets, count, fraction):
+    """Upper bound of the bucket holding the given fraction of requests."""
+    seen = 0
+    for bound, hits in zip(BUCKETS_MS, buckets):
+        seen += hits
+        if seen >= count * fraction:
+            return None if bound == float('inf') else bound
+    return None
+
+
+def snapshot():
+    """Per-route histograms collected by this process since it started (or was reset)."""
+    with _histograms_lock:
+        entries = {route: dict(entry, buckets=list(entry['buckets'])) for route, entry in _histograms.items()}
+    labels = ['+Inf' if bound == float('inf') else str(bound) for bound in BUCKETS_MS]
+    return {
+        route: {
+            'count': entry['count'],
+            'mean_ms': round(entry['total_ms'] / entry['count'], 3),
+            'max_ms': round(entry['max_ms'], 3),
+            'p50_ms_le': _percentile(entry['buckets'], entry['count'], 0.5),
+            'p95_ms_le': _percentile(entry['buckets'], entry['count'], 0.95),
+            'p99_ms_le': _percentile(entry['buckets'], entry['count'], 0.99),
+            'queries_per_request': round(entry['queries'] / entry['count'], 2),
+            'buckets_ms': dict(zip(labels, entry['buckets'])),
+        }
+        for route, entry in sorted(entries.items())
+    }
+
+
+def reset():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+class RequestMetricsMiddleware:
+    """
+    Measures DB queries, DB time, serializer time and wall time per request.
+    Reports them as a Server-Timing header and a JSON log line on the
+    ``api.requests`` logger, and feeds the per-route histograms. Removed from
+    the chain entirely when ``REQUEST_METRICS['ENABLED']`` is off.
+    """
+
+    def __init__(self, get_response):
+        self.config = settings.REQUEST_METRICS
+        if not self.config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics(self.config)
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        match = getattr(request, 'resolver_match', None)
+        route = f'{request.method} {match.view_name if match else "unresolved"}'
+        db_ms = metrics.db_time * 1000
+        serialize_ms = metrics.serialize_time * 1000
+        record(route, total_ms, len(metrics.queries))
+
+        if self.config['SERVER_TIMING']:
+            response['Server-Timing'] = (
+                f'db;dur={db_ms:.1f};desc="{len(metrics.queries)} queries", '
+                f'serialize;dur={serialize_ms:.1f}, total;dur={total_ms:.1f}'
+            )
+
+        entry = {
+            'route': route,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 3),
+            'db_ms': round(db_ms, 3),
+            'serialize_ms': round(serialize_ms, 3),
+            'queries': len(metrics.queries),
+        }
+        slow_queries = [q for q in metrics.queries if 'stack' in q]
+        if total_ms >= self.config['SLOW_REQUEST_MS']:
+            entry['slow_request'] = True
+            entry['sql'] = sorted(metrics.queries, key=lambda q: -q['ms'])[:SLOW_REQUEST_QUERIES]
+            logger.warning(json.dumps(entry))
+        elif slow_queries:
+            entry['sql'] = slow_queries
+            logger.warning(json.dumps(entry))
+        else:
+            logger.info(json.dumps(entry))
+        return response
@@ -0,0 +1,126 @@
+from collections import Counter
+from django.db.models import ExpressionWrapper, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from .cache import bump_version_on_commit, model_token
+from .models import DailyStock, Order, OrderItem, Product
+
+# Orders in these statuses hold no stock
+RELEASED_STATUSES = ('Cancelled',)
+
+
+class OutOfStock(Exception):
+    """Raised when a pickup day's batch of a product cannot cover an order."""
+
+    def __init__(self, product, day, left):
+        super().__init__(f"Only {left} {product.name} left for pickup on {day:%A %d %B}.")
+        self.product = product
+        self.left = left
+
+
+def pickup_date(pickup_datetime):
+    return timezone.localtime(pickup_datetime).date()
+
+
+def _tracked(lines):
+    """Sum ``(product, quantity)`` lines per stock-limited product, in primary key order."""
+    products, totals = {}, Counter()
+    for product, quantity in lines:
+        if product.daily_batch is not None:
+            products[product.pk] = product
+            totals[product.pk] += quantity
+    return [(products[pk], totals[pk]) for pk in sorted(totals)]
+
+
+def reserve(day, lines, force=False):
+    """
+    Take ``(product, quantity)`` lines out of ``day``'s batches. Each product
+    is one conditional UPDATE ... SET reserved = reserved + n WHERE
+    reserved + n <= capacity: atomic, locking only that product's row on
+    Postgres, so concurrent checkouts can never oversell. Rows are taken in
+    product order so two multi-product orders cannot deadlock. Call inside
+    the order's transaction; OutOfStock leaves the earlier products to its
+    rollback. ``force`` skips the check for staff edits.
+    """
+    tracked = _tracked(lines)
+    if not tracked:
+        return
+    DailyStock.objects.bulk_create(
+        [DailyStock(date=day, product_id=product.pk, capacity=product.daily_batch) for product, _ in tracked],
+        ignore_conflicts=True,
+    )
+    for product, quantity in tracked:
+        stock = DailyStock.objects.filter(date=day, product_id=product.pk)
+        if not force:
+            stock = stock.filter(reserved__lte=F('capacity') - quantity)
+        if not stock.update(reserved=F('reserved') + quantity):
+            row = DailyStock.objects.get(date=day, product_id=product.pk)
+            raise OutOfStock(product, day, max(row.capacity - row.reserved, 0))
+    # update() sends no signals; product bodies carry the remaining quantity
+    bump_version_on_commit(model_token(DailyStock))
+
+
+def release(day, lines):
+    tracked = _tracked(lines)
+    for product, quantity in tracked:
+        # Orders placed before the product had a batch were never counted in
+        DailyStock.objects.filter(date=day, product_id=product.pk).update(
+            reserved=Greatest(F('reserved') - quantity, 0),
+        )
+    if tracked:
+        bump_version_on_commit(model_token(DailyStock))
+
+
+def order_lines(order_id):
+    items = OrderItem.objects.filter(order_id=order_id).select_related('product').only(
+        'quantity', 'product__name', 'product__daily_batch',
+    )
+    return [(item.product, item.quantity) for item in items]
+
+
+def move_order(order, previous):
+    """Follow a cancellation, reinstatement or new pickup day; ``previous`` holds the old status and pickup_datetime."""
+    held, holds = previous['status'] not in RELEASED_STATUSES, order.status not in RELEASED_STATUSES
+    old_day, new_day = pickup_date(previous['pickup_datetime']), pickup_date(order.pickup_datetime)
+    if held == holds and (not holds or old_day == new_day):
+        return
+    lines = order_lines(order.pk)
+    if held:
+        release(old_day, lines)
+    if holds:
+        reserve(new_day, lines, force=True)
+
+
+def change_line(order_id, before=None, after=None):
+    """Follow one order line saved or deleted on its own (admin inlines); ``before`` and ``after`` are production.line_values()."""
+    order = Order.objects.filter(pk=order_id).values('status', 'pickup_datetime').first()
+    if order is None or order['status'] in RELEASED_STATUSES:
+        return
+    deltas = Counter()
+    if before:
+        deltas[before['product_id']] -= before['quantity']
+    if after:
+        deltas[after['product_id']] += after['quantity']
+    changed = [pk for pk, quantity in deltas.items() if quantity]
+    if not changed:
+        return
+    products = list(Product.objects.filter(pk__in=changed, daily_batch__isnull=False).only('name', 'daily_batch'))
+    day = pickup_date(order['pickup_datetime'])
+    release(day, [(product, -deltas[product.pk]) for product in products if deltas[product.pk] < 0])
+    reserve(day, [(product, deltas[product.pk]) for product in products if deltas[product.pk] > 0], force=True)
+
+
+def with_availability(queryset, day):
+    """
+    Annotate ``available_quantity`` for ``day``: what is left of the batch,
+    the full batch before the day's first order, None for unlimited products.
+    Never below zero, though staff may book past the batch. A correlated
+    subquery on the unique (date, product) index, so a page of products
+    costs no extra queries.
+    """
+    left = DailyStock.objects.filter(date=day, product=OuterRef('pk')).annotate(
+        left=Greatest(ExpressionWrapper(F('capacity') - F('reserved'), output_field=IntegerField()), 0),
+    ).order_by().values('left')[:1]
+    return queryset.annotate(
+        available_quantity=Coalesce(Subquery(left), F('daily_batch'), output_field=IntegerField()),
+    )
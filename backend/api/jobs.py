@@ -0,0 +1,191 @@
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# name -> (function, max_attempts); filled by @task
+TASKS = {}
+
+
+def task(name=None, max_attempts=None):
+    """Register a function as a job. It is called with the job's payload as keyword arguments."""
+    def register(func):
+        TASKS[name or func.__name__] = (func, max_attempts or settings.JOBS['MAX_ATTEMPTS'])
+        return func
+    return register
+
+
+def enqueue(name, payload=None, key=None, delay=None):
+    """
+    Queue ``name`` to run with ``payload``. With ``key``, a job ever queued
+    under that key wins and this call inserts nothing; the existing job is
+    returned instead.
+    """
+    if name not in TASKS:
+        raise KeyError(f"Unknown job {name!r}")
+    job = Job(
+        name=name, payload=payload or {}, idempotency_key=key, max_attempts=TASKS[name][1],
+        run_at=timezone.now() + (delay or timedelta(0)),
+    )
+    if key is None:
+        job.save()
+        return job
+    # ON CONFLICT DO NOTHING, so concurrent enqueues of one key never raise
+    Job.objects.bulk_create([job], ignore_conflicts=True)
+    return Job.objects.get(idempotency_key=key)
+
+
+def enqueue_on_commit(name, payload=None, key=None, delay=None):
+    """enqueue() once the surrounding transaction commits, so a rolled-back request queues nothing."""
+    # robust: a failed enqueue is logged rather than turning an already committed request into a 500
+    transaction.on_commit(lambda: enqueue(name, payload, key, delay), robust=True)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def claim(worker, limit=1):
+    """
+    Lock up to ``limit`` due jobs for ``worker``. On Postgres the rows are
+    taken with SELECT ... FOR UPDATE SKIP LOCKED, so workers never wait on
+    or double-claim each other. SQLite has no row locks; there each job is
+    claimed with a conditional UPDATE and lost races are simply skipped.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id')
+    claimed = {'status': 'running', 'locked_by': worker, 'locked_at': now, 'attempts': F('attempts') + 1}
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            Job.objects.filter(id__in=ids).update(**claimed)
+    else:
+        ids = [
+            job_id for job_id in due.values_list('id', flat=True)[:limit]
+            if Job.objects.filter(id=job_id, status='queued').update(**claimed)
+        ]
+    return list(Job.objects.filter(id__in=ids).order_by('run_at', 'id'))
+
+
+def backoff(attempts):
+    base = settings.JOBS['BACKOFF_SECONDS'] * 2 ** (attempts - 1)
+    return timedelta(seconds=min(settings.JOBS['BACKOFF_MAX_SECONDS'], random.uniform(base / 2, base)))
+
+
+def _beat(job, stop):
+    # A thread of its own, so it has its own connection; closed on the way out
+    interval = settings.JOBS['LEASE_SECONDS'] / 3
+    try:
+        while not stop.wait(interval):
+            try:
+                renewed = Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by).update(
+                    locked_at=timezone.now(),
+                )
+            except DatabaseError as e:
+                logger.warning("Could not renew the lease of job %s #%s: %s", job.name, job.pk, e)
+                continue
+            if not renewed:
+                break
+    finally:
+        connection.close()
+
+
+@contextmanager
+def heartbeat(job):
+    """
+    Renew ``job``'s lease every third of LEASE_SECONDS while the block runs,
+    so requeue_stale only hands on jobs whose worker has actually stopped,
+    however long a large export or backfill takes.
+    """
+    stop = threading.Event()
+    beat = threading.Thread(target=_beat, args=(job, stop), name=f'job-{job.pk}-heartbeat', daemon=True)
+    beat.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        beat.join()
+
+
+def run(job):
+    """Run one claimed job and record the outcome; failures are retried with backoff until max_attempts."""
+    try:
+        func = TASKS[job.name][0]
+        with heartbeat(job):
+            func(**job.payload)
+    except Exception as e:
+        error = ''.join(traceback.format_exception(e))
+        if job.attempts < job.max_attempts:
+            logger.warning("Job %s #%s failed (attempt %s of %s): %s", job.name, job.pk, job.attempts, job.max_attempts, e)
+            Job.objects.filter(pk=job.pk).update(
+                status='queued', run_at=timezone.now() + backoff(job.attempts), locked_by='', locked_at=None,
+                last_error=error,
+            )
+        else:
+            logger.error("Job %s #%s failed for good after %s attempts: %s", job.name, job.pk, job.attempts, e)
+            Job.objects.filter(pk=job.pk).update(status='failed', finished_at=timezone.now(), last_error=error)
+        return False
+    Job.objects.filter(pk=job.pk).update(status='done', finished_at=timezone.now(), locked_by='', locked_at=None)
+    return True
+
+
+def requeue_stale():
+    """
+    Return jobs whose worker died mid-run to the queue, once their lease has
+    run out: a live worker keeps renewing it (see heartbeat). A job that has
+    used up max_attempts is failed instead, so one that kills its worker
+    every time is not retried forever. Returns the count requeued.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status='running', locked_at__lt=now - timedelta(seconds=settings.JOBS['LEASE_SECONDS']))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, locked_by='', locked_at=None,
+        last_error="The worker running this job stopped before it finished.",
+    )
+    if failed:
+        logger.error("Failed %s stale jobs that had used up their attempts", failed)
+    return stale.update(status='queued', locked_by='', locked_at=None)
+
+
+def prune():
+    """Delete finished jobs older than KEEP_DONE_DAYS; failed ones are kept for inspection."""
+    cutoff = timezone.now() - timedelta(days=settings.JOBS['KEEP_DONE_DAYS'])
+    return Job.objects.filter(status='done', finished_at__lt=cutoff).delete()[0]
+
+
+def work(stop, batch=1, poll=None, drain=False, own_connection=False):
+    """
+    Claim and run jobs until ``stop`` is set. Sleeps ``poll`` seconds when the
+    queue is empty; with ``drain`` it returns instead. Returns the count run.
+    ``own_connection`` is for worker threads: stale connections are recycled
+    between batches and the thread's connection is closed on the way out.
+    """
+    poll = settings.JOBS['POLL_SECONDS'] if poll is None else poll
+    worker, done = worker_name(), 0
+    try:
+        while not stop.is_set():
+            if own_connection:
+                close_old_connections()
+            jobs = claim(worker, batch)
+            for job in jobs:
+                run(job)
+                done += 1
+            if not jobs:
+                if drain:
+                    break
+                stop.wait(poll)
+    finally:
+        if own_connection:
+            connection.close()
+    return done
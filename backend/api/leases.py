@@ -0,0 +1,20 @@
+from datetime import timedelta
+from django.utils import timezone
+from .models import Lease
+
+
+def acquire(name, seconds):
+    """
+    Take the lease ``name`` for ``seconds`` unless someone else holds it.
+    Shared through the database, so it excludes other processes and hosts
+    as well as threads; the conditional UPDATE lets exactly one of several
+    racing callers through. An expired lease is free, so a crashed holder
+    blocks others for at most ``seconds``.
+    """
+    now = timezone.now()
+    Lease.objects.bulk_create([Lease(name=name, expires_at=now)], ignore_conflicts=True)
+    return bool(Lease.objects.filter(name=name, expires_at__lte=now).update(expires_at=now + timedelta(seconds=seconds)))
+
+
+def release(name):
+    Lease.objects.filter(name=name).update(expires_at=timezone.now())
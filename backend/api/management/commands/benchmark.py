@@ -0,0 +1,107 @@
+import json
+import os
+import platform
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+from api import benchmarking
+
+
+class Command(BaseCommand):
+    help = "Benchmark the API against a generated dataset in a throwaway database and report JSON metrics."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--options', type=int, default=30)
+        parser.add_argument('--orders', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42, help="Random seed for the dataset.")
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--scenario', action='append', help="Only run the named scenario (repeatable).")
+        parser.add_argument('--server', action='store_true', help="Also benchmark over HTTP against a local server.")
+        parser.add_argument('--concurrency', type=int, default=4, help="Client threads in --server mode.")
+        parser.add_argument('--fast-json', action='store_true', help="Run with FAST_JSON (orjson + lean serializers).")
+        parser.add_argument('--output', help="Write the JSON report to this file instead of stdout.")
+        parser.add_argument('--compare', metavar='BASELINE', help="Fail if results regress against this report.")
+        parser.add_argument('--tolerance', type=float, default=0.15, help="Allowed slowdown as a fraction.")
+
+    def handle(self, *args, **options):
+        from seed import seed_scale
+
+        # Server threads open their own connections, so SQLite needs an on-disk test database
+        db_file = None
+        if connection.vendor == 'sqlite':
+            fd, db_file = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(fd)
+            settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = db_file
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = db_file
+
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        # Orders all land in one pickup window, so lift its capacity out of the way
+        slots = dict(settings.PICKUP_SLOTS, CAPACITY={k: 10 ** 9 for k in settings.PICKUP_SLOTS['CAPACITY']})
+        try:
+            overrides = {'PICKUP_SLOTS': slots, 'ALLOWED_HOSTS': ['*']}
+            if options['fast_json']:
+                overrides['FAST_JSON'] = True
+                overrides['REST_FRAMEWORK'] = dict(
+                    settings.REST_FRAMEWORK, DEFAULT_RENDERER_CLASSES=['api.renderers.ORJSONRenderer'],
+                )
+            with override_settings(**overrides):
+                cache.clear()
+                # Keep stdout for the JSON report
+                with redirect_stdout(sys.stderr):
+                    seed_scale(
+                        categories=options['categories'], products=options['products'],
+                        options=options['options'], orders=options['orders'], seed_value=options['seed'],
+                    )
+                scenarios = benchmarking.default_scenarios()
+                if options['scenario']:
+                    scenarios = [s for s in scenarios if s.name in options['scenario']]
+                    if not scenarios:
+                        raise CommandError(f"Unknown scenario: {', '.join(options['scenario'])}")
+                results = {'in_process': benchmarking.run_in_process(scenarios, options['requests'], options['warmup'])}
+                if options['server']:
+                    results['server'] = benchmarking.run_server(
+                        scenarios, options['requests'], options['concurrency'], options['warmup']
+                    )
+        finally:
+            runner.teardown_databases(old_config)
+            cache.clear()
+            if db_file and os.path.exists(db_file):
+                os.remove(db_file)
+
+        report = {
+            'dataset': {k: options[k] for k in ('categories', 'products', 'options', 'orders', 'seed')},
+            'requests': options['requests'],
+            'concurrency': options['concurrency'] if options['server'] else None,
+            'fast_json': options['fast_json'],
+            'environment': {
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'cache': settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1],
+            },
+            'results': results,
+        }
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(text + '\n')
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(text)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = benchmarking.compare(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Performance regressions:\n  " + '\n  '.join(regressions))
+            self.stderr.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
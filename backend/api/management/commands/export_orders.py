@@ -0,0 +1,41 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from api import exports
+from api.models import Order
+
+
+class Command(BaseCommand):
+    help = "Stream orders and their lines as CSV or JSONL, filtered by pickup date and status."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(exports.FORMATS), default='csv')
+        parser.add_argument('--from', dest='start', help="First pickup date, YYYY-MM-DD (inclusive).")
+        parser.add_argument('--to', dest='end', help="Last pickup date, YYYY-MM-DD (inclusive).")
+        parser.add_argument(
+            '--status', action='append', choices=[s for s, _ in Order.STATUS_CHOICES],
+            help="Only orders in this status (repeatable).",
+        )
+        parser.add_argument('--chunk-size', type=int, default=exports.CHUNK_SIZE, help="Orders fetched per round trip.")
+        parser.add_argument('--output', help="Write to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError:
+            raise CommandError("Dates must be YYYY-MM-DD.")
+        orders = exports.filter_orders(Order.objects.all(), start, end, options['status'])
+        lines = exports.export_lines(options['format'], orders, options['chunk_size'])
+
+        # Rows are written as they are produced; nothing is collected in memory
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        count = 0
+        with open(options['output'], 'w', newline='', encoding='utf-8') as out:
+            for line in lines:
+                out.write(line)
+                count += 1
+        rows = count - 1 if options['format'] == 'csv' else count
+        self.stderr.write(self.style.SUCCESS(f"Wrote {rows} rows to {options['output']}."))
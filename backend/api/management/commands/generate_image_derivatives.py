@@ -0,0 +1,108 @@
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from api import images
+from api.cache import SITE_CONTENT_CACHE, bump_version, model_token
+from api.models import SiteContent, SiteGalleryImage
+
+
+class Command(BaseCommand):
+    help = (
+        "Render responsive derivatives and blur placeholders for every stored image, "
+        "in parallel, skipping files whose content hash is unchanged. Safe to interrupt and rerun."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-render images whose content is unchanged.")
+        parser.add_argument(
+            '--model', action='append', choices=[m.__name__ for m in images.IMAGE_FIELDS],
+            help="Only process this model (repeatable).",
+        )
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes (1 renders inline).")
+        parser.add_argument('--batch', type=int, default=50, help="Results written to the database per transaction.")
+
+    def handle(self, *args, **options):
+        models = [m for m in images.IMAGE_FIELDS if m.__name__ in options['model']] if options['model'] else None
+        tasks = images.pending_images(models, force=options['force'])
+        self.pending = {}
+        self.touched = set()
+        self.counts = {'rendered': 0, 'unchanged': 0, 'failed': 0}
+        self.batch = options['batch']
+        workers = max(1, options['workers'])
+        started = time.perf_counter()
+
+        try:
+            if workers == 1:
+                for task in tasks:
+                    self.collect(task, images.render_task(task[3], task[4]))
+            else:
+                self.run_pool(tasks, workers)
+        except KeyboardInterrupt:
+            self.flush()
+            raise CommandError("Interrupted; finished images were saved, rerun to resume.")
+        self.flush()
+
+        elapsed = time.perf_counter() - started
+        rate = self.counts['rendered'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {self.counts['rendered']} images, {self.counts['unchanged']} unchanged, "
+            f"{self.counts['failed']} failed in {elapsed:.1f}s ({rate:.1f} images/s, {workers} workers)."
+        ))
+
+    def run_pool(self, tasks, workers):
+        # Workers only read and write files; every database write happens here in the parent.
+        # At most two images per worker are in flight, which bounds memory however many are pending
+        limit = workers * 2
+        in_flight = {}
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            try:
+                for task in tasks:
+                    if len(in_flight) >= limit:
+                        self.drain(in_flight)
+                    in_flight[pool.submit(images.render_task, task[3], task[4])] = task
+                while in_flight:
+                    self.drain(in_flight)
+            except KeyboardInterrupt:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    def drain(self, in_flight):
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            self.collect(in_flight.pop(future), future.result())
+
+    def collect(self, task, result):
+        model, pk, field_name, name, _ = task
+        entry, error = result
+        if error:
+            self.counts['failed'] += 1
+            self.stderr.write(f"{model.__name__} {pk} {field_name} ({name}): {error}")
+        elif entry is None:
+            self.counts['unchanged'] += 1
+        else:
+            self.counts['rendered'] += 1
+            self.pending.setdefault(model, {}).setdefault(pk, {})[field_name] = entry
+            if sum(len(rows) for rows in self.pending.values()) >= self.batch:
+                self.flush()
+
+    def flush(self):
+        # Merge into the stored manifests so entries for other fields on the row survive
+        with transaction.atomic():
+            for model, rows in self.pending.items():
+                current = dict(model.objects.filter(pk__in=rows).values_list('pk', 'image_derivatives'))
+                fields = images.stamp_fields(model)
+                stamp = {'updated_at': timezone.now()} if 'updated_at' in fields else {}
+                updated = [
+                    model(pk=pk, image_derivatives={**(current[pk] or {}), **entries}, **stamp)
+                    for pk, entries in rows.items() if pk in current
+                ]
+                model.objects.bulk_update(updated, fields)
+                self.touched.add(model)
+        self.pending = {}
+        # bulk_update sends no signals, so expire the cached API payloads here
+        for model in self.touched:
+            bump_version(SITE_CONTENT_CACHE if model in (SiteContent, SiteGalleryImage) else model_token(model))
+        self.touched = set()
@@ -0,0 +1,46 @@
+import os
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api import imports
+
+MAX_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update products from a CSV or JSON file, matched on square_id and then slug, "
+        "in one transaction of bulk statements."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON file of products.")
+        parser.add_argument('--format', choices=['csv', 'json'], help="Defaults to the file extension.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if fmt not in ('csv', 'json'):
+            raise CommandError("Pass --format csv or --format json.")
+        started = time.perf_counter()
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as f:
+                rows = imports.read_rows(f, fmt)
+            result = imports.import_catalog(rows, dry_run=options['dry_run'])
+        except OSError as e:
+            raise CommandError(str(e))
+        except (ValueError, KeyError) as e:
+            raise CommandError(f"Could not read {options['path']}: {e}")
+        except imports.CatalogImportError as e:
+            shown = e.errors[:MAX_ERRORS]
+            more = len(e.errors) - len(shown)
+            raise CommandError('\n'.join([
+                f"{len(e.errors)} invalid rows, nothing imported:", *shown, *([f"... and {more} more"] if more else []),
+            ]))
+
+        elapsed = time.perf_counter() - started
+        prefix = "Would import" if options['dry_run'] else "Imported"
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix} {len(rows)} rows in {elapsed:.2f}s: {result['created']} created, {result['updated']} updated, "
+            f"{result['unchanged']} unchanged; {result['categories_created']} new categories; "
+            f"{result['links_added']} option links added, {result['links_removed']} removed."
+        ))
@@ -0,0 +1,22 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from api import production
+
+
+class Command(BaseCommand):
+    help = "Recompute the production plan from the orders, for every day or a range of pickup dates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help="First pickup date, YYYY-MM-DD (inclusive).")
+        parser.add_argument('--to', dest='end', help="Last pickup date, YYYY-MM-DD (inclusive).")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError:
+            raise CommandError("Dates must be YYYY-MM-DD.")
+        started = time.perf_counter()
+        written = production.rebuild(start, end)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} production lines in {time.perf_counter() - started:.2f}s."))
@@ -0,0 +1,53 @@
+import signal
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from api import idempotency, jobs
+
+# Seconds between sweeps for expired leases, old finished jobs and expired idempotency keys
+HOUSEKEEPING_SECONDS = 60
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs. Each of --concurrency threads claims jobs on its own connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help="Worker threads (default 1).")
+        parser.add_argument('--batch', type=int, default=1, help="Jobs each thread claims at a time.")
+        parser.add_argument('--poll', type=float, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--drain', action='store_true', help="Exit once no job is due instead of polling.")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        jobs.requeue_stale()
+        kwargs = {'batch': options['batch'], 'poll': options['poll'], 'drain': options['drain']}
+        counts = []
+        started = time.perf_counter()
+        if options['concurrency'] <= 1 and options['drain']:
+            counts.append(jobs.work(stop, **kwargs))
+        else:
+            threads = [
+                threading.Thread(target=lambda: counts.append(jobs.work(stop, own_connection=True, **kwargs)), daemon=True)
+                for _ in range(max(1, options['concurrency']))
+            ]
+            for thread in threads:
+                thread.start()
+            sweep_at = time.monotonic() + HOUSEKEEPING_SECONDS
+            try:
+                while alive := [thread for thread in threads if thread.is_alive()]:
+                    alive[0].join(1)
+                    if time.monotonic() >= sweep_at and not stop.is_set():
+                        close_old_connections()
+                        jobs.requeue_stale()
+                        jobs.prune()
+                        idempotency.prune()
+                        sweep_at = time.monotonic() + HOUSEKEEPING_SECONDS
+            except KeyboardInterrupt:
+                stop.set()
+                # Jobs already running finish; their threads then exit
+                for thread in threads:
+                    thread.join()
+        self.stdout.write(self.style.SUCCESS(f"Ran {sum(counts)} jobs in {time.perf_counter() - started:.2f}s."))
@@ -0,0 +1,46 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from api import square
+
+
+class Command(BaseCommand):
+    help = "Pull Square catalog changes since the last run and push paid orders. --interval keeps it running."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--catalog-only', action='store_true')
+        parser.add_argument('--orders-only', action='store_true')
+        parser.add_argument('--full', action='store_true', help="Ignore the stored cursor and pull the whole catalog.")
+        parser.add_argument('--interval', type=int, help="Repeat every this many seconds instead of running once.")
+
+    def handle(self, *args, **options):
+        if options['catalog_only'] and options['orders_only']:
+            raise CommandError("--catalog-only and --orders-only are mutually exclusive.")
+        full = options['full']
+        while True:
+            started = time.monotonic()
+            self.run_once(not options['orders_only'], not options['catalog_only'], full)
+            if not options['interval']:
+                break
+            full = False
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
+
+    def run_once(self, catalog, orders, full):
+        started = time.perf_counter()
+        try:
+            result = square.sync(catalog=catalog, orders=orders, full=full)
+        except square.SquareError as e:
+            self.stderr.write(self.style.ERROR(f"Square sync failed: {e}"))
+            return
+        if result is None:
+            self.stdout.write("Another sync is running; skipped.")
+            return
+        parts = []
+        if 'catalog' in result:
+            c = result['catalog']
+            parts.append(
+                f"catalog: {c['created']} created, {c['updated']} updated, {c['unchanged']} unchanged, "
+                f"{c['skipped']} skipped, {c['deleted']} deleted in Square ({c['calls']} calls)"
+            )
+        if 'orders' in result:
+            parts.append(f"orders: {result['orders']['pushed']} pushed, {result['orders']['failed']} failed")
+        self.stdout.write(self.style.SUCCESS(f"{'; '.join(parts)} in {time.perf_counter() - started:.2f}s."))
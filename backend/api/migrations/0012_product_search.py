@@ -0,0 +1,107 @@
+from django.db import migrations
+
+# The DDL is written out here rather than imported from api.search, so this
+# migration keeps running the SQL it was written with
+
+# --- Postgres: stored, GIN-indexed tsvector plus a pg_trgm index on name ---
+POSTGRES_SCHEMA = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """ALTER TABLE api_product ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX product_search_vector_idx ON api_product USING gin (search_vector)",
+    "CREATE INDEX product_name_trgm_idx ON api_product USING gin (name gin_trgm_ops)",
+]
+POSTGRES_SCHEMA_REVERSE = [
+    "DROP INDEX IF EXISTS product_name_trgm_idx",
+    "DROP INDEX IF EXISTS product_search_vector_idx",
+    "ALTER TABLE api_product DROP COLUMN IF EXISTS search_vector",
+]
+
+# --- SQLite: external-content FTS5 tables kept in sync by triggers ---
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE api_product_fts USING fts5(
+        name, description, content='api_product', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER api_product_fts_insert AFTER INSERT ON api_product BEGIN
+        INSERT INTO api_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER api_product_fts_delete AFTER DELETE ON api_product BEGIN
+        INSERT INTO api_product_fts(api_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER api_product_fts_update AFTER UPDATE OF name, description ON api_product BEGIN
+        INSERT INTO api_product_fts(api_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO api_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    "INSERT INTO api_product_fts(api_product_fts) VALUES ('rebuild')",
+]
+SQLITE_TRIGRAM_SCHEMA = [
+    """CREATE VIRTUAL TABLE api_product_trgm USING fts5(
+        name, content='api_product', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER api_product_trgm_insert AFTER INSERT ON api_product BEGIN
+        INSERT INTO api_product_trgm(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER api_product_trgm_delete AFTER DELETE ON api_product BEGIN
+        INSERT INTO api_product_trgm(api_product_trgm, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER api_product_trgm_update AFTER UPDATE OF name ON api_product BEGIN
+        INSERT INTO api_product_trgm(api_product_trgm, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO api_product_trgm(rowid, name) VALUES (new.id, new.name);
+    END""",
+    "INSERT INTO api_product_trgm(api_product_trgm) VALUES ('rebuild')",
+]
+SQLITE_SCHEMA_REVERSE = [
+    "DROP TRIGGER IF EXISTS api_product_trgm_update",
+    "DROP TRIGGER IF EXISTS api_product_trgm_delete",
+    "DROP TRIGGER IF EXISTS api_product_trgm_insert",
+    "DROP TABLE IF EXISTS api_product_trgm",
+    "DROP TRIGGER IF EXISTS api_product_fts_update",
+    "DROP TRIGGER IF EXISTS api_product_fts_delete",
+    "DROP TRIGGER IF EXISTS api_product_fts_insert",
+    "DROP TABLE IF EXISTS api_product_fts",
+]
+
+
+
+def sqlite_trigram(connection):
+    # SQLite's FTS5 trigram tokenizer arrived in 3.34
+    return connection.Database.sqlite_version_info >= (3, 34)
+
+
+def create_search_schema(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        statements = POSTGRES_SCHEMA
+    elif vendor == 'sqlite':
+        statements = SQLITE_SCHEMA + (SQLITE_TRIGRAM_SCHEMA if sqlite_trigram(schema_editor.connection) else [])
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def drop_search_schema(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_SCHEMA_REVERSE, 'sqlite': SQLITE_SCHEMA_REVERSE}.get(vendor, [])
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    """
+    Full-text search structures that have no model field: a generated
+    tsvector column with GIN and trigram indexes on Postgres, and FTS5
+    virtual tables maintained by triggers on SQLite.
+    """
+
+    dependencies = [
+        ('api', '0011_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_schema, drop_search_schema),
+    ]
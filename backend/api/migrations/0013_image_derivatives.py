@@ -0,0 +1,101 @@
+# Generated by Django 5.0.14 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+# SQLite rebuilds api_product for this AddField, which silently drops the FTS5
+# sync triggers of 0012_product_search; the search tables are dropped before it
+# and rebuilt after. The SQL is copied from 0012 so this migration never changes.
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE api_product_fts USING fts5(
+        name, description, content='api_product', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER api_product_fts_insert AFTER INSERT ON api_product BEGIN
+        INSERT INTO api_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER api_product_fts_delete AFTER DELETE ON api_product BEGIN
+        INSERT INTO api_product_fts(api_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER api_product_fts_update AFTER UPDATE OF name, description ON api_product BEGIN
+        INSERT INTO api_product_fts(api_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO api_product_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    "INSERT INTO api_product_fts(api_product_fts) VALUES ('rebuild')",
+]
+SQLITE_TRIGRAM_SCHEMA = [
+    """CREATE VIRTUAL TABLE api_product_trgm USING fts5(
+        name, content='api_product', content_rowid='id', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER api_product_trgm_insert AFTER INSERT ON api_product BEGIN
+        INSERT INTO api_product_trgm(rowid, name) VALUES (new.id, new.name);
+    END""",
+    """CREATE TRIGGER api_product_trgm_delete AFTER DELETE ON api_product BEGIN
+        INSERT INTO api_product_trgm(api_product_trgm, rowid, name) VALUES ('delete', old.id, old.name);
+    END""",
+    """CREATE TRIGGER api_product_trgm_update AFTER UPDATE OF name ON api_product BEGIN
+        INSERT INTO api_product_trgm(api_product_trgm, rowid, name) VALUES ('delete', old.id, old.name);
+        INSERT INTO api_product_trgm(rowid, name) VALUES (new.id, new.name);
+    END""",
+    "INSERT INTO api_product_trgm(api_product_trgm) VALUES ('rebuild')",
+]
+SQLITE_SCHEMA_REVERSE = [
+    "DROP TRIGGER IF EXISTS api_product_trgm_update",
+    "DROP TRIGGER IF EXISTS api_product_trgm_delete",
+    "DROP TRIGGER IF EXISTS api_product_trgm_insert",
+    "DROP TABLE IF EXISTS api_product_trgm",
+    "DROP TRIGGER IF EXISTS api_product_fts_update",
+    "DROP TRIGGER IF EXISTS api_product_fts_delete",
+    "DROP TRIGGER IF EXISTS api_product_fts_insert",
+    "DROP TABLE IF EXISTS api_product_fts",
+]
+
+
+
+def drop_sqlite_search_schema(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_SCHEMA_REVERSE:
+            schema_editor.execute(sql)
+
+
+def create_sqlite_search_schema(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    # SQLite's FTS5 trigram tokenizer arrived in 3.34
+    trigram = connection.Database.sqlite_version_info >= (3, 34)
+    for sql in SQLITE_SCHEMA + (SQLITE_TRIGRAM_SCHEMA if trigram else []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_product_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_sqlite_search_schema, create_sqlite_search_schema),
+        migrations.AddField(
+            model_name='product',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sitecontent',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sitegalleryimage',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='uiasset',
+            name='image_derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(create_sqlite_search_schema, drop_sqlite_search_schema),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.14 on 2026-10-18 16:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductionLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pickup_date', models.DateField()),
+                ('flavor', models.CharField(blank=True, max_length=100)),
+                ('filling', models.CharField(blank=True, max_length=100)),
+                ('size', models.CharField(blank=True, max_length=100)),
+                ('quantity', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='production_lines', to='api.product')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='productionline',
+            constraint=models.UniqueConstraint(fields=('pickup_date', 'product', 'flavor', 'filling', 'size'), name='unique_production_line'),
+        ),
+    ]
@@ -1,9 +1,11 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils.text import slugify
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
     slug = models.SlugField(unique=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -23,17 +25,22 @@ class Product(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    # Responsive sizes rendered by api.images, keyed by image field name
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     UNIT_CHOICES = (
         ('ea', 'each'),
         ('kg', 'kg'),
         ('lb', 'lb'),
     )
     unit = models.CharField(max_length=10, choices=UNIT_CHOICES, default='ea')
+    # Units baked per pickup day; orders beyond it are refused (see api.inventory). Blank means unlimited
+    daily_batch = models.PositiveIntegerField(null=True, blank=True)
     is_custom_cake = models.BooleanField(default=False)
     is_featured = models.BooleanField(default=False)
     available_options = models.ManyToManyField('CakeOption', blank=True, related_name='products')
     square_id = models.CharField(max_length=100, null=True, blank=True, help_text="Square Catalog Object ID")
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -43,6 +50,33 @@ class Product(models.Model):
     def __str__(self):
         return self.name
 
+    class Meta:
+        # One index per public catalog query shape (see ProductViewSet filters and orderings)
+        indexes = [
+            models.Index(fields=['-created_at'], name='product_recent_idx'),
+            models.Index(fields=['price'], name='product_price_idx'),
+            models.Index(fields=['category', '-created_at'], name='product_category_recent_idx'),
+            models.Index(fields=['is_custom_cake', '-created_at'], name='product_custom_recent_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(is_featured=True), name='product_featured_recent_idx'),
+        ]
+
+class DailyStock(models.Model):
+    # One row per stock-limited product and pickup day, created on first order; reserved is kept in step by api.inventory
+    date = models.DateField()
+    product = models.ForeignKey(Product, related_name='daily_stock', on_delete=models.CASCADE)
+    capacity = models.PositiveIntegerField()
+    reserved = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date} {self.product_id}: {self.reserved}/{self.capacity}"
+
+    class Meta:
+        verbose_name_plural = "daily stock"
+        ordering = ['date', 'product']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_daily_stock'),
+        ]
+
 class CakeOption(models.Model):
     # This stores available choices for custom cakes
     OPTION_TYPES = (
@@ -53,6 +87,7 @@ class CakeOption(models.Model):
     option_type = models.CharField(max_length=20, choices=OPTION_TYPES)
     name = models.CharField(max_length=100)
     price_modifier = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.option_type}: {self.name}"
@@ -63,6 +98,7 @@ class Order(models.Model):
         ('Paid', 'Paid'),
         ('Ready', 'Ready'),
         ('Collected', 'Collected'),
+        ('Cancelled', 'Cancelled'),
     )
     customer_name = models.CharField(max_length=200)
     email = models.EmailField()
@@ -70,11 +106,43 @@ class Order(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     pickup_datetime = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    pickup_slot = models.ForeignKey('PickupSlot', related_name='orders', null=True, blank=True, on_delete=models.SET_NULL)
+    square_order_id = models.CharField(max_length=100, null=True, blank=True, editable=False, help_text="Square Order ID once pushed")
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Order {self.id} - {self.customer_name}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='order_recent_idx'),
+            models.Index(fields=['pickup_datetime'], name='order_pickup_idx'),
+            models.Index(fields=['status', 'pickup_datetime'], name='order_status_pickup_idx'),
+            # Orders still waiting to be pushed to Square (see api.square)
+            models.Index(fields=['id'], condition=models.Q(square_order_id__isnull=True), name='order_square_pending_idx'),
+        ]
+
+class PickupSlot(models.Model):
+    # One row per pickup window and product class; booked is kept in step with orders by api.scheduling
+    PRODUCT_CLASSES = (
+        ('regular', 'Regular'),
+        ('custom_cake', 'Custom Cake'),
+    )
+    date = models.DateField()
+    start = models.TimeField()
+    product_class = models.CharField(max_length=20, choices=PRODUCT_CLASSES, default='regular')
+    capacity = models.PositiveIntegerField()
+    booked = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.date} {self.start:%H:%M} ({self.product_class})"
+
+    class Meta:
+        ordering = ['date', 'start']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product_class', 'start'], name='unique_pickup_slot'),
+        ]
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -90,6 +158,129 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.quantity} x {self.product.name}"
 
+class ProductionLine(models.Model):
+    # How many of each product and option combination are due for pickup on a day; kept in step by api.production
+    pickup_date = models.DateField()
+    product = models.ForeignKey(Product, related_name='production_lines', on_delete=models.CASCADE)
+    flavor = models.CharField(max_length=100, blank=True)
+    filling = models.CharField(max_length=100, blank=True)
+    size = models.CharField(max_length=100, blank=True)
+    quantity = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.pickup_date}: {self.quantity} x {self.product_id}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pickup_date', 'product', 'flavor', 'filling', 'size'], name='unique_production_line',
+            ),
+        ]
+
+class DailySales(models.Model):
+    # Sales by the day orders were placed, excluding cancellations; maintained by api.analytics
+    date = models.DateField(unique=True)
+    orders = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    custom_cake_orders = models.PositiveIntegerField(default=0)
+    custom_cake_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    # Set when an order placed that day changes later; the next refresh recomputes the day
+    stale = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.date}: {self.revenue}"
+
+    class Meta:
+        verbose_name_plural = "daily sales"
+        indexes = [
+            models.Index(fields=['date'], condition=models.Q(stale=True), name='dailysales_stale_idx'),
+        ]
+
+class ProductDailySales(models.Model):
+    date = models.DateField()
+    product = models.ForeignKey(Product, related_name='daily_sales', on_delete=models.CASCADE)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='unique_product_daily_sales'),
+        ]
+
+class CategoryDailySales(models.Model):
+    date = models.DateField()
+    category = models.ForeignKey(Category, related_name='daily_sales', on_delete=models.CASCADE)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'category'], name='unique_category_daily_sales'),
+        ]
+
+class SyncCursor(models.Model):
+    # Where each incremental sync with an outside system left off
+    name = models.CharField(max_length=100, unique=True)
+    value = models.CharField(max_length=200, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+class Lease(models.Model):
+    # Cross-process lock for runs that must not overlap, such as the Square sync (see api.leases)
+    name = models.CharField(max_length=100, unique=True)
+    expires_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} until {self.expires_at}"
+
+class Job(models.Model):
+    # Background work run by the run_worker command (see api.jobs)
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    # Enqueueing a key that already exists is a no-op
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    class Meta:
+        indexes = [
+            # Workers only ever scan due, queued jobs
+            models.Index(fields=['run_at', 'id'], condition=models.Q(status='queued'), name='job_due_idx'),
+            models.Index(fields=['status', 'locked_at'], name='job_status_locked_idx'),
+        ]
+
+class IdempotencyKey(models.Model):
+    # First response to each Idempotency-Key sent with an order, replayed to retries (see api.idempotency)
+    key = models.CharField(max_length=255, unique=True)
+    request_hash = models.CharField(max_length=64)
+    # Both null while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.key
+
 class SiteContent(models.Model):
     # Hero Section
     hero_title = models.CharField(max_length=200, default="The Art of Persian Pastry")
@@ -102,6 +293,7 @@ class SiteContent(models.Model):
     about_description = models.TextField(default="Every item at Natalie Bakery is a labor of love...")
     about_side_image = models.ImageField(upload_to='content/about/', null=True, blank=True)
     about_side_image_2 = models.ImageField(upload_to='content/about/', null=True, blank=True)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
 
     # Contact Info
     contact_tagline = models.CharField(max_length=255, default="Visit Our Boutique")
@@ -130,7 +322,9 @@ class SiteContent(models.Model):
 class UIAsset(models.Model):
     key = models.SlugField(unique=True, help_text="Unique identifier for this asset (e.g., 'footer-logo')")
     image = models.ImageField(upload_to='content/ui/')
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     description = models.CharField(max_length=255, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.key
@@ -147,6 +341,7 @@ class SiteFeature(models.Model):
 class SiteGalleryImage(models.Model):
     site_content = models.ForeignKey(SiteContent, related_name='gallery_images', on_delete=models.CASCADE)
     image = models.ImageField(upload_to='content/gallery/')
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     caption = models.CharField(max_length=200, blank=True)
     section = models.CharField(max_length=50, default='story', help_text="e.g. 'story', 'hero', 'footer'")
     order = models.PositiveIntegerField(default=0)
@@ -0,0 +1,176 @@
+import json
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import F, Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+from .search import RankedOrderingFilter
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Seeks past the last row of the previous page using the active ordering,
+    so deep pages cost the same as the first one.
+
+    The primary key is appended to every ordering, so each row has a unique
+    position even where prices tie or created_at is NULL, and the cursor
+    carries the whole (fields..., pk) tuple instead of DRF's first field and
+    an offset. NULLs sort last in either direction.
+    """
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    ordering = '-created_at'
+    tiebreaker = 'id'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = [field for field in super().get_ordering(request, queryset, view) if field.lstrip('-') != self.tiebreaker]
+        descending = ordering[-1].startswith('-') if ordering else False
+        return (*ordering, f'-{self.tiebreaker}' if descending else self.tiebreaker)
+
+    def order_by(self, reverse):
+        # Walking backwards is the mirror image: reversed directions, NULLs first
+        nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+        expressions = []
+        for field in self.ordering:
+            expression = F(field.lstrip('-'))
+            descending = field.startswith('-') != reverse
+            expressions.append(expression.desc(**nulls) if descending else expression.asc(**nulls))
+        return expressions
+
+    def seek(self, position, reverse):
+        """Rows after ``position`` in the walking direction: ties on each leading field broken by the next one."""
+        after, equal = Q(pk__in=[]), Q()
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            if value is None:
+                # Only non-NULL rows follow a NULL, and only when walking backwards
+                beyond = Q(**{f'{name}__isnull': False}) if reverse else Q(pk__in=[])
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                beyond = Q(**{f'{name}__{lookup}': value})
+                if not reverse:
+                    beyond |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            after |= equal & beyond
+            equal &= same
+        return after
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            reverse, current_position = False, None
+        else:
+            reverse, current_position = self.cursor.reverse, self.cursor.position
+
+        queryset = queryset.order_by(*self.order_by(reverse))
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self.seek(self.decode_position(current_position), reverse))
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # One extra row tells whether another page follows
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = current_position is not None, current_position
+            self.has_previous, self.previous_position = following_position is not None, following_position
+        else:
+            self.has_next, self.next_position = following_position is not None, following_position
+            self.has_previous, self.previous_position = current_position is not None, current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def decode_cursor(self, request):
+        # Positions are unique, so the offset DRF keeps for ties is never needed
+        cursor = super().decode_cursor(request)
+        return cursor and cursor._replace(offset=0)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            values.append(None if value is None else str(value))
+        return json.dumps(values)
+
+    def decode_position(self, position):
+        values = json.loads(position)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise ValueError(position)
+        return values
+
+
+class CatalogPagination(LimitOffsetPagination):
+    """
+    ?limit=&offset= pages with a total count.
+    ?cursor= switches to keyset pages (pass it empty for the first page),
+    except for search results in rank order: the rank is no column to seek
+    on, so those stay on limit/offset pages.
+    Without either parameter the full list is returned unpaginated.
+    """
+    max_limit = 100
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.cursor_query_param in request.query_params and not RankedOrderingFilter.ranked(request):
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+def estimated_count(queryset):
+    """
+    The planner's row estimate for ``queryset`` on Postgres: pg_class.reltuples
+    for a whole table, EXPLAIN's top-level row count once it is filtered.
+    None where no statistics exist (SQLite, or a table never analyzed).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    if not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        return int(row[0]) if row and row[0] >= 0 else None
+    return int(json.loads(queryset.order_by().explain(format='json'))[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin changelist paginator that shows the planner's estimate instead of
+    running COUNT(*) over a large table. Below ``exact_below`` rows, or with
+    no estimate available, the count is exact.
+    """
+    exact_below = 50_000
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < self.exact_below:
+            return super().count
+        return estimate
@@ -0,0 +1,102 @@
+from decimal import Decimal
+from .cache import get_version, model_token
+from .models import Product, CakeOption
+
+CENT = Decimal('0.01')
+
+# OrderItem stores the chosen options by name, so modifiers are looked up by
+# (product_id, option_type, option_name) rather than by option id.
+OPTION_FIELDS = (
+    ('flavor', 'FLAVOR'),
+    ('filling', 'FILLING'),
+    ('size', 'SIZE'),
+)
+
+
+class PricingError(Exception):
+    """Raised when a line references a product or option that cannot be priced."""
+
+
+class PriceTable:
+    """
+    Every product's base price and every option modifier it offers, held in
+    plain dicts so pricing a line never touches the database.
+    """
+
+    def __init__(self, products, modifiers):
+        self.products = products
+        self.modifiers = modifiers
+
+    @classmethod
+    def build(cls, product_ids=None):
+        """Read the whole catalog, or only ``product_ids`` for a one-off check against the live rows."""
+        products = Product.objects.all()
+        links = Product.available_options.through.objects.all()
+        if product_ids is not None:
+            products = products.filter(id__in=product_ids)
+            links = links.filter(product_id__in=product_ids)
+        products = {row['id']: row for row in products.values('id', 'price', 'unit', 'is_custom_cake')}
+        modifiers = {
+            (row['product_id'], row['cakeoption__option_type'], row['cakeoption__name']): row['cakeoption__price_modifier']
+            for row in links.values(
+                'product_id', 'cakeoption__option_type', 'cakeoption__name', 'cakeoption__price_modifier'
+            )
+        }
+        return cls(products, modifiers)
+
+    def unit_price(self, product_id, flavor=None, filling=None, size=None):
+        product = self.products.get(product_id)
+        if product is None:
+            raise PricingError(f"Unknown product {product_id}.")
+
+        price = product['price']
+        chosen = {'flavor': flavor, 'filling': filling, 'size': size}
+        for field, option_type in OPTION_FIELDS:
+            name = chosen[field]
+            if not name:
+                continue
+            modifier = self.modifiers.get((product_id, option_type, name))
+            if modifier is None:
+                raise PricingError(f"'{name}' is not an available {field} for this product.")
+            price += modifier
+        return price.quantize(CENT)
+
+    def quote(self, lines):
+        """
+        Price a list of ``{'product', 'quantity', 'flavor', 'filling', 'size'}``
+        dicts. Returns the priced lines and the order total.
+        """
+        priced = []
+        total = Decimal('0')
+        for line in lines:
+            product_id = line['product']
+            unit_price = self.unit_price(
+                product_id, line.get('flavor'), line.get('filling'), line.get('size')
+            )
+            line_total = unit_price * line['quantity']
+            total += line_total
+            priced.append({
+                'product': product_id,
+                'quantity': line['quantity'],
+                'unit': self.products[product_id]['unit'],
+                'unit_price': unit_price,
+                'line_total': line_total.quantize(CENT),
+            })
+        return priced, total.quantize(CENT)
+
+
+_table = None
+_table_versions = None
+
+
+def get_price_table():
+    """
+    Return the process-wide price table, rebuilding it only when a Product,
+    CakeOption or product/option link has changed since it was built.
+    """
+    global _table, _table_versions
+    versions = (get_version(model_token(Product)), get_version(model_token(CakeOption)))
+    if _table is None or versions != _table_versions:
+        _table = PriceTable.build()
+        _table_versions = versions
+    return _table
@@ -0,0 +1,157 @@
+import operator
+from collections import Counter
+from datetime import datetime, time, timedelta
+from functools import reduce
+from django.db import transaction
+from django.db.models import Case, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from .models import Order, OrderItem, ProductionLine
+
+# Orders in these statuses are not baked
+SKIPPED_STATUSES = ('Cancelled',)
+OPTIONS = ('flavor', 'filling', 'size')
+KEY_FIELDS = ('pickup_date', 'product_id') + OPTIONS
+REBUILD_BATCH = 1000
+
+
+def counted(status):
+    return status not in SKIPPED_STATUSES
+
+
+def pickup_date(pickup_datetime):
+    return timezone.localtime(pickup_datetime).date()
+
+
+def line_values(item):
+    return {'product_id': item.product_id, 'quantity': item.quantity, **{name: getattr(item, name) for name in OPTIONS}}
+
+
+def _key(day, line):
+    return (day, line['product_id'], *(line[name] or '' for name in OPTIONS))
+
+
+def apply(deltas):
+    """
+    Add ``{(pickup_date, product_id, flavor, filling, size): quantity}`` to
+    the plan in two statements however many lines change. Missing rows are
+    inserted at zero first, then all of them move in one atomic
+    UPDATE ... SET quantity = quantity + CASE ..., so concurrent orders for
+    the same line never overwrite each other. Both statements take the rows
+    in key order, so two orders sharing lines cannot deadlock on Postgres.
+    """
+    deltas = sorted((key, quantity) for key, quantity in deltas.items() if quantity)
+    if not deltas:
+        return
+    matches = [(Q(**dict(zip(KEY_FIELDS, key))), quantity) for key, quantity in deltas]
+    with transaction.atomic(savepoint=False):
+        ProductionLine.objects.bulk_create(
+            [ProductionLine(**dict(zip(KEY_FIELDS, key))) for key, _ in deltas], ignore_conflicts=True,
+        )
+        # An UPDATE locks rows in scan order; lock them in key order first
+        locked = ProductionLine.objects.filter(reduce(operator.or_, (match for match, _ in matches)))
+        locked = locked.order_by(*KEY_FIELDS).select_for_update().values('pk')
+        ProductionLine.objects.filter(pk__in=locked).update(
+            quantity=F('quantity') + Case(*(When(match, then=Value(quantity)) for match, quantity in matches), default=Value(0)),
+        )
+
+
+def _order_deltas(order_id, day, sign):
+    deltas = Counter()
+    for line in OrderItem.objects.filter(order_id=order_id).values('product_id', 'quantity', *OPTIONS):
+        deltas[_key(day, line)] += sign * line['quantity']
+    return deltas
+
+
+def add_order(order):
+    """Count a new order whose lines were written without signals (bulk_create)."""
+    if counted(order.status):
+        apply(_order_deltas(order.pk, pickup_date(order.pickup_datetime), 1))
+
+
+def move_order(order, previous):
+    """Follow a status or pickup change; ``previous`` holds the order's old status and pickup_datetime."""
+    was, now = counted(previous['status']), counted(order.status)
+    old_day, new_day = pickup_date(previous['pickup_datetime']), pickup_date(order.pickup_datetime)
+    if was == now and (not now or old_day == new_day):
+        return
+    deltas = Counter()
+    if was:
+        deltas.update(_order_deltas(order.pk, old_day, -1))
+    if now:
+        deltas.update(_order_deltas(order.pk, new_day, 1))
+    apply(deltas)
+
+
+def change_line(order_id, before=None, after=None):
+    """Swap one order line's contribution: ``before`` and ``after`` are line_values(), None when absent."""
+    order = Order.objects.filter(pk=order_id).values('status', 'pickup_datetime').first()
+    if order is None or not counted(order['status']):
+        return
+    day = pickup_date(order['pickup_datetime'])
+    deltas = Counter()
+    if before:
+        deltas[_key(day, before)] -= before['quantity']
+    if after:
+        deltas[_key(day, after)] += after['quantity']
+    apply(deltas)
+
+
+def rebuild(start=None, end=None):
+    """
+    Recompute the plan from the orders themselves, for every day or for the
+    ``start``..``end`` dates (inclusive). Returns the number of lines written.
+    """
+    lines = ProductionLine.objects.all()
+    items = OrderItem.objects.exclude(order__status__in=SKIPPED_STATUSES)
+    if start:
+        lines = lines.filter(pickup_date__gte=start)
+        items = items.filter(order__pickup_datetime__gte=timezone.make_aware(datetime.combine(start, time.min)))
+    if end:
+        lines = lines.filter(pickup_date__lte=end)
+        items = items.filter(order__pickup_datetime__lt=timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min)))
+    totals = (
+        items.annotate(
+            pickup_date=TruncDate('order__pickup_datetime', tzinfo=timezone.get_current_timezone()),
+            **{f'{name}_key': Coalesce(name, Value('')) for name in OPTIONS},
+        )
+        .values('pickup_date', 'product_id', *(f'{name}_key' for name in OPTIONS))
+        .annotate(total=Sum('quantity'))
+        .order_by()
+    )
+    written, batch = 0, []
+    with transaction.atomic():
+        lines.delete()
+        for row in totals.iterator(chunk_size=REBUILD_BATCH):
+            batch.append(ProductionLine(
+                pickup_date=row['pickup_date'], product_id=row['product_id'], quantity=row['total'],
+                **{name: row[f'{name}_key'] for name in OPTIONS},
+            ))
+            if len(batch) >= REBUILD_BATCH:
+                written += len(ProductionLine.objects.bulk_create(batch))
+                batch = []
+        written += len(ProductionLine.objects.bulk_create(batch))
+    return written
+
+
+def plan(day):
+    """
+    Everything due on ``day``, grouped by product with a line per option
+    combination. Reads only that day's rows of the unique index.
+    """
+    lines = (
+        ProductionLine.objects.filter(pickup_date=day, quantity__gt=0)
+        .select_related('product__category')
+        .order_by('product__category__name', 'product__name', 'product_id', *OPTIONS)
+    )
+    products = {}
+    for line in lines:
+        entry = products.get(line.product_id)
+        if entry is None:
+            entry = products[line.product_id] = {
+                'product': line.product_id, 'name': line.product.name, 'category': line.product.category.name,
+                'unit': line.product.unit, 'quantity': 0, 'variants': [],
+            }
+        entry['quantity'] += line.quantity
+        entry['variants'].append({**{name: getattr(line, name) for name in OPTIONS}, 'quantity': line.quantity})
+    return list(products.values())
@@ -0,0 +1,150 @@
+import re
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from .models import Order, PickupSlot
+
+# Keys of BAKERY_METADATA['HOURS'] mapped to the weekdays they cover (Monday is 0)
+DAY_GROUPS = {
+    'MON_SAT': range(0, 6),
+    'SUN': (6,),
+}
+TIME_PATTERN = re.compile(r'(\d{1,2}):(\d{2})\s*([AP]M)', re.IGNORECASE)
+
+
+class SlotUnavailable(Exception):
+    """Raised when a pickup time is outside opening hours or its window is full."""
+
+
+def _parse_time(match):
+    hour, minute, meridiem = int(match.group(1)), int(match.group(2)), match.group(3).upper()
+    if meridiem == 'PM' and hour != 12:
+        hour += 12
+    elif meridiem == 'AM' and hour == 12:
+        hour = 0
+    return time(hour, minute)
+
+
+@lru_cache(maxsize=None)
+def opening_hours():
+    """Return ``{weekday: (opens, closes)}`` parsed from the bakery metadata."""
+    hours = {}
+    for group, text in settings.BAKERY_METADATA['HOURS'].items():
+        opens, closes = [_parse_time(m) for m in TIME_PATTERN.finditer(text)]
+        for weekday in DAY_GROUPS[group]:
+            hours[weekday] = (opens, closes)
+    return hours
+
+
+def interval():
+    return timedelta(minutes=settings.PICKUP_SLOTS['INTERVAL_MINUTES'])
+
+
+def slot_starts(day):
+    """Start times of every pickup window on ``day``."""
+    hours = opening_hours().get(day.weekday())
+    if hours is None:
+        return []
+    opens, closes = (datetime.combine(day, t) for t in hours)
+    starts = []
+    while opens + interval() <= closes:
+        starts.append(opens.time())
+        opens += interval()
+    return starts
+
+
+def slot_key(pickup_datetime):
+    """Return the ``(date, start)`` window containing ``pickup_datetime``, or None if the bakery is closed."""
+    local = timezone.localtime(pickup_datetime).replace(tzinfo=None)
+    hours = opening_hours().get(local.weekday())
+    if hours is None:
+        return None
+    opens, closes = (datetime.combine(local.date(), t) for t in hours)
+    if local < opens:
+        return None
+    start = opens + (local - opens) // interval() * interval()
+    if start + interval() > closes:
+        return None
+    return local.date(), start.time()
+
+
+def product_class_for(products):
+    return 'custom_cake' if any(p.is_custom_cake for p in products) else 'regular'
+
+
+def ensure_slots(day):
+    """Create the day's slot rows on first use; existing rows are left untouched."""
+    capacities = settings.PICKUP_SLOTS['CAPACITY']
+    PickupSlot.objects.bulk_create(
+        [
+            PickupSlot(date=day, start=start, product_class=product_class, capacity=capacity)
+            for product_class, capacity in capacities.items()
+            for start in slot_starts(day)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def get_slot(pickup_datetime, product_class):
+    key = slot_key(pickup_datetime)
+    if key is None:
+        raise SlotUnavailable("Pickup time is outside our opening hours.")
+    day, start = key
+    lookup = PickupSlot.objects.filter(date=day, start=start, product_class=product_class)
+    slot = lookup.first()
+    if slot is None:
+        ensure_slots(day)
+        slot = lookup.get()
+    return slot
+
+
+def reserve(order, product_class, force=False):
+    """
+    Book one place in the order's pickup window. The conditional UPDATE is
+    atomic and locks only the slot row on Postgres, so concurrent checkouts
+    can never push ``booked`` past ``capacity``. ``force`` skips the capacity
+    check for staff edits.
+    """
+    slot = get_slot(order.pickup_datetime, product_class)
+    booking = PickupSlot.objects.filter(pk=slot.pk)
+    if not force:
+        booking = booking.filter(booked__lt=F('capacity'))
+    if not booking.update(booked=F('booked') + 1):
+        raise SlotUnavailable("This pickup window is fully booked. Please choose another time.")
+    Order.objects.filter(pk=order.pk).update(pickup_slot=slot)
+    order.pickup_slot = slot
+    return slot
+
+
+def release(order):
+    if order.pickup_slot_id is None:
+        return
+    PickupSlot.objects.filter(pk=order.pickup_slot_id, booked__gt=0).update(booked=F('booked') - 1)
+    Order.objects.filter(pk=order.pk).update(pickup_slot=None)
+    order.pickup_slot = None
+
+
+def order_product_class(order):
+    return 'custom_cake' if order.items.filter(product__is_custom_cake=True).exists() else 'regular'
+
+
+def availability(day, product_class='regular'):
+    """Every window on ``day`` with its remaining capacity."""
+    slots = list(PickupSlot.objects.filter(date=day, product_class=product_class))
+    if len(slots) < len(slot_starts(day)):
+        ensure_slots(day)
+        slots = list(PickupSlot.objects.filter(date=day, product_class=product_class))
+    now = timezone.localtime()
+    return [
+        {
+            'start': slot.start,
+            'end': (datetime.combine(day, slot.start) + interval()).time(),
+            'product_class': slot.product_class,
+            'capacity': slot.capacity,
+            'remaining': max(slot.capacity - slot.booked, 0),
+            'available': slot.booked < slot.capacity and timezone.make_aware(datetime.combine(day, slot.start)) > now,
+        }
+        for slot in slots
+    ]
@@ -0,0 +1,97 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+WORD_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# SQLite's FTS5 trigram tokenizer arrived in 3.34
+SQLITE_TRIGRAM = connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 34)
+
+# The search schema itself (a generated tsvector column on Postgres, FTS5 tables
+# kept in sync by triggers on SQLite) is created by migration 0012_product_search.
+# SQLite rebuilds api_product for many ALTERs, which silently drops those
+# triggers: a migration doing that drops and recreates the search tables around
+# its operations with its own copy of the SQL, as 0018_daily_stock does.
+
+
+def _postgres_search(queryset, term):
+    tsquery = "websearch_to_tsquery('english', %s)"
+    match = RawSQL(
+        f'"api_product"."search_vector" @@ {tsquery} OR %s <%% "api_product"."name"',
+        [term, term], output_field=BooleanField(),
+    )
+    rank = RawSQL(
+        f'ts_rank_cd("api_product"."search_vector", {tsquery}) + word_similarity(%s, "api_product"."name")',
+        [term, term], output_field=FloatField(),
+    )
+    # <% honours pg_trgm.word_similarity_threshold, set per connection in api.signals
+    return queryset.filter(match).annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+
+
+def _ranked_rowids(table, fts_query, weights):
+    """Best matches first, ranked once inside the FTS5 index."""
+    sql = (
+        f"SELECT rowid FROM {table} WHERE {table} MATCH %s "
+        f"ORDER BY bm25({table}, {weights}) LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [fts_query, settings.PRODUCT_SEARCH_MAX_RESULTS])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _sqlite_search(queryset, words):
+    # Quote every word so FTS5 operators typed by users are treated as plain text
+    ids = _ranked_rowids('api_product_fts', ' '.join(f'"{w}"*' for w in words), '10.0, 1.0')
+    if not ids and SQLITE_TRIGRAM:
+        # Typo fallback: rank by how many of the term's trigrams each name shares
+        trigrams = sorted({w[i:i + 3] for w in words for i in range(len(w) - 2)})
+        if trigrams:
+            ids = _ranked_rowids('api_product_trgm', ' OR '.join(f'"{t}"' for t in trigrams), '1.0')
+    if not ids:
+        return queryset.none()
+    # Position of each id in the ranked list, so the best match gets the highest rank
+    positions = ',' + ','.join(map(str, ids)) + ','
+    rank = RawSQL(
+        "-instr(%s, ',' || \"api_product\".\"id\" || ',')", [positions], output_field=FloatField()
+    )
+    return queryset.filter(id__in=ids).annotate(search_rank=rank).order_by('-search_rank', '-created_at')
+
+
+def search_products(queryset, term):
+    """Filter ``queryset`` to products matching ``term``, best matches first."""
+    words = [w.lower() for w in WORD_PATTERN.findall(term)]
+    if not words:
+        return queryset.none()
+    if connection.vendor == 'postgresql':
+        return _postgres_search(queryset, ' '.join(words))
+    return _sqlite_search(queryset, words)
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """?search= backed by the database's full-text index instead of ILIKE scans."""
+
+    def filter_queryset(self, request, queryset, view):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            return super().filter_queryset(request, queryset, view)
+        term = ' '.join(self.get_search_terms(request))
+        if not term:
+            return queryset
+        return search_products(queryset, term)
+
+
+class RankedOrderingFilter(filters.OrderingFilter):
+    """Leaves search results in rank order unless the client asks for an explicit ?ordering=."""
+
+    @classmethod
+    def ranked(cls, request):
+        """True when the results come back in rank order, which no column can seek through."""
+        return bool(request.query_params.get(api_settings.SEARCH_PARAM)) and not request.query_params.get(cls.ordering_param)
+
+    def get_ordering(self, request, queryset, view):
+        if self.ranked(request):
+            return None
+        return super().get_ordering(request, queryset, view)
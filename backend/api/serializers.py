@@ -1,7 +1,13 @@
-from rest_framework import serializers
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+from django.conf import settings
 from .models import Category, Product, CakeOption, Order, OrderItem, SiteContent, UIAsset, SiteFeature, SiteGalleryImage
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
+from .fieldsets import SparseFieldsMixin
+from .pricing import PriceTable, PricingError, get_price_table
+from . import images, inventory, production, scheduling
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -13,30 +19,222 @@ class CakeOptionSerializer(serializers.ModelSerializer):
         model = CakeOption
         fields = '__all__'
 
-class ProductSerializer(serializers.ModelSerializer):
+class ResponsiveImagesMixin:
+    """
+    Adds ``<field>_srcset`` next to each image field, a ``{format: srcset}``
+    map of the rendered derivatives, and ``<field>_placeholder``, a tiny
+    blurred data URI to inline while it loads. Both are None until rendered.
+    """
+    @classmethod
+    def extra_field_names(cls):
+        return [f'{field}_{suffix}' for field in images.IMAGE_FIELDS[cls.Meta.model] for suffix in ('srcset', 'placeholder')]
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        request = self.context.get('request')
+        build_url = request.build_absolute_uri if request else None
+        selection = getattr(self, 'field_selection', None)
+        for field_name in images.IMAGE_FIELDS[type(instance)]:
+            if selection is None or f'{field_name}_srcset' in selection:
+                data[f'{field_name}_srcset'] = images.srcsets(instance, field_name, build_url)
+            if selection is None or f'{field_name}_placeholder' in selection:
+                data[f'{field_name}_placeholder'] = images.placeholder(instance, field_name)
+        return data
+
+class ProductSerializer(SparseFieldsMixin, ResponsiveImagesMixin, serializers.ModelSerializer):
     category_name = serializers.ReadOnlyField(source='category.name')
     available_options = CakeOptionSerializer(many=True, read_only=True)
+    # Left of the pickup day's batch (see api.inventory.with_availability); None when unlimited
+    available_quantity = serializers.IntegerField(read_only=True, allow_null=True)
     
     class Meta:
         model = Product
-        fields = '__all__'
+        exclude = ('image_derivatives',)
+
+class LeanProductListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        rows = list(data)
+        if self.child.wants('available_options'):
+            self.child.load_options([row['id'] for row in rows])
+        return [self.child.to_representation(row) for row in rows]
+
+class LeanProductSerializer(serializers.BaseSerializer):
+    """
+    Read-only twin of ProductSerializer for the FAST_JSON mode. It formats
+    ``.values()`` rows directly instead of walking model instances through
+    per-field serializers, and must produce the same keys, order and bytes.
+    """
+    # Output keys in ProductSerializer order, and the columns each one reads
+    COLUMNS = {
+        'id': ('id',),
+        'category_name': ('category__name',),
+        'available_options': (),
+        'available_quantity': ('available_quantity',),
+        'name': ('name',),
+        'slug': ('slug',),
+        'description': ('description',),
+        'price': ('price',),
+        'image': ('image',),
+        'unit': ('unit',),
+        'daily_batch': ('daily_batch',),
+        'is_custom_cake': ('is_custom_cake',),
+        'is_featured': ('is_featured',),
+        'square_id': ('square_id',),
+        'created_at': ('created_at',),
+        'updated_at': ('updated_at',),
+        'category': ('category_id',),
+        'image_srcset': ('image', 'image_derivatives'),
+        'image_placeholder': ('image', 'image_derivatives'),
+    }
+    decimal = serializers.DecimalField(max_digits=10, decimal_places=2)
+    datetime = serializers.DateTimeField()
+
+    class Meta:
+        list_serializer_class = LeanProductListSerializer
+
+    @classmethod
+    def sparse_field_names(cls):
+        return list(cls.COLUMNS)
+
+    @classmethod
+    def rows(cls, queryset, selection=None):
+        keys = selection.filter(cls.COLUMNS) if selection is not None else cls.COLUMNS
+        # id is always read: options are matched to rows by it
+        columns = dict.fromkeys(['id', *(column for key in keys for column in cls.COLUMNS[key])])
+        return queryset.prefetch_related(None).values(*columns)
+
+    def wants(self, key):
+        selection = self.context.get('field_selection')
+        return selection is None or key in selection
+
+    def format_datetime(self, value):
+        # DRF's DateTimeField resolves the current timezone on every call; do it once per page
+        if value is None:
+            return None
+        if api_settings.DATETIME_FORMAT != ISO_8601 or not settings.USE_TZ or timezone.is_naive(value):
+            return self.datetime.to_representation(value)
+        if not hasattr(self, 'tz'):
+            self.tz = timezone.get_current_timezone()
+        value = value.astimezone(self.tz).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    def load_options(self, product_ids):
+        # Links and options are read separately so each option is converted and formatted
+        # once, however many products on the page carry it
+        through = Product.available_options.through
+        links = list(through.objects.filter(product_id__in=product_ids).values_list('product_id', 'cakeoption_id'))
+        formatted = {
+            option['id']: {
+                'id': option['id'],
+                'option_type': option['option_type'],
+                'name': option['name'],
+                'price_modifier': self.decimal.to_representation(option['price_modifier']),
+                'updated_at': self.format_datetime(option['updated_at']),
+            }
+            for option in CakeOption.objects.filter(id__in={o for _, o in links}).order_by('id').values()
+        } if links else {}
+        self.options = {}
+        for product_id, option_id in sorted(links, key=lambda link: link[1]):
+            self.options.setdefault(product_id, []).append(formatted[option_id])
+
+    def image_url(self, row, build_url):
+        image = row['image']
+        if not image:
+            return None
+        url = Product._meta.get_field('image').storage.url(image)
+        return build_url(url) if build_url else url
+
+    def image_entry(self, row):
+        image, entry = row['image'], (row['image_derivatives'] or {}).get('image')
+        return entry if image and entry and entry.get('source') == image else None
+
+    def to_representation(self, row):
+        if not hasattr(self, 'builders'):
+            self.builders = self.get_builders()
+        if self.wants('available_options') and not hasattr(self, 'options'):
+            self.load_options([row['id']])
+        return {key: build(row) for key, build in self.builders}
+
+    def get_builders(self):
+        request = self.context.get('request')
+        build_url = request.build_absolute_uri if request else None
+        storage = Product._meta.get_field('image').storage
+        datetime = self.format_datetime
+        builders = {
+            'id': lambda row: row['id'],
+            'category_name': lambda row: row['category__name'],
+            'available_options': lambda row: self.options.get(row['id'], []),
+            'price': lambda row: self.decimal.to_representation(row['price']),
+            'image': lambda row: self.image_url(row, build_url),
+            'created_at': lambda row: datetime(row['created_at']),
+            'updated_at': lambda row: datetime(row['updated_at']),
+            'category': lambda row: row['category_id'],
+            'image_srcset': lambda row: images.srcsets_for(storage, row['image'], self.image_entry(row), build_url),
+            'image_placeholder': lambda row: (self.image_entry(row) or {}).get('placeholder'),
+        }
+        return [
+            (key, builders.get(key) or (lambda row, key=key: row[key]))
+            for key in self.COLUMNS if self.wants(key)
+        ]
+
+class PrefetchedProductField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolves product ids from the ``products`` map that OrderSerializer loads
+    in one query, instead of running a lookup per line item.
+    """
+    def to_internal_value(self, data):
+        products = self.context.get('products')
+        if products is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            product = products.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if product is None:
+            self.fail('does_not_exist', pk_value=data)
+        return product
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    product = PrefetchedProductField(queryset=Product.objects.all())
+
     class Meta:
         model = OrderItem
         fields = ('product', 'quantity', 'flavor', 'filling', 'size', 'price')
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
 
     class Meta:
         model = Order
         fields = ('id', 'customer_name', 'email', 'phone', 'total_price', 'pickup_datetime', 'status', 'items')
 
+    def to_internal_value(self, data):
+        # Load every referenced product in a single query before the items are validated
+        items = data.get('items') if hasattr(data, 'get') else None
+        if isinstance(items, list):
+            ids = set()
+            for item in items:
+                try:
+                    ids.add(int(item['product']))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            self.context['products'] = Product.objects.in_bulk(ids)
+        return super().to_internal_value(data)
+
     def validate(self, data):
         pickup_datetime = data.get('pickup_datetime')
         items_data = data.get('items')
 
+        if items_data is None:
+            # Partial updates (status changes, rescheduling) carry no items to re-check
+            if pickup_datetime and pickup_datetime < timezone.now():
+                raise serializers.ValidationError({
+                    "pickup_datetime": "Pickup time cannot be in the past."
+                })
+            return data
+
         # Check for custom cakes
         has_custom_cake = False
         for item in items_data:
@@ -58,34 +256,110 @@ class OrderSerializer(serializers.ModelSerializer):
                 "pickup_datetime": "Pickup time cannot be in the past."
             })
 
+        # Cheap single-row check for a friendly error; create() books the place atomically
+        product_class = scheduling.product_class_for(item['product'] for item in items_data)
+        try:
+            slot = scheduling.get_slot(pickup_datetime, product_class)
+        except scheduling.SlotUnavailable as e:
+            raise serializers.ValidationError({"pickup_datetime": str(e)})
+        if slot.booked >= slot.capacity:
+            raise serializers.ValidationError({
+                "pickup_datetime": "This pickup window is fully booked. Please choose another time."
+            })
+
+        self.validate_prices(data)
         return data
 
+    def validate_prices(self, data):
+        # Prices come from the client, so recompute them from the catalog and reject any mismatch
+        lines = [dict(item, product=item['product'].id) for item in data['items']]
+        try:
+            priced, total = get_price_table().quote(lines)
+            agrees = data['total_price'] == total and all(item['price'] == line['unit_price'] for item, line in zip(data['items'], priced))
+        except PricingError:
+            agrees = False
+        if not agrees:
+            # The shared table may predate a price change that has just committed; judge by the live rows
+            try:
+                priced, total = PriceTable.build({line['product'] for line in lines}).quote(lines)
+            except PricingError as e:
+                raise serializers.ValidationError({"items": str(e)})
+
+        for item, line in zip(data['items'], priced):
+            if item['price'] != line['unit_price']:
+                raise serializers.ValidationError({
+                    "items": f"Price for {item['product'].name} should be {line['unit_price']}."
+                })
+        if data['total_price'] != total:
+            raise serializers.ValidationError({
+                "total_price": f"Order total should be {total}."
+            })
+
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
+        product_class = scheduling.product_class_for(item['product'] for item in items_data)
+        with transaction.atomic():
+            order = Order.objects.create(**validated_data)
+            OrderItem.objects.bulk_create([OrderItem(order=order, **item_data) for item_data in items_data])
+            production.add_order(order)
+            try:
+                if order.status not in inventory.RELEASED_STATUSES:
+                    inventory.reserve(
+                        inventory.pickup_date(order.pickup_datetime),
+                        [(item['product'], item['quantity']) for item in items_data],
+                    )
+                scheduling.reserve(order, product_class)
+            except inventory.OutOfStock as e:
+                # Raised inside the atomic block so the order, its items and any stock taken are rolled back
+                raise serializers.ValidationError({"items": [str(e)]})
+            except scheduling.SlotUnavailable as e:
+                raise serializers.ValidationError({"pickup_datetime": str(e)})
         return order
 
+class QuoteItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
+    flavor = serializers.CharField(max_length=100, required=False, allow_null=True, allow_blank=True)
+    filling = serializers.CharField(max_length=100, required=False, allow_null=True, allow_blank=True)
+    size = serializers.CharField(max_length=100, required=False, allow_null=True, allow_blank=True)
+
+class QuoteSerializer(serializers.Serializer):
+    items = QuoteItemSerializer(many=True, allow_empty=False)
+
+class QuoteLineSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    unit = serializers.CharField()
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    line_total = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+class PickupSlotAvailabilitySerializer(serializers.Serializer):
+    start = serializers.TimeField(format='%H:%M')
+    end = serializers.TimeField(format='%H:%M')
+    product_class = serializers.CharField()
+    capacity = serializers.IntegerField()
+    remaining = serializers.IntegerField()
+    available = serializers.BooleanField()
+
 class SiteFeatureSerializer(serializers.ModelSerializer):
     class Meta:
         model = SiteFeature
         fields = '__all__'
 
-class SiteGalleryImageSerializer(serializers.ModelSerializer):
+class SiteGalleryImageSerializer(ResponsiveImagesMixin, serializers.ModelSerializer):
     class Meta:
         model = SiteGalleryImage
-        fields = '__all__'
+        exclude = ('image_derivatives',)
 
-class SiteContentSerializer(serializers.ModelSerializer):
+class SiteContentSerializer(SparseFieldsMixin, ResponsiveImagesMixin, serializers.ModelSerializer):
     features = SiteFeatureSerializer(many=True, read_only=True)
     gallery_images = SiteGalleryImageSerializer(many=True, read_only=True)
 
     class Meta:
         model = SiteContent
-        fields = '__all__'
+        exclude = ('image_derivatives',)
 
-class UIAssetSerializer(serializers.ModelSerializer):
+class UIAssetSerializer(ResponsiveImagesMixin, serializers.ModelSerializer):
     class Meta:
         model = UIAsset
-        fields = '__all__'
+        exclude = ('image_derivatives',)
@@ -0,0 +1,175 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from .cache import SITE_CONTENT_CACHE, bump_version_on_commit, model_token
+from . import analytics, catalog, images, inventory, production, scheduling, tasks
+from .models import Category, Product, CakeOption, DailyStock, Order, OrderItem, UIAsset, SiteContent, SiteFeature, SiteGalleryImage
+
+
+def render_image_derivatives(sender, instance, raw=False, **kwargs):
+    # Rendered once the save commits, so a rolled-back save leaves no files behind. Connected
+    # ahead of the cache receivers below, so their commit-time bumps follow the new srcsets
+    if not raw and settings.IMAGE_DERIVATIVES['ON_UPLOAD']:
+        transaction.on_commit(lambda: images.refresh(instance), robust=True)
+
+
+def delete_image_derivatives(sender, instance, **kwargs):
+    for field_name, entry in (instance.image_derivatives or {}).items():
+        images.delete_derivatives(getattr(instance, field_name).storage, entry)
+
+
+for model in images.IMAGE_FIELDS:
+    post_save.connect(render_image_derivatives, sender=model, dispatch_uid=f'derivatives-{model.__name__}')
+    post_delete.connect(delete_image_derivatives, sender=model, dispatch_uid=f'derivatives-delete-{model.__name__}')
+
+
+@receiver([post_save, post_delete], sender=SiteContent)
+@receiver([post_save, post_delete], sender=SiteFeature)
+@receiver([post_save, post_delete], sender=SiteGalleryImage)
+def invalidate_site_content(sender, **kwargs):
+    bump_version_on_commit(SITE_CONTENT_CACHE)
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=CakeOption)
+@receiver([post_save, post_delete], sender=UIAsset)
+@receiver([post_save, post_delete], sender=DailyStock)
+def bump_model_token(sender, **kwargs):
+    bump_version_on_commit(model_token(sender))
+    if sender in catalog.SOURCES:
+        transaction.on_commit(catalog.refresh)
+
+
+@receiver(m2m_changed, sender=Product.available_options.through)
+def bump_product_options(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # clear() reports no pk_set; remember whose links go
+        instance._unlinked_products = list(instance.products.values_list('pk', flat=True))
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        product_ids = [instance.pk]
+    elif action == 'post_clear':
+        product_ids = getattr(instance, '_unlinked_products', [])
+    else:
+        product_ids = pk_set
+    # Link rows carry no timestamp; stamping their products lets the catalog re-read just those links
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+    bump_version_on_commit(model_token(Product))
+    transaction.on_commit(catalog.refresh)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_schedule(sender, instance, **kwargs):
+    instance._previous_schedule = None
+    if instance.pk:
+        instance._previous_schedule = Order.objects.filter(pk=instance.pk).values('status', 'pickup_datetime').first()
+
+
+@receiver(post_save, sender=Order)
+def move_order_slot(sender, instance, created, **kwargs):
+    """Keep slot occupancy in step when staff cancel, reinstate or reschedule an order."""
+    previous = getattr(instance, '_previous_schedule', None)
+    if created or previous is None:
+        return
+    was_cancelled = previous['status'] == 'Cancelled'
+    is_cancelled = instance.status == 'Cancelled'
+    if is_cancelled:
+        scheduling.release(instance)
+    elif was_cancelled or previous['pickup_datetime'] != instance.pickup_datetime:
+        scheduling.release(instance)
+        try:
+            scheduling.reserve(instance, scheduling.order_product_class(instance), force=True)
+        except scheduling.SlotUnavailable:
+            pass  # outside opening hours: the order simply holds no slot
+
+
+@receiver(post_save, sender=Order)
+def move_order_production(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_schedule', None)
+    if not created and not raw and previous is not None:
+        production.move_order(instance, previous)
+
+
+@receiver(post_save, sender=Order)
+def move_order_stock(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_schedule', None)
+    if not created and not raw and previous is not None:
+        inventory.move_order(instance, previous)
+
+
+def mark_sales_stale(order_id=None, created_at=None):
+    created_at = created_at or Order.objects.filter(pk=order_id).values_list('created_at', flat=True).first()
+    if created_at and analytics.mark_stale(created_at):
+        tasks.enqueue_sales_refresh()
+
+
+@receiver(post_save, sender=Order)
+def update_sales_for_status(sender, instance, created, raw=False, **kwargs):
+    """Orders cancelled or reinstated after their day was rolled up send the day back for a refresh."""
+    previous = getattr(instance, '_previous_schedule', None)
+    if created or raw or previous is None:
+        return
+    if (previous['status'] in analytics.SKIPPED_STATUSES) != (instance.status in analytics.SKIPPED_STATUSES):
+        mark_sales_stale(created_at=instance.created_at)
+
+
+@receiver(post_delete, sender=Order)
+def update_sales_for_delete(sender, instance, **kwargs):
+    mark_sales_stale(created_at=instance.created_at)
+
+
+@receiver(pre_save, sender=OrderItem)
+def remember_order_line(sender, instance, raw=False, **kwargs):
+    instance._previous_line = None
+    if instance.pk and not raw:
+        instance._previous_line = OrderItem.objects.filter(pk=instance.pk).values(
+            'product_id', 'quantity', *production.OPTIONS,
+        ).first()
+
+
+@receiver(post_save, sender=OrderItem)
+def update_production_line(sender, instance, raw=False, **kwargs):
+    """Order lines saved one at a time (admin inlines) adjust the production plan, stock and sales rollups; bulk creates call production.add_order."""
+    if not raw:
+        production.change_line(instance.order_id, instance._previous_line, production.line_values(instance))
+        inventory.change_line(instance.order_id, instance._previous_line, production.line_values(instance))
+        mark_sales_stale(instance.order_id)
+
+
+@receiver(post_delete, sender=OrderItem)
+def remove_production_line(sender, instance, **kwargs):
+    # Runs before a cascading delete removes the order row, so the order's status is still readable
+    production.change_line(instance.order_id, before=production.line_values(instance))
+    inventory.change_line(instance.order_id, before=production.line_values(instance))
+    mark_sales_stale(instance.order_id)
+
+
+@receiver(post_save, sender=Order)
+def enqueue_order_jobs(sender, instance, created, raw=False, **kwargs):
+    """Queue the confirmation email, kitchen ticket and Square push; they run once the order commits."""
+    if raw:
+        return
+    if created:
+        tasks.enqueue_order_jobs(instance)
+    tasks.enqueue_square_push(instance)
+
+
+@receiver(post_delete, sender=Order)
+def release_order_slot(sender, instance, **kwargs):
+    scheduling.release(instance)
+
+
+@receiver(connection_created)
+def configure_search_similarity(sender, connection, **kwargs):
+    # Typo tolerance of product search's trigram fallback (see api.search)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, false)",
+                [str(settings.PRODUCT_SEARCH_SIMILARITY)],
+            )
@@ -0,0 +1,308 @@
+import http.client
+import json
+import logging
+import random
+import threading
+import time
+from decimal import Decimal
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils.text import slugify
+from .models import Order, OrderItem, Product, SyncCursor
+from . import imports, leases
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CURSOR = 'square:catalog'
+LOCK_KEY = 'square:sync:lock'
+LOCK_TIMEOUT = 10 * 60
+# Largest page SearchCatalogObjects returns
+SEARCH_LIMIT = 1000
+# Orders are recorded as pushed in batches of this size, so an interrupted run redoes little
+PUSH_BATCH = 50
+PUSH_STATUSES = ('Paid', 'Ready', 'Collected')
+UNCATEGORIZED = 'Uncategorized'
+
+
+class SquareError(Exception):
+    """Raised when Square rejects a call or stays unreachable after every retry."""
+
+    def __init__(self, message, status=None, errors=()):
+        super().__init__(message)
+        self.status = status
+        self.errors = list(errors)
+
+
+class SquareClient:
+    """
+    Square's v2 JSON API over keep-alive connections, one per thread, so
+    consecutive calls reuse the same socket and TLS session. Connection
+    errors, 429 and 5xx are retried with exponential backoff and jitter,
+    honouring Retry-After. Writes are safe to retry because every one
+    carries an idempotency key.
+    """
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, config=None, sleep=time.sleep):
+        self.config = dict(settings.SQUARE, **(config or {}))
+        url = urlsplit(self.config['BASE_URL'])
+        self.scheme, self.host, self.port = url.scheme, url.hostname, url.port
+        self.sleep = sleep
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = self.local.conn = cls(self.host, self.port, timeout=self.config['TIMEOUT'])
+        return conn
+
+    def close(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def backoff(self, attempt, retry_after=None):
+        delay = min(self.config['BACKOFF_MAX_SECONDS'], self.config['BACKOFF_SECONDS'] * 2 ** attempt)
+        try:
+            delay = max(delay, float(retry_after)) if retry_after else random.uniform(delay / 2, delay)
+        except ValueError:
+            pass
+        self.sleep(delay)
+
+    def request(self, method, path, body=None):
+        headers = {
+            'Authorization': f"Bearer {self.config['ACCESS_TOKEN']}",
+            'Square-Version': self.config['API_VERSION'],
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        }
+        payload = json.dumps(body).encode() if body is not None else None
+        retries = self.config['MAX_RETRIES']
+        for attempt in range(retries + 1):
+            try:
+                conn = self.connection()
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                # The socket may be half-closed; the next attempt opens a fresh one
+                self.close()
+                if attempt == retries:
+                    raise SquareError(f"{method} {path} failed: {e}")
+                self.backoff(attempt)
+                continue
+            if response.status in self.RETRY_STATUSES and attempt < retries:
+                self.backoff(attempt, response.getheader('Retry-After'))
+                continue
+            try:
+                parsed = json.loads(data) if data else {}
+            except ValueError:
+                parsed = {}
+            if response.status >= 400:
+                errors = parsed.get('errors', [])
+                detail = '; '.join(e.get('detail') or e.get('code', '') for e in errors) or response.reason
+                raise SquareError(f"{method} {path} returned {response.status}: {detail}", response.status, errors)
+            return parsed
+
+
+def get_cursor(name):
+    return SyncCursor.objects.filter(name=name).values_list('value', flat=True).first()
+
+
+def set_cursor(name, value):
+    SyncCursor.objects.update_or_create(name=name, defaults={'value': value})
+
+
+def _price(item):
+    for variation in item['item_data'].get('variations') or []:
+        money = variation.get('item_variation_data', {}).get('price_money')
+        if money and money.get('amount') is not None:
+            return Decimal(money['amount']) / 100
+    return None
+
+
+def _category_id(item):
+    data = item['item_data']
+    categories = data.get('categories') or []
+    return categories[0].get('id') if categories else data.get('category_id')
+
+
+def catalog_rows(items, categories):
+    """
+    import_catalog rows for Square ITEM objects. Square owns name, price,
+    description and category; slug, unit, options and the bakery's own flags
+    keep their current values. A new item whose slug belongs to a product
+    not yet linked to Square is matched to it; only a slug held by another
+    Square item gets a suffix. Items without a fixed price are skipped.
+    """
+    by_square, by_slug = {}, {}
+    for row in Product.objects.values(
+        'square_id', 'slug', 'unit', 'description', 'is_custom_cake', 'is_featured', 'category__name',
+    ):
+        by_slug[row['slug']] = row
+        if row['square_id']:
+            by_square[row['square_id']] = row
+    rows, skipped = [], 0
+    for square_id, item in items.items():
+        price = _price(item)
+        if price is None:
+            skipped += 1
+            continue
+        data = item['item_data']
+        current = by_square.get(square_id)
+        if current:
+            slug = current['slug']
+        else:
+            slug = slugify(data['name']) or square_id.lower()
+            current = by_slug.get(slug)
+            if current and current['square_id']:
+                current, slug = None, f'{slug}-{square_id.lower()[-6:]}'
+            # Claim the slug so a second item of the same name is suffixed rather than merged
+            by_slug[slug] = dict(current or {}, square_id=square_id)
+        rows.append({
+            'square_id': square_id,
+            'slug': slug,
+            'name': data['name'],
+            'price': price,
+            'description': data.get('description', current['description'] if current else ''),
+            'category': categories.get(_category_id(item)) or (current['category__name'] if current else UNCATEGORIZED),
+            'unit': current['unit'] if current else 'ea',
+            'is_custom_cake': current['is_custom_cake'] if current else False,
+            'is_featured': current['is_featured'] if current else False,
+        })
+    return rows, skipped
+
+
+def pull_catalog(client, full=False):
+    """
+    Fetch ITEMs changed since the stored cursor with SearchCatalogObjects,
+    1000 per page, and apply them in one bulk import. The cursor only moves
+    once the import has committed, so a failed run is simply repeated.
+    """
+    begin_time = None if full else get_cursor(CATALOG_CURSOR)
+    query = {
+        'object_types': ['ITEM'],
+        'include_deleted_objects': True,
+        'include_related_objects': True,
+        'limit': SEARCH_LIMIT,
+    }
+    if begin_time:
+        query['begin_time'] = begin_time
+    items, categories, deleted, latest, page_cursor, calls = {}, {}, [], None, None, 0
+    while True:
+        page = client.request('POST', '/v2/catalog/search', dict(query, cursor=page_cursor) if page_cursor else query)
+        calls += 1
+        for obj in page.get('objects', []):
+            if obj.get('is_deleted'):
+                deleted.append(obj['id'])
+                items.pop(obj['id'], None)
+            else:
+                items[obj['id']] = obj
+        for obj in page.get('related_objects', []):
+            if obj.get('type') == 'CATEGORY' and not obj.get('is_deleted'):
+                categories[obj['id']] = obj['category_data']['name']
+        latest = page.get('latest_time') or latest
+        page_cursor = page.get('cursor')
+        if not page_cursor:
+            break
+
+    rows, skipped = catalog_rows(items, categories)
+    result = imports.import_catalog(rows) if rows else {'created': 0, 'updated': 0, 'unchanged': 0}
+    # Deleted items stay in the shop's catalog for staff to retire: past orders reference them
+    if deleted:
+        logger.warning("Square deleted %d items still in the catalog: %s", len(deleted), ', '.join(deleted[:20]))
+    if latest:
+        set_cursor(CATALOG_CURSOR, latest)
+    return {
+        'calls': calls, 'created': result['created'], 'updated': result['updated'],
+        'unchanged': result['unchanged'], 'skipped': skipped, 'deleted': len(deleted),
+    }
+
+
+def _money(amount):
+    return {'amount': int((amount * 100).to_integral_value()), 'currency': settings.SQUARE['CURRENCY']}
+
+
+def order_body(order):
+    line_items = []
+    for item in order.items.all():
+        line = {'name': item.product.name, 'quantity': str(item.quantity), 'base_price_money': _money(item.price)}
+        if item.product.square_id:
+            line['metadata'] = {'square_item_id': item.product.square_id}
+        note = ', '.join(filter(None, (item.flavor, item.filling, item.size)))
+        if note:
+            line['note'] = note
+        line_items.append(line)
+    return {
+        # Deterministic, so a retried or repeated push returns the order Square already made
+        'idempotency_key': f'natalie-order-{order.id}',
+        'order': {
+            'location_id': settings.SQUARE['LOCATION_ID'],
+            'reference_id': str(order.id),
+            'line_items': line_items,
+            'metadata': {'pickup_datetime': order.pickup_datetime.isoformat()},
+        },
+    }
+
+
+def push_orders(client, limit=None):
+    """
+    Create a Square order for each paid order not pushed yet. Square has no
+    batch create for orders, so each is one call on the shared connection;
+    the returned ids are written back PUSH_BATCH at a time in one statement.
+    """
+    limit = limit or settings.SQUARE['ORDERS_PER_RUN']
+    items = OrderItem.objects.select_related('product').only(
+        'order_id', 'quantity', 'flavor', 'filling', 'size', 'price', 'product__name', 'product__square_id',
+    )
+    orders = (
+        Order.objects.filter(square_order_id__isnull=True, status__in=PUSH_STATUSES)
+        .only('id', 'pickup_datetime', 'square_order_id')
+        .prefetch_related(Prefetch('items', queryset=items))
+        .order_by('id')[:limit]
+    )
+    pushed, failed, pending = 0, 0, []
+    for order in orders:
+        try:
+            response = client.request('POST', '/v2/orders', order_body(order))
+        except SquareError as e:
+            failed += 1
+            logger.warning("Could not push order %s to Square: %s", order.id, e)
+            continue
+        order.square_order_id = response['order']['id']
+        pending.append(order)
+        if len(pending) >= PUSH_BATCH:
+            pushed += _record(pending)
+    pushed += _record(pending)
+    return {'pushed': pushed, 'failed': failed}
+
+
+def _record(orders):
+    # bulk_update skips the Order signals, which only care about status and pickup changes
+    Order.objects.bulk_update(orders, ['square_order_id'])
+    count = len(orders)
+    orders.clear()
+    return count
+
+
+def sync(catalog=True, orders=True, full=False, client=None):
+    """
+    One incremental run: pull catalog changes, then push paid orders.
+    Returns None without doing anything if another run holds the lock.
+    """
+    if not leases.acquire(LOCK_KEY, LOCK_TIMEOUT):
+        return None
+    client = client or SquareClient()
+    try:
+        result = {}
+        if catalog:
+            result['catalog'] = pull_catalog(client, full=full)
+        if orders:
+            result['orders'] = push_orders(client)
+        return result
+    finally:
+        client.close()
+        leases.release(LOCK_KEY)
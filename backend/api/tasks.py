@@ -0,0 +1,87 @@
+import logging
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import send_mail
+from django.utils import timezone
+from .jobs import enqueue_on_commit, task
+from .models import Order
+from . import analytics, square
+
+kitchen = logging.getLogger('api.kitchen')
+
+# Side effects of a new order, run by the worker after the order commits
+ORDER_JOBS = ('send_order_confirmation', 'print_kitchen_ticket')
+
+
+def enqueue_order_jobs(order):
+    # Keys make a repeated enqueue for the same order a no-op
+    for name in ORDER_JOBS:
+        enqueue_on_commit(name, {'order_id': order.pk}, key=f'{name}:{order.pk}')
+    enqueue_sales_refresh()
+
+
+def enqueue_sales_refresh():
+    # One refresh per REFRESH_SECONDS window however many orders arrive in it, run once the window has settled
+    window = settings.ANALYTICS['REFRESH_SECONDS']
+    now = time.time()
+    ends = (int(now) // window + 1) * window
+    delay = timedelta(seconds=ends - now + settings.ANALYTICS['SETTLE_SECONDS'])
+    enqueue_on_commit('refresh_sales_rollups', key=f'refresh_sales_rollups:{ends}', delay=delay)
+
+
+def enqueue_square_push(order):
+    if settings.SQUARE['ACCESS_TOKEN'] and order.status in square.PUSH_STATUSES and not order.square_order_id:
+        enqueue_on_commit('push_order_to_square', {'order_id': order.pk}, key=f'push_order_to_square:{order.pk}')
+
+
+def _lines(order):
+    for item in order.items.select_related('product'):
+        options = ', '.join(filter(None, (item.flavor, item.filling, item.size)))
+        yield item, f"{item.quantity} x {item.product.name}" + (f" ({options})" if options else '')
+
+
+@task()
+def send_order_confirmation(order_id):
+    order = Order.objects.get(pk=order_id)
+    pickup = timezone.localtime(order.pickup_datetime)
+    lines = '\n'.join(f"  {text}  {item.price}" for item, text in _lines(order))
+    send_mail(
+        subject=f"Your {settings.BAKERY_METADATA['NAME']} order #{order.pk}",
+        message=(
+            f"Hi {order.customer_name},\n\n"
+            f"Thank you for your order. Pickup: {pickup:%A %d %B, %H:%M}.\n\n"
+            f"{lines}\n\nTotal: {order.total_price}\n\n"
+            f"{settings.BAKERY_METADATA['ADDRESS']}\n{settings.BAKERY_METADATA['PHONE']}\n"
+        ),
+        from_email=None,
+        recipient_list=[order.email],
+    )
+
+
+@task()
+def print_kitchen_ticket(order_id):
+    # Tickets go to the 'api.kitchen' logger; point its handler at the kitchen printer
+    order = Order.objects.get(pk=order_id)
+    pickup = timezone.localtime(order.pickup_datetime)
+    lines = '\n'.join(text for _, text in _lines(order))
+    kitchen.info("ORDER #%s  pickup %s  %s\n%s", order.pk, f'{pickup:%a %d %b %H:%M}', order.customer_name, lines)
+
+
+@task(max_attempts=8)
+def push_order_to_square(order_id):
+    # A SquareError propagates, so the worker retries with backoff; the idempotency key keeps retries single
+    order = Order.objects.filter(pk=order_id, square_order_id__isnull=True).first()
+    if order is None or not settings.SQUARE['ACCESS_TOKEN']:
+        return
+    client = square.SquareClient()
+    try:
+        response = client.request('POST', '/v2/orders', square.order_body(order))
+    finally:
+        client.close()
+    Order.objects.filter(pk=order_id).update(square_order_id=response['order']['id'])
+
+
+@task()
+def refresh_sales_rollups():
+    analytics.refresh()
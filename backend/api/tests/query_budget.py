@@ -0,0 +1,37 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """
+    Assertions for pinning how many SQL queries an endpoint runs.
+    Mix into a TestCase that exposes an APIClient as ``self.client``.
+    """
+
+    def count_queries(self, url, method='get', **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, len(ctx.captured_queries)
+
+    def assertMaxQueries(self, budget, url, method='get', **kwargs):
+        response, used = self.count_queries(url, method=method, **kwargs)
+        self.assertLessEqual(
+            used, budget,
+            f"{method.upper()} {url} ran {used} queries (budget {budget})"
+        )
+        return response
+
+    def assertConstantQueries(self, url, grow, method='get', **kwargs):
+        """
+        Run the request, call ``grow()`` to add more rows, then run it again.
+        Fails if the second request issued more queries than the first.
+        """
+        first, before = self.count_queries(url, method=method, **kwargs)
+        grow()
+        second, after = self.count_queries(url, method=method, **kwargs)
+        self.assertEqual(first.status_code, second.status_code)
+        self.assertEqual(
+            before, after,
+            f"{method.upper()} {url} query count grew from {before} to {after} with result size"
+        )
+        return second
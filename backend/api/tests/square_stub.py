@@ -0,0 +1,130 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class SquareStub:
+    """
+    In-process stand-in for the parts of Square's API that api.square calls:
+    SearchCatalogObjects with begin_time and cursors, and CreateOrder with
+    idempotency keys. ``fail_next`` holds status codes to answer the next
+    requests with, to exercise retries. Use as a context manager.
+    """
+
+    def __init__(self, page_size=1000):
+        self.page_size = page_size
+        self.objects = {}
+        self.orders = {}
+        self.fail_next = []
+        self.requests = []
+        self.connections = 0
+        self.clock = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        self.lock = threading.Lock()
+
+    def tick(self):
+        self.clock += timedelta(seconds=1)
+        return self.clock.isoformat().replace('+00:00', 'Z')
+
+    def put_category(self, square_id, name):
+        self.objects[square_id] = {
+            'type': 'CATEGORY', 'id': square_id, 'updated_at': self.tick(), 'is_deleted': False,
+            'category_data': {'name': name},
+        }
+
+    def put_item(self, square_id, name, cents, category_id=None, description=None):
+        data = {
+            'name': name,
+            'variations': [{
+                'type': 'ITEM_VARIATION', 'id': f'{square_id}-V',
+                'item_variation_data': {'price_money': {'amount': cents, 'currency': 'CAD'}},
+            }],
+        }
+        if category_id:
+            data['categories'] = [{'id': category_id}]
+        if description is not None:
+            data['description'] = description
+        self.objects[square_id] = {
+            'type': 'ITEM', 'id': square_id, 'updated_at': self.tick(), 'is_deleted': False, 'item_data': data,
+        }
+
+    def delete(self, square_id):
+        self.objects[square_id] = dict(self.objects[square_id], is_deleted=True, updated_at=self.tick())
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+                with stub.lock:
+                    stub.requests.append((self.path, body))
+                    failure = stub.fail_next.pop(0) if stub.fail_next else None
+                if failure:
+                    return self.reply(failure, {'errors': [{'code': 'SERVICE_UNAVAILABLE', 'detail': 'try again'}]})
+                if self.headers.get('Authorization') != 'Bearer test-token':
+                    return self.reply(401, {'errors': [{'code': 'UNAUTHORIZED', 'detail': 'bad token'}]})
+                if self.path == '/v2/catalog/search':
+                    return self.reply(200, stub.search(body))
+                if self.path == '/v2/orders':
+                    return self.reply(200, stub.create_order(body))
+                self.reply(404, {'errors': [{'code': 'NOT_FOUND', 'detail': self.path}]})
+
+            def reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def search(self, body):
+        begin = body.get('begin_time')
+        matches = sorted(
+            (o for o in self.objects.values()
+             if o['type'] in body.get('object_types', ['ITEM'])
+             and (body.get('include_deleted_objects') or not o['is_deleted'])
+             and (begin is None or o['updated_at'] > begin)),
+            key=lambda o: (o['updated_at'], o['id']),
+        )
+        start = int(body.get('cursor') or 0)
+        limit = min(body.get('limit', 100), self.page_size)
+        page = matches[start:start + limit]
+        response = {'objects': page}
+        if start + limit < len(matches):
+            response['cursor'] = str(start + limit)
+        if body.get('include_related_objects'):
+            wanted = {c['id'] for o in page for c in o.get('item_data', {}).get('categories', [])}
+            response['related_objects'] = [self.objects[c] for c in sorted(wanted) if c in self.objects]
+        if self.objects:
+            response['latest_time'] = max(o['updated_at'] for o in self.objects.values())
+        return response
+
+    def create_order(self, body):
+        key = body['idempotency_key']
+        if key not in self.orders:
+            self.orders[key] = dict(body['order'], id=f'SQORDER{len(self.orders) + 1}')
+        return {'order': self.orders[key]}
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from api.models import Category, Product, Order, OrderItem
+from api.pagination import EstimatedCountPaginator, estimated_count
+
+
+class AdminQueryBudgetTest(TestCase):
+    """Changelists and the order form run a fixed number of queries however big the tables get"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        self.categories = [Category.objects.create(name=f"Category {i}") for i in range(3)]
+        self.order = self.add_orders(1)[0]
+        self.add_products(5)
+
+    def add_products(self, count):
+        start = Product.objects.count()
+        Product.objects.bulk_create([
+            Product(
+                category=self.categories[i % 3], name=f"Product {i}", slug=f"product-{i}", description="", price=5,
+                image='products/p.jpg' if i % 2 else '',
+            )
+            for i in range(start, start + count)
+        ])
+
+    def add_orders(self, count):
+        pickup = timezone.now() + timedelta(days=1)
+        return Order.objects.bulk_create([
+            Order(customer_name=f"C{i}", email="c@example.com", phone="555", total_price=10, pickup_datetime=pickup)
+            for i in range(count)
+        ])
+
+    def queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def assertPinned(self, url, budget, grow):
+        self.queries(url)  # warm the content type cache
+        _, before = self.queries(url)
+        grow()
+        response, after = self.queries(url)
+        self.assertEqual((before, after), (budget, budget), f"{url} ran {before} then {after} queries")
+        return response
+
+    def test_order_changelist(self):
+        self.assertPinned('/admin/api/order/', 9, lambda: self.add_orders(300))
+
+    def test_order_date_drilldown(self):
+        day = timezone.localtime(self.order.pickup_datetime)
+        url = f'/admin/api/order/?pickup_datetime__year={day.year}&pickup_datetime__month={day.month}'
+        self.assertPinned(url, 8, lambda: self.add_orders(300))
+
+    def test_product_changelist(self):
+        response = self.assertPinned('/admin/api/product/', 10, lambda: self.add_products(200))
+        # Images without derivatives never fall back to the full-size original
+        self.assertNotContains(response, 'products/p.jpg')
+        self.assertContains(response, "No thumbnail")
+
+    def test_order_form_does_not_list_the_catalog(self):
+        OrderItem.objects.create(order=self.order, product=Product.objects.first(), quantity=1, price=5)
+        url = f'/admin/api/order/{self.order.pk}/change/'
+        response = self.assertPinned(url, 10, lambda: self.add_products(200))
+        # Autocomplete renders only the chosen product, not an option per catalog entry
+        self.assertLess(response.content.decode().count('<option'), 30)
+
+
+class EstimatedCountTest(TestCase):
+    def test_exact_without_statistics(self):
+        Category.objects.create(name="Bread")
+        # SQLite keeps no row estimates, so the admin falls back to COUNT(*)
+        self.assertIsNone(estimated_count(Category.objects.all()))
+        self.assertEqual(EstimatedCountPaginator(Category.objects.all(), 10).count, 1)
+
+    def test_large_estimates_skip_count(self):
+        class Estimated(EstimatedCountPaginator):
+            exact_below = 10
+
+        with mock.patch('api.pagination.estimated_count', return_value=500_000), self.assertNumQueries(0):
+            self.assertEqual(Estimated(Category.objects.all(), 10).count, 500_000)
+        with mock.patch('api.pagination.estimated_count', return_value=5), self.assertNumQueries(1):
+            self.assertEqual(Estimated(Category.objects.all(), 10).count, 0)
@@ -1,8 +1,18 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.db import IntegrityError
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
-from api.models import Category, Product, CakeOption
+from api.models import Category, Product, CakeOption, Order, OrderItem
+
+
+def pickup_at(days, hour=12):
+    """A pickup time ``days`` from now that falls inside opening hours"""
+    return (timezone.now() + timedelta(days=days)).replace(hour=hour, minute=0, second=0, microsecond=0)
 
 class APIDataContractTest(TestCase):
     def setUp(self):
@@ -63,3 +73,176 @@ class APIDataContractTest(TestCase):
         option_fields = ['id', 'option_type', 'name', 'price_modifier']
         for field in option_fields:
             self.assertIn(field, options[0], f"Option Missing: {field}")
+
+class PaginationTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name="Bread")
+        for i in range(5):
+            Product.objects.create(category=category, name=f"Loaf {i}", price=i + 1, description="Fresh")
+
+    def test_unpaginated_without_params(self):
+        response = self.client.get('/api/products/')
+        self.assertIsInstance(response.json(), list)
+        self.assertEqual(len(response.json()), 5)
+
+    def test_limit_offset(self):
+        data = self.client.get('/api/products/?ordering=price&limit=2&offset=2').json()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual([p['name'] for p in data['results']], ["Loaf 2", "Loaf 3"])
+        self.assertIsNotNone(data['next'])
+
+    def test_keyset_cursor_walks_every_row_once(self):
+        url = '/api/products/?ordering=price&limit=2&cursor='
+        names = []
+        while url:
+            data = self.client.get(url).json()
+            self.assertNotIn('count', data)
+            names.extend(p['name'] for p in data['results'])
+            url = data['next']
+        self.assertEqual(names, [f"Loaf {i}" for i in range(5)])
+
+    def test_keyset_cursor_survives_ties_and_nulls(self):
+        category = Category.objects.get()
+        for i in range(5, 10):
+            Product.objects.create(category=category, name=f"Loaf {i}", price=2, description="Fresh")
+        Product.objects.filter(name__in=["Loaf 1", "Loaf 6", "Loaf 8"]).update(created_at=None)
+        for ordering in ('price', '-price', '-created_at', 'created_at'):
+            url, pages = f'/api/products/?ordering={ordering}&limit=2&cursor=', []
+            while url:
+                data = self.client.get(url).json()
+                pages.append([p['name'] for p in data['results']])
+                url = data['next']
+            names = sum(pages, [])
+            self.assertEqual(sorted(names), sorted(f"Loaf {i}" for i in range(10)), ordering)
+            # The NULLs come last either way, and the walk back retraces the same pages
+            if 'created_at' in ordering:
+                self.assertEqual(set(names[-3:]), {"Loaf 1", "Loaf 6", "Loaf 8"})
+            while data['previous']:
+                data = self.client.get(data['previous']).json()
+                self.assertEqual([p['name'] for p in data['results']], pages[-2])
+                pages.pop()
+        self.assertEqual(self.client.get('/api/products/?cursor=cD1bIng0Il0%3D').status_code, 404)
+
+    def test_order_list_paginates(self):
+        product = Product.objects.first()
+        for i in range(3):
+            order = Order.objects.create(
+                customer_name=f"C{i}", email="c@example.com", phone="1",
+                total_price=5, pickup_datetime=timezone.now()
+            )
+            OrderItem.objects.create(order=order, product=product, price=5)
+        data = self.client.get('/api/orders/?limit=2').json()
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(len(data['results']), 2)
+        self.assertEqual(len(data['results'][0]['items']), 1)
+
+class OrderCreateTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name="Bread")
+        self.products = [
+            Product.objects.create(category=category, name=f"Loaf {i}", price=5, description="Fresh")
+            for i in range(3)
+        ]
+
+    def payload(self, items, total=None):
+        if total is None:
+            total = sum(Decimal(i['price']) * i['quantity'] for i in items)
+        return {
+            'customer_name': "Sara", 'email': "sara@example.com", 'phone': "555",
+            'total_price': str(total), 'pickup_datetime': pickup_at(1).isoformat(),
+            'items': items,
+        }
+
+    def test_creates_order_with_items(self):
+        items = [{'product': p.id, 'quantity': 1, 'price': "5.00"} for p in self.products]
+        response = self.client.post('/api/orders/', self.payload(items), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.json()['items']), 3)
+        self.assertEqual(OrderItem.objects.filter(order_id=response.json()['id']).count(), 3)
+
+    def test_unknown_product_is_rejected(self):
+        items = [{'product': 999999, 'quantity': 1, 'price': "5.00"}]
+        response = self.client.post('/api/orders/', self.payload(items), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('items', response.json())
+        self.assertEqual(Order.objects.count(), 0)
+
+    def test_failed_item_insert_rolls_back_order(self):
+        items = [{'product': self.products[0].id, 'quantity': 1, 'price': "5.00"}]
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.client.post('/api/orders/', self.payload(items), format='json')
+        self.assertEqual(Order.objects.count(), 0)
+
+
+class PricingTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name="Cakes")
+        self.cake = Product.objects.create(
+            category=category, name="Celebration Cake", price=85, description="Custom", is_custom_cake=True
+        )
+        self.rose = CakeOption.objects.create(option_type='FLAVOR', name='Rose', price_modifier=2.50)
+        self.large = CakeOption.objects.create(option_type='SIZE', name='Large', price_modifier=20)
+        self.cake.available_options.add(self.rose, self.large)
+
+    def order(self, price, total, **options):
+        return {
+            'customer_name': "Sara", 'email': "sara@example.com", 'phone': "555",
+            'total_price': total, 'pickup_datetime': pickup_at(5).isoformat(),
+            'items': [{'product': self.cake.id, 'quantity': 2, 'price': price, **options}],
+        }
+
+    def test_modifiers_are_applied(self):
+        response = self.client.post('/api/orders/', self.order("107.50", "215.00", flavor='Rose', size='Large'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_tampered_price_is_rejected(self):
+        response = self.client.post('/api/orders/', self.order("85.00", "170.00", flavor='Rose'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('items', response.json())
+
+    def test_wrong_total_is_rejected(self):
+        response = self.client.post('/api/orders/', self.order("87.50", "100.00", flavor='Rose'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('total_price', response.json())
+
+    def test_unavailable_option_is_rejected(self):
+        response = self.client.post('/api/orders/', self.order("85.00", "170.00", filling='Jam'), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_price_change_rebuilds_table(self):
+        self.client.post('/api/quote/', {'items': [{'product': self.cake.id}]}, format='json')
+        self.rose.price_modifier = 5
+        self.rose.save()
+        data = self.client.post('/api/quote/', {'items': [{'product': self.cake.id, 'flavor': 'Rose'}]}, format='json').json()
+        self.assertEqual(data['total'], "90.00")
+
+    def test_stale_table_does_not_reject_new_prices(self):
+        self.client.post('/api/quote/', {'items': [{'product': self.cake.id}]}, format='json')
+        # A change whose version bump this process has not seen yet
+        Product.objects.filter(pk=self.cake.pk).update(price=90)
+        response = self.client.post('/api/orders/', self.order("90.00", "180.00"), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post('/api/orders/', self.order("95.00", "190.00"), format='json')
+        self.assertEqual(response.json()['items'], ["Price for Celebration Cake should be 90.00."])
+
+    def test_quote_prices_whole_bag(self):
+        payload = {'items': [
+            {'product': self.cake.id, 'quantity': 1, 'flavor': 'Rose', 'size': 'Large'},
+            {'product': self.cake.id, 'quantity': 3},
+        ]}
+        response = self.client.post('/api/quote/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['items'][0]['unit_price'], "107.50")
+        self.assertEqual(data['items'][1]['line_total'], "255.00")
+        self.assertEqual(data['total'], "362.50")
+
+    def test_warm_quote_runs_no_queries(self):
+        payload = {'items': [{'product': self.cake.id, 'flavor': 'Rose'}] * 50}
+        self.client.post('/api/quote/', payload, format='json')
+        with self.assertNumQueries(0):
+            self.client.post('/api/quote/', payload, format='json')
@@ -0,0 +1,36 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from api import benchmarking
+from seed import seed_scale
+
+ROOMY_SLOTS = {'INTERVAL_MINUTES': 15, 'CAPACITY': {'regular': 1000, 'custom_cake': 1000}}
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_summarize_percentiles(self):
+        report = benchmarking.summarize([i / 1000 for i in range(1, 101)], elapsed=2, queries=[3] * 100)
+        self.assertEqual(report['requests'], 100)
+        self.assertAlmostEqual(report['p50_ms'], 50.5)
+        self.assertAlmostEqual(report['p99_ms'], 99.01)
+        self.assertEqual(report['rps'], 50)
+        self.assertEqual(report['queries_per_request'], 3)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'results': {'in_process': {'product_list': {'p95_ms': 10, 'rps': 100, 'queries_per_request': 2}}}}
+        within = {'results': {'in_process': {'product_list': {'p95_ms': 11, 'rps': 95, 'queries_per_request': 2}}}}
+        worse = {'results': {'in_process': {'product_list': {'p95_ms': 20, 'rps': 50, 'queries_per_request': 3}}}}
+        self.assertEqual(benchmarking.compare(within, baseline, 0.15), [])
+        regressions = benchmarking.compare(worse, baseline, 0.15)
+        self.assertEqual(len(regressions), 3)
+
+    @override_settings(PICKUP_SLOTS=ROOMY_SLOTS)
+    def test_in_process_run(self):
+        seed_scale(categories=2, products=20, options=3, orders=5)
+        results = benchmarking.run_in_process(benchmarking.default_scenarios(), requests=3, warmup=1)
+        self.assertEqual(set(results), {'product_list', 'product_list_page', 'product_detail', 'site_content', 'order_create'})
+        for name, metrics in results.items():
+            self.assertEqual(metrics['requests'], 3, name)
+            self.assertIsNotNone(metrics['queries_per_request'], name)
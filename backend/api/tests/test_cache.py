@@ -0,0 +1,101 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from api.cache import SITE_CONTENT_CACHE, get_version
+from api.checks import shared_cache
+from api.models import Category, Product, CakeOption, SiteContent, SiteFeature, SiteGalleryImage
+
+
+class SiteContentCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.content = SiteContent.load()
+
+    def test_warm_cache_runs_no_queries(self):
+        self.client.get('/api/site-content/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/site-content/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_content_save_invalidates(self):
+        self.client.get('/api/site-content/')
+        self.content.hero_title = "Fresh Title"
+        self.content.save()
+        self.assertEqual(self.client.get('/api/site-content/').json()['hero_title'], "Fresh Title")
+
+    def test_commit_bumps_again(self):
+        # A read racing the uncommitted save may cache the old content under the first bump
+        with self.captureOnCommitCallbacks(execute=True):
+            self.content.hero_title = "Fresh Title"
+            self.content.save()
+            during = get_version(SITE_CONTENT_CACHE)
+        self.assertGreater(get_version(SITE_CONTENT_CACHE), during)
+
+    def test_feature_changes_invalidate(self):
+        self.client.get('/api/site-content/')
+        feature = SiteFeature.objects.create(site_content=self.content, title="Saffron", text="Real saffron")
+        self.assertEqual(len(self.client.get('/api/site-content/').json()['features']), 1)
+        feature.delete()
+        self.assertEqual(self.client.get('/api/site-content/').json()['features'], [])
+
+    def test_gallery_changes_invalidate(self):
+        self.client.get('/api/site-content/')
+        SiteGalleryImage.objects.create(site_content=self.content, image='content/gallery/a.jpg')
+        self.assertEqual(len(self.client.get('/api/site-content/').json()['gallery_images']), 1)
+
+
+class ConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Pastries")
+        self.product = Product.objects.create(
+            category=self.category, name="Baklava", price=24, description="Layers"
+        )
+
+    def test_matching_etag_returns_304_without_queries(self):
+        etag = self.client.get('/api/products/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/categories/')['Last-Modified']
+        response = self.client.get('/api/categories/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_varies_with_query(self):
+        plain = self.client.get('/api/products/')['ETag']
+        filtered = self.client.get('/api/products/?is_featured=true')['ETag']
+        self.assertNotEqual(plain, filtered)
+
+    def test_related_changes_refresh_etag(self):
+        etag = self.client.get(f'/api/products/{self.product.slug}/')['ETag']
+        self.category.name = "Sweets"
+        self.category.save()
+        response = self.client.get(f'/api/products/{self.product.slug}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['category_name'], "Sweets")
+
+        etag = response['ETag']
+        self.product.available_options.add(CakeOption.objects.create(option_type='SIZE', name='Tray'))
+        response = self.client.get(f'/api/products/{self.product.slug}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_site_content_etag(self):
+        content = SiteContent.load()
+        etag = self.client.get('/api/site-content/')['ETag']
+        self.assertEqual(self.client.get('/api/site-content/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        content.save()
+        self.assertEqual(self.client.get('/api/site-content/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+
+class SharedCacheCheckTest(TestCase):
+    def test_in_process_cache_warns_on_deploy(self):
+        self.assertEqual([w.id for w in shared_cache(None)], ['api.W001'])
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with override_settings(CACHES=redis):
+            self.assertEqual(shared_cache(None), [])
@@ -0,0 +1,115 @@
+import gzip
+import json
+from datetime import timedelta
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api import catalog, leases
+from api.models import Category, Product, CakeOption
+
+
+class CatalogSnapshotTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.cakes = Category.objects.create(name="Cakes")
+        self.bread = Category.objects.create(name="Bread")
+        self.rose = CakeOption.objects.create(option_type='FLAVOR', name='Rose', price_modifier=2)
+        self.cake = Product.objects.create(category=self.cakes, name="Saffron Cake", price=40, is_custom_cake=True)
+        self.cake.available_options.add(self.rose)
+        self.sangak = Product.objects.create(category=self.bread, name="Sangak", price=6)
+
+    def get_catalog(self, **extra):
+        response = self.client.get('/api/catalog/', **extra)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_products_grouped_and_options_deduplicated(self):
+        data = self.get_catalog()
+        self.assertEqual([c['name'] for c in data['categories']], ["Bread", "Cakes"])
+        cakes = data['categories'][1]['products']
+        self.assertEqual([p['name'] for p in cakes], ["Saffron Cake"])
+        self.assertEqual(cakes[0]['options'], [self.rose.id])
+        self.assertEqual(cakes[0]['price'], '40.00')
+        self.assertNotIn('available_options', cakes[0])
+        self.assertEqual(data['options'][str(self.rose.id)]['price_modifier'], '2.00')
+
+    def test_warm_request_is_a_byte_copy(self):
+        first = self.client.get('/api/catalog/').content
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/catalog/')
+        self.assertEqual(response.content, first)
+
+    def test_gzip_variant(self):
+        plain = self.client.get('/api/catalog/')
+        packed = self.client.get('/api/catalog/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(packed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(packed.content), plain.content)
+        self.assertNotEqual(packed['ETag'], plain['ETag'])
+        self.assertIn('Accept-Encoding', packed['Vary'])
+
+    def test_not_modified(self):
+        etag = self.client.get('/api/catalog/')['ETag']
+        self.assertEqual(self.client.get('/api/catalog/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_changes_are_applied_incrementally(self):
+        Product.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.get_catalog()
+        self.sangak.price = 7
+        self.sangak.save()
+        with mock.patch('api.catalog._product', wraps=catalog._product) as rebuilt:
+            data = self.get_catalog()
+        self.assertEqual(rebuilt.call_count, 1)
+        self.assertEqual(data['categories'][0]['products'][0]['price'], '7.00')
+
+    def test_deletes_moves_and_option_links(self):
+        self.get_catalog()
+        self.cake.available_options.remove(self.rose)
+        self.rose.name = "Rosewater"
+        self.rose.save()
+        self.sangak.category = self.cakes
+        self.sangak.save()
+        Product.objects.create(category=self.bread, name="Barbari", price=5).delete()
+        data = self.get_catalog()
+        self.assertEqual(data['categories'][0]['products'], [])
+        self.assertEqual({p['name'] for p in data['categories'][1]['products']}, {"Saffron Cake", "Sangak"})
+        self.assertEqual(data['options'][str(self.rose.id)]['name'], "Rosewater")
+        self.assertEqual([p['options'] for p in data['categories'][1]['products']], [[], []])
+        self.cake.delete()
+        self.assertEqual(len(self.get_catalog()['categories'][1]['products']), 1)
+
+    def test_refresh_reads_changes_not_the_whole_catalog(self):
+        structure = catalog.build_structure()
+        since = timezone.now()
+        self.sangak.price = 7
+        self.sangak.save()
+        # Changed rows and a count per table, then the changed product's links: no id scan
+        with self.assertNumQueries(7):
+            catalog.update_structure(structure, since)
+        self.assertEqual(structure['products'][self.sangak.id]['price'], '7.00')
+        self.assertEqual(structure['products'][self.cake.id]['options'], [self.rose.id])
+
+        # Links edited from the option's side stamp the products they leave
+        since = timezone.now()
+        self.rose.products.clear()
+        catalog.update_structure(structure, since)
+        self.assertEqual(structure['products'][self.cake.id]['options'], [])
+        self.cake.available_options.add(self.rose)
+        catalog.update_structure(structure, since)
+        self.assertEqual(structure['products'][self.cake.id]['options'], [self.rose.id])
+        # Deleting the option drops its link rows without stamping the product
+        since = timezone.now()
+        self.rose.delete()
+        catalog.update_structure(structure, since)
+        self.assertEqual((structure['options'], structure['products'][self.cake.id]['options']), ({}, []))
+
+    def test_one_process_rebuilds_at_a_time(self):
+        # The lock is a database lease: atomic across processes, unlike cache.add on the file cache
+        leases.acquire(catalog.LOCK_KEY, 60)
+        self.assertFalse(catalog.refresh())
+        self.assertIsNone(cache.get(catalog.STATE_KEY))
+        leases.release(catalog.LOCK_KEY)
+        self.assertTrue(catalog.refresh())
+        self.assertIsNotNone(cache.get(catalog.STATE_KEY))
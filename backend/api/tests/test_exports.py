@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, date
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from api import exports
+from api.models import Category, Product, Order, OrderItem
+
+
+class OrderExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Cakes")
+        cls.cake = Product.objects.create(category=category, name="Rose Cake", price='40.00')
+        for day, status, lines in ((1, 'Paid', 2), (2, 'Pending', 1), (3, 'Paid', 0), (10, 'Collected', 1), (11, 'Paid', 3)):
+            order = Order.objects.create(
+                customer_name=f"Customer {day}", email="c@example.com", phone="555", total_price='40.00', status=status,
+                pickup_datetime=timezone.make_aware(datetime(2026, 3, day, 12)),
+            )
+            for n in range(lines):
+                OrderItem.objects.create(order=order, product=cls.cake, quantity=n + 1, price='40.00', flavor='Rose' if n else None)
+
+    def export(self, *args):
+        out = io.StringIO()
+        call_command('export_orders', *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_csv_has_one_row_per_line(self):
+        rows = list(csv.DictReader(io.StringIO(self.export('--format', 'csv'))))
+        # Seven lines plus one row for the order without lines
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows[0]['customer_name'], "Customer 1")
+        self.assertEqual(rows[0]['product_name'], "Rose Cake")
+        self.assertEqual(rows[0]['flavor'], '')
+        self.assertEqual(rows[1]['flavor'], 'Rose')
+        self.assertEqual(rows[3]['product_id'], '')
+
+    def test_csv_defuses_formulas(self):
+        Order.objects.filter(customer_name="Customer 1").update(customer_name='=HYPERLINK("http://evil")', phone='+1 555')
+        OrderItem.objects.filter(flavor='Rose').update(flavor='@SUM(A1)')
+        rows = list(csv.DictReader(io.StringIO(self.export('--format', 'csv'))))
+        self.assertEqual(rows[0]['customer_name'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(rows[0]['phone'], "'+1 555")
+        self.assertEqual(rows[1]['flavor'], "'@SUM(A1)")
+        self.assertEqual(rows[0]['total_price'], '40.00')
+        # JSON Lines carry the values as typed
+        self.assertEqual(json.loads(self.export('--format', 'jsonl').splitlines()[0])['phone'], '+1 555')
+
+    def test_jsonl_filters_by_pickup_date_and_status(self):
+        lines = self.export('--format', 'jsonl', '--from', '2026-03-01', '--to', '2026-03-10', '--status', 'Paid', '--status', 'Collected')
+        orders = [json.loads(line) for line in lines.splitlines()]
+        self.assertEqual([o['customer_name'] for o in orders], ["Customer 1", "Customer 3", "Customer 10"])
+        self.assertEqual([item['quantity'] for item in orders[0]['items']], [1, 2])
+        self.assertEqual(orders[1]['items'], [])
+
+    def test_queries_scale_with_chunks_not_rows(self):
+        # One cursor for the orders plus one items query per chunk of two
+        with self.assertNumQueries(4):
+            list(exports.export_lines('csv', chunk_size=2))
+
+    def test_output_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'orders.csv')
+            self.export('--output', path, '--to', '2026-03-02')
+            with open(path, newline='', encoding='utf-8') as f:
+                self.assertEqual(len(list(csv.DictReader(f))), 3)
+
+    def test_filter_bounds_are_inclusive_local_dates(self):
+        orders = exports.filter_orders(Order.objects.all(), date(2026, 3, 2), date(2026, 3, 3))
+        self.assertEqual(orders.count(), 2)
+
+    def test_admin_action_streams(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin)
+        ids = Order.objects.filter(status='Paid').values_list('id', flat=True)
+        response = self.client.post('/admin/api/order/', {
+            'action': 'export_jsonl', '_selected_action': list(ids),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        body = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(body.splitlines()), 3)
@@ -0,0 +1,79 @@
+import json
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from api.models import Category, Product, CakeOption
+from api.renderers import ORJSONRenderer
+from rest_framework.renderers import JSONRenderer
+
+FAST = {
+    'FAST_JSON': True,
+    'REST_FRAMEWORK': dict(settings.REST_FRAMEWORK, DEFAULT_RENDERER_CLASSES=['api.renderers.ORJSONRenderer']),
+}
+
+
+class FastJSONTest(TestCase):
+    """FAST_JSON must not change a single byte of any product response"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cakes = Category.objects.create(name="Cakes")
+        bread = Category.objects.create(name="Nân")
+        rose = CakeOption.objects.create(option_type='FLAVOR', name='Rose', price_modifier='2.50')
+        large = CakeOption.objects.create(option_type='SIZE', name='Large')
+        for i in range(6):
+            product = Product.objects.create(
+                category=cakes if i % 2 else bread, name=f"Saffron Cake {i}   é", price=f'{10 + i}.50',
+                description="Rosewater and saffron layers", is_custom_cake=i % 2 == 1, is_featured=i < 2,
+                square_id=f'SQ{i}' if i % 3 else None,
+            )
+            if product.is_custom_cake:
+                product.available_options.add(large, rose)
+        Product.objects.filter(name__startswith="Saffron Cake 1").update(
+            image='products/cake.jpg',
+            image_derivatives={'image': {'source': 'products/cake.jpg', 'widths': [160, 320], 'formats': ['webp', 'jpeg'],
+                                         'placeholder': 'data:image/jpeg;base64,AAAA'}},
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def fetch(self, path):
+        response = APIClient().get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.content
+
+    def assertSameBytes(self, path):
+        expected = self.fetch(path)
+        cache.clear()
+        with override_settings(**FAST):
+            actual = self.fetch(path)
+        self.assertEqual(actual, expected)
+        return expected
+
+    def test_product_endpoints_match_byte_for_byte(self):
+        slug = Product.objects.order_by('id').values_list('slug', flat=True)[1]
+        paths = [
+            '/api/products/',
+            '/api/products/?limit=2&offset=1',
+            '/api/products/?is_custom_cake=true',
+            '/api/products/?ordering=price',
+            '/api/products/?search=saffron',
+            f'/api/products/{slug}/',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                self.assertSameBytes(path)
+
+    def test_cursor_pages_match(self):
+        first = json.loads(self.assertSameBytes('/api/products/?cursor=&limit=2'))
+        self.assertSameBytes(first['next'].replace('http://testserver', ''))
+
+    def test_lean_list_query_count(self):
+        with override_settings(**FAST), self.assertNumQueries(3):
+            self.fetch('/api/products/')
+
+    def test_renderer_matches_json_renderer(self):
+        data = {'a': [1, 2.5, None, True], 'b': "   café", 3: {'nested': 'x'}}
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
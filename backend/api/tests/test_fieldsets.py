@@ -0,0 +1,114 @@
+import json
+from datetime import timedelta
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.models import Category, Product, CakeOption, Order, OrderItem, SiteContent, SiteFeature
+from .test_fast_json import FAST
+
+
+class SparseFieldsetTest(TestCase):
+    """?fields= and ?omit= trim the body and the queries behind it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cakes = Category.objects.create(name="Cakes")
+        rose = CakeOption.objects.create(option_type='FLAVOR', name='Rose', price_modifier='2.50')
+        for i in range(4):
+            product = Product.objects.create(
+                category=cakes, name=f"Cake {i}", price=f'{10 + i}.00', description="Layers", is_custom_cake=i % 2 == 1,
+            )
+            product.available_options.add(rose)
+        Product.objects.filter(name="Cake 1").update(
+            image='products/cake.jpg',
+            image_derivatives={'image': {'source': 'products/cake.jpg', 'widths': [160], 'formats': ['webp'],
+                                         'placeholder': 'data:image/jpeg;base64,AAAA'}},
+        )
+        order = Order.objects.create(
+            customer_name="Ana", email="ana@example.com", phone="555", total_price='10.00',
+            pickup_datetime=timezone.now() + timedelta(days=1),
+        )
+        OrderItem.objects.create(order=order, product=product, quantity=1, price='10.00')
+        content = SiteContent.load()
+        SiteFeature.objects.create(site_content=content, title="Fresh", text="Daily")
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, path, status=200):
+        response = APIClient().get(path)
+        self.assertEqual(response.status_code, status, response.content)
+        return json.loads(response.content)
+
+    def sql(self, path):
+        with CaptureQueriesContext(connection) as ctx:
+            self.get(path)
+        return [q['sql'] for q in ctx.captured_queries]
+
+    def test_fields_keeps_only_the_selected_keys(self):
+        body = self.get('/api/products/?fields=name,price,image_srcset')
+        self.assertEqual(list(body[0]), ['name', 'price', 'image_srcset'])
+
+    def test_omit_drops_keys(self):
+        body = self.get('/api/products/?omit=description,available_options,image_placeholder')
+        keys = set(body[0])
+        self.assertFalse(keys & {'description', 'available_options', 'image_placeholder'})
+        self.assertIn('image_srcset', keys)
+
+    def test_unknown_field_is_rejected(self):
+        body = self.get('/api/products/?fields=name,secret', status=400)
+        self.assertIn('secret', str(body))
+        self.get('/api/orders/?omit=nope', status=400)
+        self.get('/api/site-content/?fields=nope', status=400)
+
+    def test_product_queryset_is_pruned(self):
+        full = self.sql('/api/products/')
+        sparse = self.sql('/api/products/?fields=name,price')
+        # No options prefetch and no category join
+        self.assertEqual(len(sparse), len(full) - 1)
+        select = sparse[-1]
+        self.assertNotIn('api_category', select)
+        self.assertNotIn('"description"', select)
+        self.assertIn('"name"', select)
+
+    def test_related_fields_still_work_when_selected(self):
+        body = self.get('/api/products/?fields=name,category_name,available_options')
+        self.assertEqual(body[0]['category_name'], "Cakes")
+        self.assertEqual(body[0]['available_options'][0]['name'], "Rose")
+        with self.assertNumQueries(2):
+            self.get('/api/products/?fields=name,category_name,available_options')
+
+    def test_detail_and_fast_json_agree(self):
+        slug = Product.objects.get(name="Cake 1").slug
+        for path in (
+            '/api/products/?fields=id,image,image_srcset,image_placeholder,created_at',
+            '/api/products/?omit=available_options,category_name',
+            f'/api/products/{slug}/?fields=name,available_options',
+        ):
+            with self.subTest(path=path):
+                expected = APIClient().get(path).content
+                cache.clear()
+                with override_settings(**FAST):
+                    self.assertEqual(APIClient().get(path).content, expected)
+
+    def test_fast_json_skips_options_queries(self):
+        with override_settings(**FAST), self.assertNumQueries(1):
+            self.get('/api/products/?fields=name,price')
+
+    def test_orders_skip_items_prefetch(self):
+        body = self.get('/api/orders/?fields=id,status')
+        self.assertEqual(list(body[0]), ['id', 'status'])
+        self.assertEqual(len(self.sql('/api/orders/?omit=items')), len(self.sql('/api/orders/')) - 1)
+
+    def test_site_content_variants(self):
+        full = self.get('/api/site-content/')
+        self.assertEqual(full['features'][0]['title'], "Fresh")
+        with self.assertNumQueries(1):
+            body = self.get('/api/site-content/?fields=hero_title,hero_main_image_srcset')
+        self.assertEqual(list(body), ['hero_title', 'hero_main_image_srcset'])
+        # Each selection is cached separately from the full document
+        self.assertIn('features', self.get('/api/site-content/'))
+        self.assertNotIn('features', self.get('/api/site-content/?omit=features'))
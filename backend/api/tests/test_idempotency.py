@@ -0,0 +1,148 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api import idempotency
+from api.models import Category, Product, Order, IdempotencyKey
+
+
+def order_payload(product, quantity=2):
+    return {
+        'customer_name': "Sara", 'email': "sara@example.com", 'phone': "555",
+        'total_price': f"{product.price * quantity:.2f}",
+        'pickup_datetime': (timezone.now() + timedelta(days=2)).replace(hour=12, minute=0, second=0, microsecond=0).isoformat(),
+        'items': [{'product': product.id, 'quantity': quantity, 'price': f"{product.price:.2f}"}],
+    }
+
+
+class IdempotentOrderTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Bread")
+        self.bread = Product.objects.create(category=category, name="Barbari", price=4, description="")
+        self.client = APIClient()
+
+    def place(self, payload, key='checkout-1'):
+        return self.client.post('/api/orders/', payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_first_response(self):
+        payload = order_payload(self.bread)
+        first = self.place(payload)
+        self.assertEqual(first.status_code, 201)
+        # One lookup of the key: no validation, no product query, no insert
+        with self.assertNumQueries(1):
+            retry = self.place(payload)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+
+        # Another key is another order; no key at all behaves as before
+        self.assertEqual(self.place(payload, key='checkout-2').status_code, 201)
+        self.assertEqual(self.client.post('/api/orders/', payload, format='json').status_code, 201)
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_key_reused_for_another_order(self):
+        self.place(order_payload(self.bread))
+        response = self.place(order_payload(self.bread, quantity=3))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.place(order_payload(self.bread), key='').status_code, 400)
+
+    def test_validation_errors_are_replayed(self):
+        payload = dict(order_payload(self.bread), total_price="1.00")
+        first = self.place(payload)
+        self.assertEqual(first.status_code, 400)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.place(payload).json(), first.json())
+
+    def test_duplicate_while_first_is_running(self):
+        payload = order_payload(self.bread)
+        IdempotencyKey.objects.create(key='checkout-1', request_hash=idempotency.fingerprint(payload), created_at=timezone.now())
+        response = self.place(payload)
+        self.assertEqual((response.status_code, response['Retry-After']), (409, '1'))
+        self.assertFalse(Order.objects.exists())
+
+        # A claim left behind by a crashed request is taken over once it is stale
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.place(payload).status_code, 201)
+        self.assertEqual(IdempotencyKey.objects.get().status_code, 201)
+
+    def test_request_outlived_by_its_claim_places_nothing(self):
+        payload = order_payload(self.bread)
+
+        def take_over(order):
+            # A retry took the key over while this request was still running
+            IdempotencyKey.objects.update(created_at=timezone.now() + timedelta(seconds=1))
+
+        with mock.patch('api.serializers.production.add_order', side_effect=take_over):
+            response = self.place(payload)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Order.objects.exists())
+
+    def test_response_is_stored_with_the_order(self):
+        payload = order_payload(self.bread)
+        with mock.patch('api.idempotency.store', side_effect=RuntimeError("crash")):
+            with self.assertRaises(RuntimeError):
+                self.place(payload)
+        # The order rolled back with the missing response, so the retry places it once
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.place(payload).status_code, 201)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_server_errors_release_the_key(self):
+        payload = order_payload(self.bread)
+        with mock.patch('api.serializers.production.add_order', side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                self.place(payload)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.place(payload).status_code, 201)
+
+    def test_expired_keys(self):
+        payload = order_payload(self.bread)
+        self.place(payload)
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        # Past the TTL the key starts over
+        self.assertNotIn('Idempotent-Replayed', self.place(payload))
+        self.assertEqual(Order.objects.count(), 2)
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(idempotency.prune(), 1)
+
+
+class ConcurrentDuplicateTest(TransactionTestCase):
+    THREADS = 12
+
+    def test_concurrent_duplicates_place_one_order(self):
+        category = Category.objects.create(name="Bread")
+        payload = order_payload(Product.objects.create(category=category, name="Barbari", price=4, description=""))
+        start = threading.Barrier(self.THREADS)
+        results = []
+
+        def submit():
+            try:
+                start.wait()
+                while True:
+                    try:
+                        response = APIClient().post('/api/orders/', payload, format='json', HTTP_IDEMPOTENCY_KEY='tap-tap-tap')
+                        break
+                    except OperationalError as e:
+                        # SQLite's shared in-memory test database refuses concurrent writers outright
+                        if 'locked' not in str(e):
+                            raise
+                        time.sleep(0.01)
+                results.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=submit) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.THREADS)
+        self.assertLessEqual(set(results), {201, 409})
+        self.assertEqual(Order.objects.count(), 1)
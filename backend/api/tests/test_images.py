@@ -0,0 +1,129 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from api.models import Category, Product
+
+MEDIA_ROOT = tempfile.mkdtemp()
+DERIVATIVES = {'WIDTHS': (160, 320, 640, 1600), 'FORMATS': ('webp', 'jpeg'), 'QUALITY': 80, 'PLACEHOLDER_WIDTH': 16, 'ON_UPLOAD': True}
+
+
+def upload(name='cake.jpg', size=(1000, 600)):
+    exif = Image.Exif()
+    exif[0x010F] = "Test Camera"
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_DERIVATIVES=DERIVATIVES)
+class ImageDerivativesTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Cakes")
+
+    def media(self, name):
+        return os.path.join(MEDIA_ROOT, name)
+
+    def create(self, **fields):
+        # Derivatives are rendered when the save commits
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(category=self.category, **fields)
+
+    def test_upload_renders_breakpoints_without_metadata(self):
+        product = self.create(name="Saffron", price=10, image=upload())
+        root = os.path.splitext(product.image.name)[0]
+        self.assertEqual(product.image_derivatives['image']['widths'], [160, 320, 640])
+        for width in (160, 320, 640):
+            for fmt in ('webp', 'jpeg'):
+                with Image.open(self.media(f'{root}.{width}w.{fmt}')) as image:
+                    self.assertEqual(image.width, width)
+                    self.assertNotIn('exif', image.info)
+        self.assertFalse(os.path.exists(self.media(f'{root}.1600w.webp')))
+
+    def test_serializer_exposes_srcset(self):
+        product = self.create(name="Saffron", price=10, image=upload())
+        data = APIClient().get(f'/api/products/{product.slug}/').json()
+        self.assertNotIn('image_derivatives', data)
+        self.assertEqual(data['image_srcset']['webp'].count('w, ') + 1, 3)
+        self.assertIn('.320w.jpeg 320w', data['image_srcset']['jpeg'])
+        self.assertTrue(data['image_srcset']['webp'].startswith('http://testserver/media/'))
+
+    def test_small_original_is_not_upscaled(self):
+        product = self.create(name="Tiny", price=1, image=upload(size=(90, 90)))
+        self.assertEqual(product.image_derivatives['image']['widths'], [90])
+
+    def test_replacing_image_removes_old_derivatives(self):
+        product = self.create(name="Saffron", price=10, image=upload())
+        old_root = os.path.splitext(product.image.name)[0]
+        product.image = upload('rose.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.save()
+        self.assertFalse(os.path.exists(self.media(f'{old_root}.160w.webp')))
+        self.assertEqual(product.image_derivatives['image']['source'], product.image.name)
+
+    def test_rolled_back_save_renders_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                product = Product.objects.create(category=self.category, name="Saffron", price=10, image=upload('gone.jpg'))
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertFalse(os.path.exists(self.media(f'{os.path.splitext(product.image.name)[0]}.160w.webp')))
+
+    def test_serializer_inlines_placeholder(self):
+        product = self.create(name="Saffron", price=10, image=upload())
+        placeholder = APIClient().get(f'/api/products/{product.slug}/').json()['image_placeholder']
+        self.assertTrue(placeholder.startswith('data:image/jpeg;base64,'))
+        self.assertLess(len(placeholder), 1500)
+
+    def backfill(self, *args):
+        out = io.StringIO()
+        call_command('generate_image_derivatives', *args, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_backfill_command(self):
+        with override_settings(IMAGE_DERIVATIVES=dict(DERIVATIVES, ON_UPLOAD=False)):
+            product = self.create(name="Saffron", price=10, image=upload())
+        self.assertIsNone(APIClient().get(f'/api/products/{product.slug}/').json()['image_srcset'])
+        # An older product, already in the catalog snapshot
+        Product.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertIsNone(self.catalog_product()['image_srcset'])
+        self.assertIn('Rendered 1 images, 0 unchanged', self.backfill('--workers', '1'))
+        product.refresh_from_db()
+        self.assertEqual(product.image_derivatives['image']['formats'], ['webp', 'jpeg'])
+        self.assertIsNotNone(APIClient().get(f'/api/products/{product.slug}/').json()['image_srcset'])
+        # The backfill moves updated_at, so the catalog's delta refresh picks it up
+        self.assertIsNotNone(self.catalog_product()['image_srcset'])
+
+    def catalog_product(self):
+        return APIClient().get('/api/catalog/').json()['categories'][0]['products'][0]
+
+    def test_backfill_skips_unchanged_content(self):
+        self.create(name="Saffron", price=10, image=upload())
+        self.assertIn('Rendered 0 images, 1 unchanged', self.backfill('--workers', '1'))
+        self.assertIn('Rendered 1 images, 0 unchanged', self.backfill('--workers', '1', '--force'))
+
+    def test_backfill_in_process_pool(self):
+        with override_settings(IMAGE_DERIVATIVES=dict(DERIVATIVES, ON_UPLOAD=False)):
+            products = [
+                self.create(name=f"Cake {i}", price=10, image=upload(f'c{i}.jpg'))
+                for i in range(4)
+            ]
+        self.assertIn('Rendered 4 images', self.backfill('--workers', '2', '--batch', '3'))
+        for product in products:
+            product.refresh_from_db()
+            self.assertIn('hash', product.image_derivatives['image'])
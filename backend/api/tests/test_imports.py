@@ -0,0 +1,126 @@
+import io
+import json
+import os
+import tempfile
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from api import imports
+from api.cache import get_version, model_token
+from api.models import Category, Product, CakeOption
+
+HEADER = 'slug,square_id,name,category,description,price,unit,is_custom_cake,is_featured,options\n'
+
+
+class CatalogImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cakes = Category.objects.create(name="Cakes")
+        cls.rose = CakeOption.objects.create(option_type='FLAVOR', name='Rose')
+        cls.large = CakeOption.objects.create(option_type='SIZE', name='Large')
+        cls.existing = Product.objects.create(
+            category=cakes, name="Rose Cake", slug='rose-cake', description="Layers", price='40.00', square_id='SQ1',
+        )
+        cls.existing.available_options.add(cls.rose)
+
+    def setUp(self):
+        cache.clear()
+
+    def row(self, **overrides):
+        return dict({
+            'slug': 'rose-cake', 'square_id': 'SQ1', 'name': "Rose Cake", 'category': "Cakes",
+            'description': "Layers", 'price': '40.00', 'unit': 'ea', 'options': ['FLAVOR:Rose'],
+        }, **overrides)
+
+    def test_counts_created_updated_unchanged(self):
+        result = imports.import_catalog([
+            self.row(),
+            self.row(slug='tea-bread', square_id='SQ2', name="Tea Bread", category="Bread", price='6', options=[]),
+        ])
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (1, 0, 1))
+        self.assertEqual(result['categories_created'], 1)
+        bread = Product.objects.get(slug='tea-bread')
+        self.assertEqual(bread.category.name, "Bread")
+        self.assertIsNotNone(bread.created_at)
+
+        result = imports.import_catalog([self.row(price='42.50')])
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (0, 1, 0))
+        self.assertEqual(str(Product.objects.get(slug='rose-cake').price), '42.50')
+
+    def test_matches_on_square_id_before_slug(self):
+        imports.import_catalog([self.row(slug='rose-layer-cake', name="Rose Layer Cake")])
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual(Product.objects.get(pk=self.existing.pk).slug, 'rose-layer-cake')
+
+    def test_options_are_synced_in_bulk(self):
+        result = imports.import_catalog([self.row(options=['SIZE:Large'])])
+        self.assertEqual((result['links_added'], result['links_removed'], result['updated']), (1, 1, 1))
+        self.assertEqual(list(self.existing.available_options.all()), [self.large])
+        # Rows without an options key leave the links alone
+        imports.import_catalog([{k: v for k, v in self.row().items() if k != 'options'}])
+        self.assertEqual(list(self.existing.available_options.all()), [self.large])
+
+    def test_invalid_rows_write_nothing(self):
+        with self.assertRaises(imports.CatalogImportError) as ctx:
+            imports.import_catalog([
+                self.row(slug='new-one', square_id=None, name="New"),
+                self.row(slug='bad', square_id=None, price='abc'),
+                self.row(slug='worse', square_id=None, options=['FLAVOR:Mango']),
+            ])
+        self.assertEqual(len(ctx.exception.errors), 2)
+        self.assertFalse(Product.objects.filter(slug='new-one').exists())
+
+    def test_dry_run_reports_without_writing(self):
+        result = imports.import_catalog([self.row(price='1.00'), self.row(slug='new', square_id=None)], dry_run=True)
+        self.assertEqual((result['created'], result['updated']), (1, 1))
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_dry_run_reports_what_the_import_does(self):
+        rows = [
+            self.row(options=['SIZE:Large']),  # only the options change
+            self.row(slug='tea-bread', square_id=None, name="Tea Bread", category="Bread", options=['SIZE:Large']),
+            self.row(slug='rye-bread', square_id=None, name="Rye Bread", category="Bread", options=[]),
+        ]
+        planned = imports.import_catalog(rows, dry_run=True)
+        self.assertFalse(Category.objects.filter(name="Bread").exists())
+        self.assertEqual(planned, imports.import_catalog(rows))
+        self.assertEqual((planned['created'], planned['updated'], planned['links_added']), (2, 1, 2))
+        self.assertEqual(imports.import_catalog(rows, dry_run=True), imports.import_catalog(rows))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        rows = [self.row(slug=f'p-{i}', square_id=None, name=f"P {i}") for i in range(60)]
+        with self.assertNumQueries(9):
+            imports.import_catalog(rows[:20])
+        with self.assertNumQueries(9):
+            imports.import_catalog(rows[20:])
+
+    def test_caches_and_catalog_are_refreshed(self):
+        before = get_version(model_token(Product))
+        with self.captureOnCommitCallbacks(execute=True):
+            imports.import_catalog([self.row(price='50.00')])
+        self.assertGreater(get_version(model_token(Product)), before)
+        body = json.loads(self.client.get('/api/catalog/').content)
+        self.assertEqual(body['categories'][0]['products'][0]['price'], '50.00')
+
+    def test_command_reads_csv_and_json(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'catalog.csv')
+            with open(path, 'w') as f:
+                f.write(HEADER + 'rose-cake,SQ1,Rose Cake,Cakes,Layers,40.00,ea,0,0,FLAVOR:Rose\n'
+                                 'tart,,Tart,Cakes,,12,ea,false,yes,FLAVOR:Rose|SIZE:Large\n')
+            out = io.StringIO()
+            call_command('import_catalog', path, stdout=out)
+            self.assertIn("1 created, 0 updated, 1 unchanged", out.getvalue())
+            self.assertEqual(Product.objects.get(slug='tart').available_options.count(), 2)
+
+            path = os.path.join(tmp, 'catalog.json')
+            with open(path, 'w') as f:
+                json.dump({'products': [self.row(price=41)]}, f)
+            call_command('import_catalog', path, stdout=out)
+            self.assertIn("0 created, 1 updated, 0 unchanged", out.getvalue())
+
+            with open(path, 'w') as f:
+                json.dump([self.row(unit='box')], f)
+            with self.assertRaisesMessage(CommandError, "unknown unit"):
+                call_command('import_catalog', path, stdout=out)
@@ -0,0 +1,90 @@
+import os
+from datetime import timedelta
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.models import Category, Product, Order
+from api.views import ProductViewSet, OrderViewSet
+
+# Rows of each model to seed; lower it locally with EXPLAIN_DATASET_SIZE for a quicker run
+DATASET_SIZE = int(os.getenv('EXPLAIN_DATASET_SIZE', 100_000))
+
+
+class QueryPlanTest(TestCase):
+    """Every public query shape must be answered from an index, never a full scan or sort"""
+
+    @classmethod
+    def setUpTestData(cls):
+        categories = Category.objects.bulk_create(
+            [Category(name=f"Category {i}", slug=f"category-{i}") for i in range(20)]
+        )
+        now = timezone.now()
+        Product.objects.bulk_create(
+            [
+                Product(
+                    category=categories[i % len(categories)], name=f"Product {i}", slug=f"product-{i}",
+                    description="Layers of phyllo", price=(i % 5000) / 100 + 1,
+                    is_custom_cake=i % 20 == 0, is_featured=i % 100 == 0,
+                )
+                for i in range(DATASET_SIZE)
+            ],
+            batch_size=5000,
+        )
+        statuses = [s for s, _ in Order.STATUS_CHOICES]
+        Order.objects.bulk_create(
+            [
+                Order(
+                    customer_name=f"Customer {i}", email="c@example.com", phone="555", total_price=10,
+                    pickup_datetime=now + timedelta(minutes=15 * (i % 40000)), status=statuses[i % len(statuses)],
+                )
+                for i in range(DATASET_SIZE)
+            ],
+            batch_size=5000,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def view_queryset(self, viewset, path):
+        request = Request(APIRequestFactory().get(path))
+        view = viewset(request=request, format_kwarg=None, action='list', kwargs={})
+        return view.filter_queryset(view.get_queryset())[:20]
+
+    def assertIndexOnly(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan', plan, plan)
+            self.assertNotRegex(plan, r'(?m)^\s*(->\s*)?Sort\b', plan)
+        else:
+            for line in plan.splitlines():
+                if 'SCAN' in line:
+                    self.assertIn('USING', line, plan)
+            self.assertNotIn('TEMP B-TREE', plan, plan)
+
+    def test_product_shapes(self):
+        paths = [
+            '/api/products/',
+            '/api/products/?is_featured=true',
+            '/api/products/?is_custom_cake=true',
+            '/api/products/?category__slug=category-3',
+            '/api/products/?ordering=price',
+            '/api/products/?ordering=-created_at',
+        ]
+        for path in paths:
+            with self.subTest(path=path):
+                self.assertIndexOnly(self.view_queryset(ProductViewSet, path))
+
+    def test_order_shapes(self):
+        now = timezone.now()
+        querysets = {
+            'api list': self.view_queryset(OrderViewSet, '/api/orders/'),
+            'by pickup': self.view_queryset(OrderViewSet, '/api/orders/?ordering=pickup_datetime'),
+            'status filter': Order.objects.filter(status='Paid').order_by('pickup_datetime')[:20],
+            'pickup range': Order.objects.filter(
+                pickup_datetime__gte=now, pickup_datetime__lt=now + timedelta(days=1)
+            ).order_by('pickup_datetime'),
+        }
+        for name, queryset in querysets.items():
+            with self.subTest(shape=name):
+                self.assertIndexOnly(queryset)
@@ -0,0 +1,61 @@
+import json
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from api import instrumentation
+from api.models import Category, Product
+
+METRICS = {'ENABLED': True, 'SERVER_TIMING': True, 'SLOW_REQUEST_MS': 10_000, 'SLOW_QUERY_MS': 10_000, 'STACK_DEPTH': 8}
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentation.reset()
+        category = Category.objects.create(name="Pastries")
+        Product.objects.create(category=category, name="Baklava", price=5)
+
+    @override_settings(REQUEST_METRICS=METRICS)
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs('api.requests', 'INFO') as logs:
+            response = APIClient().get('/api/products/')
+        self.assertRegex(response['Server-Timing'], r'db;dur=[\d.]+;desc="2 queries", serialize;dur=[\d.]+, total;dur=')
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['route'], 'GET product-list')
+        self.assertEqual(entry['queries'], 2)
+        self.assertNotIn('sql', entry)
+
+    @override_settings(REQUEST_METRICS=dict(METRICS, SLOW_QUERY_MS=0))
+    def test_slow_queries_carry_sql_and_stack(self):
+        with self.assertLogs('api.requests', 'WARNING') as logs:
+            APIClient().get('/api/products/')
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertIn('api_product', entry['sql'][0]['sql'])
+        self.assertTrue(any('views.py' in frame or 'conditional.py' in frame for frame in entry['sql'][0]['stack']))
+
+    @override_settings(REQUEST_METRICS=dict(METRICS, SLOW_REQUEST_MS=0))
+    def test_slow_request_logs_its_queries(self):
+        with self.assertLogs('api.requests', 'WARNING') as logs:
+            APIClient().get('/api/products/')
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertTrue(entry['slow_request'])
+        self.assertEqual(len(entry['sql']), 2)
+
+    def test_disabled_adds_nothing(self):
+        response = APIClient().get('/api/products/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(instrumentation.snapshot(), {})
+
+    @override_settings(REQUEST_METRICS=METRICS)
+    def test_histogram_endpoint_is_admin_only(self):
+        client = APIClient()
+        with self.assertLogs('api.requests', 'INFO'):
+            client.get('/api/products/')
+            client.get('/api/products/')
+            self.assertEqual(client.get('/api/metrics/requests/').status_code, 403)
+            client.force_authenticate(User.objects.create_user('staff', password='x', is_staff=True))
+            routes = client.get('/api/metrics/requests/').json()['routes']
+        self.assertEqual(routes['GET product-list']['count'], 2)
+        self.assertEqual(routes['GET product-list']['queries_per_request'], 2)
+        self.assertEqual(sum(routes['GET product-list']['buckets_ms'].values()), 2)
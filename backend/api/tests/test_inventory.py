@@ -0,0 +1,148 @@
+import threading
+import time
+from datetime import timedelta
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api import inventory
+from api.models import Category, Product, Order, OrderItem, DailyStock
+
+ROOMY_SLOTS = {'INTERVAL_MINUTES': 15, 'CAPACITY': {'regular': 1000, 'custom_cake': 1000}}
+
+
+def order_payload(product, quantity, pickup):
+    return {
+        'customer_name': "Sara", 'email': "sara@example.com", 'phone': "555",
+        'total_price': f"{product.price * quantity:.2f}", 'pickup_datetime': pickup.isoformat(),
+        'items': [{'product': product.id, 'quantity': quantity, 'price': f"{product.price:.2f}"}],
+    }
+
+
+class DailyStockTest(TestCase):
+    def setUp(self):
+        bread = Category.objects.create(name="Bread")
+        self.barbari = Product.objects.create(category=bread, name="Barbari", price=4, description="", daily_batch=5)
+        self.lavash = Product.objects.create(category=bread, name="Lavash", price=3, description="")
+        self.pickup = timezone.now().replace(hour=12, minute=0) + timedelta(days=5)
+        self.day = inventory.pickup_date(self.pickup)
+        self.client = APIClient()
+
+    def place(self, product, quantity, pickup=None):
+        return self.client.post('/api/orders/', order_payload(product, quantity, pickup or self.pickup), format='json')
+
+    def stock(self, day=None):
+        return DailyStock.objects.get(date=day or self.day, product=self.barbari)
+
+    def test_orders_take_from_the_days_batch(self):
+        self.assertEqual(self.place(self.barbari, 3).status_code, 201)
+        response = self.place(self.barbari, 3)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Only 2 Barbari left", response.json()['items'][0])
+        # The refused order left nothing behind
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.place(self.barbari, 2).status_code, 201)
+        self.assertEqual((self.stock().reserved, self.stock().capacity), (5, 5))
+        # Another day has its own batch; unlimited products are never refused
+        self.assertEqual(self.place(self.barbari, 5, self.pickup + timedelta(days=1)).status_code, 201)
+        self.assertEqual(self.place(self.lavash, 500).status_code, 201)
+        self.assertFalse(DailyStock.objects.filter(product=self.lavash).exists())
+
+    def test_staff_changes_move_stock(self):
+        order = Order.objects.get(pk=self.place(self.barbari, 4).json()['id'])
+        order.status = 'Cancelled'
+        order.save()
+        self.assertEqual(self.stock().reserved, 0)
+        order.status = 'Paid'
+        order.save()
+        self.assertEqual(self.stock().reserved, 4)
+
+        order.pickup_datetime += timedelta(days=1)
+        order.save()
+        self.assertEqual(self.stock().reserved, 0)
+        self.assertEqual(self.stock(self.day + timedelta(days=1)).reserved, 4)
+
+        item = order.items.get()
+        item.quantity = 6  # staff may bake beyond the batch
+        item.save()
+        self.assertEqual(self.stock(self.day + timedelta(days=1)).reserved, 6)
+        order.delete()
+        self.assertEqual(self.stock(self.day + timedelta(days=1)).reserved, 0)
+
+    def test_availability_on_products(self):
+        self.place(self.barbari, 2)
+        url = f'/api/products/?pickup_date={self.day.isoformat()}'
+        body = {p['name']: p for p in self.client.get(url).json()}
+        self.assertEqual(body['Barbari']['available_quantity'], 3)
+        self.assertIsNone(body['Lavash']['available_quantity'])
+        tomorrow = self.client.get(f'/api/products/barbari/?pickup_date={(self.day + timedelta(days=1)).isoformat()}')
+        self.assertEqual(tomorrow.json()['available_quantity'], 5)
+        # Staff booking past the batch leaves none, not a negative count
+        inventory.reserve(self.day + timedelta(days=1), [(self.barbari, 7)], force=True)
+        tomorrow = self.client.get(f'/api/products/barbari/?pickup_date={(self.day + timedelta(days=1)).isoformat()}')
+        self.assertEqual(tomorrow.json()['available_quantity'], 0)
+        self.assertEqual(self.client.get('/api/products/?pickup_date=soon').status_code, 400)
+
+        # New orders change the ETag of the product list
+        etag = self.client.get(url)['ETag']
+        self.place(self.barbari, 1)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_availability_costs_no_queries_per_product(self):
+        bread = Category.objects.get()
+        url = f'/api/products/?pickup_date={self.day.isoformat()}'
+        self.client.get(url)
+        with self.assertNumQueries(2) as few:
+            self.client.get(url)
+        for i in range(20):
+            product = Product.objects.create(category=bread, name=f"Loaf {i}", price=2, description="", daily_batch=10)
+            OrderItem.objects.create(
+                order=Order.objects.create(customer_name="A", email="a@example.com", phone="1", total_price=2, pickup_datetime=self.pickup),
+                product=product, quantity=1, price=2,
+            )
+        with self.assertNumQueries(len(few.captured_queries)):
+            body = self.client.get(url).json()
+        self.assertEqual({p['available_quantity'] for p in body if p['name'].startswith("Loaf")}, {9})
+
+
+@override_settings(PICKUP_SLOTS=ROOMY_SLOTS)
+class DailyStockConcurrencyTest(TransactionTestCase):
+    THREADS = 24
+    BATCH = 10
+
+    def test_no_oversell_under_concurrent_checkouts(self):
+        bread = Category.objects.create(name="Bread")
+        product = Product.objects.create(category=bread, name="Barbari", price=4, description="", daily_batch=self.BATCH)
+        pickup = timezone.now().replace(hour=12, minute=0) + timedelta(days=5)
+        start = threading.Barrier(self.THREADS)
+        results = []
+
+        def checkout():
+            try:
+                start.wait()
+                while True:
+                    try:
+                        response = APIClient().post('/api/orders/', order_payload(product, 1, pickup), format='json')
+                        break
+                    except OperationalError as e:
+                        # SQLite's shared in-memory test database refuses concurrent writers outright; retry like a client would
+                        if 'locked' not in str(e):
+                            raise
+                        time.sleep(0.01)
+                results.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), self.THREADS)
+        self.assertLessEqual(set(results), {201, 400})
+        self.assertGreaterEqual(results.count(400), self.THREADS - self.BATCH)
+        # The whole batch sold, and not one more
+        self.assertEqual(DailyStock.objects.get(product=product).reserved, self.BATCH)
+        self.assertEqual(OrderItem.objects.filter(product=product).count(), self.BATCH)
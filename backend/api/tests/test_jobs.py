@@ -0,0 +1,186 @@
+import io
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api import jobs, tasks
+from api.models import Category, Product, Order, OrderItem, Job
+from .square_stub import SquareStub
+
+calls = []
+
+
+@jobs.task('test_record')
+def record(value):
+    calls.append(value)
+
+
+@jobs.task('test_fail', max_attempts=2)
+def fail():
+    raise RuntimeError("oven on fire")
+
+
+@jobs.task('test_slow')
+def slow(seconds):
+    # Outlives the lease, then checks whether the sweep took the job away meanwhile
+    time.sleep(seconds)
+    calls.append(jobs.requeue_stale())
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.stop = threading.Event()
+
+    def test_idempotency_key(self):
+        first = jobs.enqueue('test_record', {'value': 1}, key='once')
+        second = jobs.enqueue('test_record', {'value': 2}, key='once')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.get().payload, {'value': 1})
+        with self.assertRaises(KeyError):
+            jobs.enqueue('no_such_job')
+
+    def test_claim_skips_future_and_claimed_jobs(self):
+        now = jobs.enqueue('test_record', {'value': 1})
+        jobs.enqueue('test_record', {'value': 2}, delay=timedelta(hours=1))
+        claimed = jobs.claim('w1', limit=5)
+        self.assertEqual([job.pk for job in claimed], [now.pk])
+        self.assertEqual((claimed[0].status, claimed[0].attempts, claimed[0].locked_by), ('running', 1, 'w1'))
+        self.assertEqual(jobs.claim('w2', limit=5), [])
+
+        self.assertTrue(jobs.run(claimed[0]))
+        self.assertEqual(calls, [1])
+        self.assertEqual(Job.objects.get(pk=now.pk).status, 'done')
+
+    def test_retry_with_backoff_then_fail(self):
+        job = jobs.enqueue('test_fail')
+        self.assertEqual(job.max_attempts, 2)
+        with self.assertLogs('api.jobs', 'WARNING'):
+            self.assertFalse(jobs.run(jobs.claim('w')[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn("oven on fire", job.last_error)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=settings.JOBS['BACKOFF_SECONDS'] / 2 - 1))
+        # Not due until the backoff passes
+        self.assertEqual(jobs.claim('w'), [])
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('api.jobs', 'ERROR'):
+            jobs.run(jobs.claim('w')[0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_backoff_grows_and_is_capped(self):
+        self.assertLess(jobs.backoff(1), jobs.backoff(4))
+        self.assertLessEqual(jobs.backoff(40).total_seconds(), settings.JOBS['BACKOFF_MAX_SECONDS'])
+
+    def test_stale_jobs_are_requeued(self):
+        job = jobs.enqueue('test_record', {'value': 1})
+        jobs.claim('dead-worker')
+        self.assertEqual(jobs.requeue_stale(), 0)
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=settings.JOBS['LEASE_SECONDS'] + 1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.work(self.stop, drain=True), 1)
+        self.assertEqual(calls, [1])
+
+    def test_stale_jobs_out_of_attempts_fail(self):
+        job = jobs.enqueue('test_record', {'value': 1})
+        Job.objects.filter(pk=job.pk).update(attempts=job.max_attempts - 1)
+        jobs.claim('dead-worker')
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=settings.JOBS['LEASE_SECONDS'] + 1))
+        self.assertEqual(jobs.requeue_stale(), 0)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('failed', ''))
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(jobs.work(self.stop, drain=True), 0)
+        self.assertEqual(calls, [])
+
+    def test_prune_keeps_recent_and_failed(self):
+        old = timezone.now() - timedelta(days=settings.JOBS['KEEP_DONE_DAYS'] + 1)
+        for status in ('done', 'failed'):
+            Job.objects.create(name='test_record', status=status, run_at=old, finished_at=old)
+        Job.objects.create(name='test_record', status='done', run_at=old, finished_at=timezone.now())
+        self.assertEqual(jobs.prune(), 1)
+        self.assertEqual(Job.objects.count(), 2)
+
+    def test_command_drains_queue(self):
+        for value in range(3):
+            jobs.enqueue('test_record', {'value': value})
+        out = io.StringIO()
+        call_command('run_worker', '--drain', '--batch', '2', stdout=out)
+        self.assertIn("Ran 3 jobs", out.getvalue())
+        self.assertEqual(calls, [0, 1, 2])
+
+
+class OrderJobsTest(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Bread")
+        self.bread = Product.objects.create(category=category, name="Barbari", price=4.5, description="Flat")
+        self.stop = threading.Event()
+
+    def place(self):
+        payload = {
+            'customer_name': "Sara", 'email': "sara@example.com", 'phone': "555",
+            'total_price': "9.00", 'pickup_datetime': (timezone.now() + timedelta(days=1)).replace(hour=12, minute=0).isoformat(),
+            'items': [{'product': self.bread.id, 'quantity': 2, 'price': "4.50"}],
+        }
+        return APIClient().post('/api/orders/', payload, format='json')
+
+    def test_jobs_are_queued_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.place()
+            # Nothing is queued until the order's transaction commits
+            self.assertFalse(Job.objects.exists())
+        self.assertEqual(response.status_code, 201)
+        for callback in callbacks:
+            callback()
+        order_id = response.json()['id']
+        order_jobs = Job.objects.filter(name__in=tasks.ORDER_JOBS)
+        self.assertEqual(
+            set(order_jobs.values_list('idempotency_key', flat=True)),
+            {f'send_order_confirmation:{order_id}', f'print_kitchen_ticket:{order_id}'},
+        )
+
+        with self.assertLogs('api.kitchen') as logs:
+            self.assertEqual(jobs.work(self.stop, drain=True), 2)
+        self.assertIn("2 x Barbari", logs.output[0])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["sara@example.com"])
+        self.assertIn(f"order #{order_id}", mail.outbox[0].subject)
+        self.assertEqual(set(order_jobs.values_list('status', flat=True)), {'done'})
+
+    def test_paid_order_is_pushed_to_square(self):
+        with SquareStub() as stub:
+            config = dict(settings.SQUARE, BASE_URL=stub.url, ACCESS_TOKEN='test-token', LOCATION_ID='LOC1')
+            with override_settings(SQUARE=config):
+                order = Order.objects.create(
+                    customer_name="Ana", email="a@example.com", phone="555", total_price='9.00',
+                    pickup_datetime=timezone.now() + timedelta(days=1),
+                )
+                OrderItem.objects.create(order=order, product=self.bread, quantity=2, price='4.50')
+                with self.captureOnCommitCallbacks(execute=True):
+                    order.status = 'Paid'
+                    order.save()
+                    order.save()
+                self.assertEqual(Job.objects.filter(name='push_order_to_square').count(), 1)
+                Job.objects.exclude(name='push_order_to_square').delete()
+                self.assertEqual(jobs.work(self.stop, drain=True), 1)
+        order.refresh_from_db()
+        self.assertEqual(order.square_order_id, stub.orders[f'natalie-order-{order.pk}']['id'])
+
+
+@override_settings(JOBS=dict(settings.JOBS, LEASE_SECONDS=0.3))
+class JobHeartbeatTest(TransactionTestCase):
+    def test_long_job_keeps_its_lease(self):
+        # The heartbeat writes from its own thread, so this runs outside a test transaction
+        calls.clear()
+        job = jobs.enqueue('test_slow', {'seconds': 0.8})
+        self.assertEqual(jobs.work(threading.Event(), drain=True), 1)
+        self.assertEqual(calls, [0])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('done', 1))
@@ -0,0 +1,127 @@
+import io
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api import production
+from api.models import Category, Product, Order, OrderItem, ProductionLine
+
+
+class ProductionPlanTest(TestCase):
+    def setUp(self):
+        bread = Category.objects.create(name="Bread")
+        cakes = Category.objects.create(name="Cakes")
+        self.barbari = Product.objects.create(category=bread, name="Barbari", price=4.5, description="")
+        self.cake = Product.objects.create(category=cakes, name="Rose Cake", price=40, description="", is_custom_cake=True)
+        self.pickup = timezone.now().replace(hour=12, minute=0) + timedelta(days=5)
+        self.day = production.pickup_date(self.pickup)
+
+    def order(self, lines, status='Pending', pickup=None):
+        order = Order.objects.create(
+            customer_name="Sara", email="s@example.com", phone="555", total_price=10,
+            pickup_datetime=pickup or self.pickup, status=status,
+        )
+        for product, quantity, *options in lines:
+            OrderItem.objects.create(
+                order=order, product=product, quantity=quantity, price=1,
+                **dict(zip(production.OPTIONS, options)),
+            )
+        return order
+
+    def snapshot(self):
+        return sorted(
+            (line.pickup_date, line.product_id, line.flavor, line.filling, line.size, line.quantity)
+            for line in ProductionLine.objects.filter(quantity__gt=0)
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        production.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_lines_follow_orders(self):
+        first = self.order([(self.barbari, 3), (self.cake, 1, 'Saffron', 'Cream', '6"')])
+        self.order([(self.barbari, 2), (self.cake, 1, 'Saffron', 'Cream', '6"'), (self.cake, 1, 'Rose', None, '8"')])
+        plan = production.plan(self.day)
+        self.assertEqual([(p['name'], p['quantity']) for p in plan], [("Barbari", 5), ("Rose Cake", 3)])
+        self.assertEqual(
+            [(v['flavor'], v['quantity']) for v in plan[1]['variants']], [('Rose', 1), ('Saffron', 2)],
+        )
+        self.assertMatchesRebuild()
+
+        # Cancelling removes the order; reinstating brings it back
+        first.status = 'Cancelled'
+        first.save()
+        self.assertEqual(production.plan(self.day)[0]['quantity'], 2)
+        self.assertMatchesRebuild()
+        first.status = 'Paid'
+        first.save()
+        self.assertEqual(production.plan(self.day)[0]['quantity'], 5)
+
+        # Rescheduling moves it to the new day
+        first.pickup_datetime += timedelta(days=1)
+        first.save()
+        self.assertEqual(production.plan(self.day)[0]['quantity'], 2)
+        self.assertEqual(production.plan(self.day + timedelta(days=1))[0]['quantity'], 3)
+        self.assertMatchesRebuild()
+
+    def test_line_edits_and_deletes(self):
+        order = self.order([(self.barbari, 3), (self.cake, 1, 'Saffron', None, None)])
+        item = order.items.get(product=self.cake)
+        item.flavor, item.quantity = 'Rose', 2
+        item.save()
+        self.assertEqual(
+            [(v['flavor'], v['quantity']) for v in production.plan(self.day)[1]['variants']], [('Rose', 2)],
+        )
+        order.items.get(product=self.barbari).delete()
+        self.assertMatchesRebuild()
+        order.delete()
+        self.assertEqual(production.plan(self.day), [])
+        self.assertMatchesRebuild()
+
+    def test_api_orders_are_counted(self):
+        payload = {
+            'customer_name': "Sara", 'email': "sara@example.com", 'phone': "555", 'total_price': "9.00",
+            'pickup_datetime': self.pickup.isoformat(),
+            'items': [{'product': self.barbari.id, 'quantity': 2, 'price': "4.50"}],
+        }
+        self.assertEqual(APIClient().post('/api/orders/', payload, format='json').status_code, 201)
+        self.assertEqual(production.plan(self.day)[0]['quantity'], 2)
+
+    def test_plan_reads_one_day(self):
+        # History on other days does not change the cost of reading one
+        self.order([(self.barbari, 1)])
+        with self.assertNumQueries(1):
+            production.plan(self.day)
+        for days in range(1, 30):
+            self.order([(self.barbari, 1), (self.cake, 1, 'Rose', None, None)], pickup=self.pickup - timedelta(days=days))
+        with self.assertNumQueries(1):
+            self.assertEqual(len(production.plan(self.day)), 1)
+
+    def test_rebuild_range_and_command(self):
+        self.order([(self.barbari, 1)])
+        self.order([(self.barbari, 4)], pickup=self.pickup + timedelta(days=2))
+        ProductionLine.objects.update(quantity=99)
+        out = io.StringIO()
+        call_command('rebuild_production_plan', '--from', self.day.isoformat(), '--to', self.day.isoformat(), stdout=out)
+        self.assertIn("Wrote 1 production lines", out.getvalue())
+        quantities = dict(ProductionLine.objects.values_list('pickup_date', 'quantity'))
+        self.assertEqual(quantities, {self.day: 1, self.day + timedelta(days=2): 99})
+
+    def test_endpoint_and_print_view(self):
+        self.order([(self.cake, 1, 'Saffron', 'Cream', '6"')])
+        client = APIClient()
+        url = f'/api/production-plan/?date={self.day.isoformat()}'
+        self.assertEqual(client.get(url).status_code, 403)
+        client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        body = client.get(url).json()
+        self.assertEqual(body['products'][0]['variants'], [{'flavor': 'Saffron', 'filling': 'Cream', 'size': '6"', 'quantity': 1}])
+        self.assertEqual(client.get('/api/production-plan/?date=tomorrow').status_code, 400)
+
+        self.client.force_login(User.objects.get(username='admin'))
+        self.assertContains(self.client.get('/admin/api/productionline/'), "Print today's plan")
+        response = self.client.get(f'/admin/api/productionline/print/?date={self.day.isoformat()}')
+        self.assertContains(response, "Rose Cake")
+        self.assertContains(response, "Saffron")
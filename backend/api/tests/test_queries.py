@@ -0,0 +1,89 @@
+from datetime import timedelta
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.models import Category, Product, CakeOption, Order, OrderItem, SiteContent, SiteFeature, UIAsset
+from api.tests.query_budget import QueryBudgetMixin
+
+
+class EndpointQueryBudgetTest(QueryBudgetMixin, TestCase):
+    """Every read endpoint must run a fixed number of queries regardless of result size"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = Category.objects.create(name="Pastries")
+        self.flavor = CakeOption.objects.create(option_type='FLAVOR', name='Rose')
+        self.size = CakeOption.objects.create(option_type='SIZE', name='Large')
+        self.make_products(3)
+
+    def make_products(self, count):
+        start = Product.objects.count()
+        for i in range(start, start + count):
+            category = Category.objects.create(name=f"Category {i}")
+            product = Product.objects.create(
+                category=category, name=f"Product {i}", price=10, description="Treat"
+            )
+            product.available_options.add(self.flavor, self.size)
+
+    def make_orders(self, count):
+        product = Product.objects.first()
+        for i in range(count):
+            order = Order.objects.create(
+                customer_name=f"Customer {i}", email="c@example.com", phone="123",
+                total_price=20, pickup_datetime=timezone.now() + timedelta(days=5)
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=2, price=10)
+
+    def test_product_list_is_constant(self):
+        self.assertConstantQueries('/api/products/', lambda: self.make_products(10))
+
+    def test_product_list_budget(self):
+        # products + prefetched options
+        self.assertMaxQueries(2, '/api/products/')
+
+    def test_product_detail_budget(self):
+        slug = Product.objects.first().slug
+        self.assertMaxQueries(2, f'/api/products/{slug}/')
+
+    def test_category_list_is_constant(self):
+        self.assertConstantQueries('/api/categories/', lambda: self.make_products(5))
+
+    def test_cake_option_list_is_constant(self):
+        grow = lambda: CakeOption.objects.create(option_type='FILLING', name='Honey')
+        self.assertConstantQueries('/api/cake-options/', grow)
+
+    def test_order_list_is_constant(self):
+        self.make_orders(2)
+        self.assertConstantQueries('/api/orders/', lambda: self.make_orders(10))
+
+    def test_ui_asset_list_is_constant(self):
+        grow = lambda: UIAsset.objects.create(key=f"asset-{UIAsset.objects.count()}", image='content/ui/x.png')
+        self.assertConstantQueries('/api/ui-assets/', grow)
+
+    def test_site_content_is_constant(self):
+        content = SiteContent.load()
+
+        def grow():
+            for i in range(5):
+                SiteFeature.objects.create(site_content=content, title=f"F{i}", text="Text", order=i)
+
+        self.assertConstantQueries('/api/site-content/', grow)
+
+    def test_order_create_is_constant(self):
+        products = list(Product.objects.all())
+
+        def post(lines):
+            items = [{'product': products[i % len(products)].id, 'quantity': 1, 'price': "10.00"} for i in range(lines)]
+            payload = {
+                'customer_name': "Sara", 'email': "sara@example.com", 'phone': "555",
+                'total_price': f"{lines * 10}.00", 'pickup_datetime': (timezone.now() + timedelta(days=1)).replace(hour=12, minute=0).isoformat(),
+                'items': items,
+            }
+            response, used = self.count_queries('/api/orders/', method='post', data=payload, format='json')
+            self.assertEqual(response.status_code, 201)
+            return used
+
+        post(1)  # warm the price table
+        self.assertEqual(post(2), post(40))
@@ -0,0 +1,91 @@
+from datetime import date, datetime, time, timedelta
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from api import scheduling
+from api.models import Category, Product, Order, PickupSlot
+
+SMALL_SLOTS = {'INTERVAL_MINUTES': 30, 'CAPACITY': {'regular': 2, 'custom_cake': 1}}
+
+
+def next_weekday(weekday, hour=12, minute=0):
+    day = timezone.localdate() + timedelta(days=7)
+    day += timedelta(days=(weekday - day.weekday()) % 7)
+    return timezone.make_aware(datetime.combine(day, time(hour, minute)))
+
+
+class OpeningHoursTest(TestCase):
+    def test_slots_follow_bakery_hours(self):
+        monday = next_weekday(0).date()
+        sunday = next_weekday(6).date()
+        self.assertEqual(scheduling.slot_starts(monday)[0], time(9, 0))
+        self.assertEqual(scheduling.slot_starts(monday)[-1], time(19, 45))
+        self.assertEqual(scheduling.slot_starts(sunday)[0], time(10, 0))
+        self.assertEqual(scheduling.slot_starts(sunday)[-1], time(18, 45))
+
+    def test_slot_key_floors_to_window(self):
+        pickup = next_weekday(2, hour=14, minute=37)
+        self.assertEqual(scheduling.slot_key(pickup), (pickup.date(), time(14, 30)))
+        self.assertIsNone(scheduling.slot_key(next_weekday(2, hour=20, minute=5)))
+        self.assertIsNone(scheduling.slot_key(next_weekday(6, hour=9, minute=30)))
+
+
+@override_settings(PICKUP_SLOTS=SMALL_SLOTS)
+class PickupCapacityTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        category = Category.objects.create(name="Bread")
+        self.bread = Product.objects.create(category=category, name="Barbari", price=4.5, description="Flat")
+        self.pickup = next_weekday(1)
+
+    def place(self, pickup=None):
+        payload = {
+            'customer_name': "Sara", 'email': "sara@example.com", 'phone': "555",
+            'total_price': "4.50", 'pickup_datetime': (pickup or self.pickup).isoformat(),
+            'items': [{'product': self.bread.id, 'quantity': 1, 'price': "4.50"}],
+        }
+        return self.client.post('/api/orders/', payload, format='json')
+
+    def slot(self):
+        return PickupSlot.objects.get(date=self.pickup.date(), start=time(12, 0), product_class='regular')
+
+    def test_full_window_is_rejected(self):
+        self.assertEqual(self.place().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.place().status_code, status.HTTP_201_CREATED)
+        response = self.place()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('pickup_datetime', response.json())
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(self.slot().booked, 2)
+
+    def test_outside_hours_is_rejected(self):
+        response = self.place(next_weekday(1, hour=22))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cancelling_frees_the_window(self):
+        order_id = self.place().json()['id']
+        self.place()
+        self.client.patch(f'/api/orders/{order_id}/', {'status': 'Cancelled'}, format='json')
+        self.assertEqual(self.slot().booked, 1)
+        self.assertEqual(self.place().status_code, status.HTTP_201_CREATED)
+
+    def test_rescheduling_moves_the_booking(self):
+        order_id = self.place().json()['id']
+        later = self.pickup + timedelta(hours=2)
+        self.client.patch(f'/api/orders/{order_id}/', {'pickup_datetime': later.isoformat()}, format='json')
+        self.assertEqual(self.slot().booked, 0)
+        self.assertEqual(Order.objects.get(pk=order_id).pickup_slot.start, time(14, 0))
+
+    def test_pickup_slots_endpoint(self):
+        self.place()
+        self.place()
+        response = self.client.get(f'/api/pickup-slots/?date={self.pickup.date().isoformat()}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        noon = next(s for s in response.json() if s['start'] == '12:00')
+        self.assertEqual(noon['remaining'], 0)
+        self.assertFalse(noon['available'])
+        self.assertEqual(len(response.json()), len(scheduling.slot_starts(self.pickup.date())))
+
+    def test_pickup_slots_requires_date(self):
+        self.assertEqual(self.client.get('/api/pickup-slots/').status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,137 @@
+import io
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from api import leases, square
+from api.models import Category, Product, Order, OrderItem, SyncCursor
+from .square_stub import SquareStub
+
+
+class SquareSyncTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.stub = SquareStub(page_size=2).__enter__()
+        self.addCleanup(self.stub.__exit__)
+        config = dict(settings.SQUARE, BASE_URL=self.stub.url, ACCESS_TOKEN='test-token', LOCATION_ID='LOC1')
+        overrides = override_settings(SQUARE=config)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.sleeps = []
+        self.client_ = square.SquareClient(sleep=self.sleeps.append)
+        self.addCleanup(self.client_.close)
+
+        self.stub.put_category('CAT1', "Cakes")
+        self.stub.put_item('ITEM1', "Rose Cake", 4000, 'CAT1', "Layers")
+        self.stub.put_item('ITEM2', "Tea Bread", 650)
+        self.stub.put_item('ITEM3', "Saffron Roll", 375, 'CAT1')
+
+    def test_full_then_incremental_pull(self):
+        result = square.pull_catalog(self.client_)
+        self.assertEqual(result['created'], 3)
+        # Three items at two per page
+        self.assertEqual(result['calls'], 2)
+        cake = Product.objects.get(square_id='ITEM1')
+        self.assertEqual((cake.name, str(cake.price), cake.category.name), ("Rose Cake", '40.00', "Cakes"))
+        self.assertEqual(Product.objects.get(square_id='ITEM2').category.name, square.UNCATEGORIZED)
+
+        # Local flags and slug survive a Square-side change
+        Product.objects.filter(square_id='ITEM1').update(is_featured=True, slug='signature-rose-cake')
+        self.stub.put_item('ITEM1', "Rose Cake", 4200, 'CAT1', "Layers")
+        self.stub.requests.clear()
+        cursor = SyncCursor.objects.get(name=square.CATALOG_CURSOR).value
+        result = square.pull_catalog(self.client_)
+        self.assertEqual((result['created'], result['updated'], result['unchanged']), (0, 1, 0))
+        self.assertEqual(self.stub.requests[0][1]['begin_time'], cursor)
+        cake.refresh_from_db()
+        self.assertEqual((str(cake.price), cake.slug, cake.is_featured), ('42.00', 'signature-rose-cake', True))
+
+        # Nothing changed: one call and no writes
+        result = square.pull_catalog(self.client_)
+        self.assertEqual((result['calls'], result['created'], result['updated']), (1, 0, 0))
+
+    def test_deleted_items_are_reported_not_removed(self):
+        square.pull_catalog(self.client_)
+        self.stub.delete('ITEM2')
+        with self.assertLogs('api.square', 'WARNING'):
+            result = square.pull_catalog(self.client_)
+        self.assertEqual(result['deleted'], 1)
+        self.assertTrue(Product.objects.filter(square_id='ITEM2').exists())
+
+    def test_first_sync_links_local_products_by_slug(self):
+        local = Product.objects.create(
+            category=Category.objects.create(name="Bread"), name="Tea Bread", price=5, description="Ours",
+            unit='kg', is_featured=True,
+        )
+        result = square.pull_catalog(self.client_)
+        self.assertEqual((result['created'], result['updated']), (2, 1))
+        local.refresh_from_db()
+        self.assertEqual((local.square_id, local.slug, str(local.price)), ('ITEM2', 'tea-bread', '6.50'))
+        self.assertEqual((local.unit, local.is_featured, local.description), ('kg', True, "Ours"))
+        self.assertEqual(Product.objects.filter(name="Tea Bread").count(), 1)
+
+    def test_slug_held_by_another_square_item_gets_suffix(self):
+        Product.objects.create(
+            category=Category.objects.create(name="Bread"), name="Tea Bread", price=5, description="", square_id='OLD1',
+        )
+        self.stub.put_item('ITEM4', "Tea Bread", 700)
+        square.pull_catalog(self.client_)
+        self.assertEqual(Product.objects.get(square_id='OLD1').slug, 'tea-bread')
+        suffixed = set(Product.objects.filter(square_id__in=['ITEM2', 'ITEM4']).values_list('slug', flat=True))
+        self.assertEqual(suffixed, {'tea-bread-item2', 'tea-bread-item4'})
+
+    def test_retries_with_backoff_on_one_connection(self):
+        self.stub.fail_next = [503, 429]
+        square.pull_catalog(self.client_)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertLess(self.sleeps[0], self.sleeps[1] + 1)
+        # Every call, retries included, went over the same kept-alive socket
+        self.assertEqual(self.stub.connections, 1)
+        self.assertEqual(len(self.stub.requests), 4)
+
+    def test_gives_up_after_max_retries(self):
+        self.stub.fail_next = [503] * 10
+        with self.assertRaises(square.SquareError) as ctx:
+            square.pull_catalog(self.client_)
+        self.assertEqual(ctx.exception.status, 503)
+        self.assertEqual(len(self.sleeps), settings.SQUARE['MAX_RETRIES'])
+        self.assertFalse(SyncCursor.objects.exists())
+
+    def test_client_errors_are_not_retried(self):
+        client = square.SquareClient({'ACCESS_TOKEN': 'wrong'}, sleep=self.sleeps.append)
+        with self.assertRaisesMessage(square.SquareError, "bad token"):
+            client.request('POST', '/v2/catalog/search', {})
+        client.close()
+        self.assertEqual(self.sleeps, [])
+
+    def test_push_paid_orders_once(self):
+        square.pull_catalog(self.client_)
+        cake = Product.objects.get(square_id='ITEM1')
+        pickup = timezone.now() + timedelta(days=1)
+        orders = {}
+        for status in ('Paid', 'Pending', 'Collected'):
+            orders[status] = Order.objects.create(
+                customer_name="Ana", email="a@example.com", phone="555", total_price='40.00', status=status,
+                pickup_datetime=pickup,
+            )
+            OrderItem.objects.create(order=orders[status], product=cake, quantity=2, price='40.00', flavor='Rose')
+
+        self.assertEqual(square.push_orders(self.client_), {'pushed': 2, 'failed': 0})
+        self.assertIsNone(Order.objects.get(pk=orders['Pending'].pk).square_order_id)
+        pushed = self.stub.orders[f"natalie-order-{orders['Paid'].pk}"]
+        self.assertEqual(Order.objects.get(pk=orders['Paid'].pk).square_order_id, pushed['id'])
+        line = pushed['line_items'][0]
+        self.assertEqual((line['quantity'], line['base_price_money']['amount'], line['note']), ('2', 4000, 'Rose'))
+        self.assertEqual(pushed['location_id'], 'LOC1')
+
+        self.assertEqual(square.push_orders(self.client_), {'pushed': 0, 'failed': 0})
+
+    def test_command_and_lock(self):
+        out = io.StringIO()
+        call_command('square_sync', stdout=out)
+        self.assertIn("catalog: 3 created", out.getvalue())
+        leases.acquire(square.LOCK_KEY, 60)
+        call_command('square_sync', stdout=out)
+        self.assertIn("Another sync is running", out.getvalue())
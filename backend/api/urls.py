@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, ProductViewSet, CakeOptionViewSet, OrderViewSet, SiteContentView, UIAssetViewSet
+from .views import CategoryViewSet, ProductViewSet, CakeOptionViewSet, OrderViewSet, SiteContentView, UIAssetViewSet, QuoteView, PickupSlotView, ProductionPlanView, RequestMetricsView, CatalogView
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet)
@@ -11,5 +11,10 @@ router.register(r'ui-assets', UIAssetViewSet)
 
 urlpatterns = [
     path('site-content/', SiteContentView.as_view(), name='site-content'),
+    path('catalog/', CatalogView.as_view(), name='catalog'),
+    path('quote/', QuoteView.as_view(), name='quote'),
+    path('pickup-slots/', PickupSlotView.as_view(), name='pickup-slots'),
+    path('production-plan/', ProductionPlanView.as_view(), name='production-plan'),
+    path('metrics/requests/', RequestMetricsView.as_view(), name='request-metrics'),
     path('', include(router.urls)),
 ]
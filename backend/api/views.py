@@ -1,41 +1,219 @@
-from rest_framework import viewsets, filters, permissions
+from rest_framework import viewsets, filters, permissions, serializers
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Category, Product, CakeOption, Order, SiteContent, UIAsset
+from django.db.models import Prefetch
+from .models import Category, Product, CakeOption, DailyStock, Order, PickupSlot, SiteContent, UIAsset
 from .serializers import (CategorySerializer, ProductSerializer, CakeOptionSerializer, 
-                          OrderSerializer, SiteContentSerializer, UIAssetSerializer)
+                          OrderSerializer, SiteContentSerializer, UIAssetSerializer,
+                          QuoteSerializer, QuoteLineSerializer, PickupSlotAvailabilitySerializer,
+                          LeanProductSerializer)
+from rest_framework import status
 from rest_framework.response import Response
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
 from rest_framework.views import APIView
+from .cache import SITE_CONTENT_CACHE, cached_payload
+from .conditional import ConditionalGetMixin
+from .fieldsets import SparseFieldsetMixin, image_sources
+from .idempotency import IdempotentCreateMixin
+from .pricing import PricingError, get_price_table
+from .search import ProductSearchFilter, RankedOrderingFilter
+from . import catalog, instrumentation, inventory, production, scheduling
+from datetime import date
+from django.utils import timezone
+from django.conf import settings
+import os
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    change_tokens = (Category,)
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
 
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Product.objects.all()
+class ProductViewSet(SparseFieldsetMixin, ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    # category_name, the nested options and the remaining batch are part of every product body
+    change_tokens = (Product, Category, CakeOption, DailyStock)
+    # Join the category and batch-load options so list and detail run a fixed number of queries
+    queryset = Product.objects.select_related('category').prefetch_related(
+        Prefetch('available_options', queryset=CakeOption.objects.order_by('id'))
+    )
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, RankedOrderingFilter]
     filterset_fields = ['category__slug', 'is_custom_cake', 'is_featured']
-    search_fields = ['name', 'description']
+    search_fields = ['name', 'description'] # Only used on databases without a full-text backend
     ordering_fields = ['created_at', 'price']
     ordering = ['-created_at'] # Default to newest first
     lookup_field = 'slug'
+    # ?fields= / ?omit= only join or prefetch what the selected fields read
+    sparse_sources = {
+        'category_name': {'only': ('category__name',), 'select_related': ('category',)},
+        'available_options': {'prefetch': (Prefetch('available_options', queryset=CakeOption.objects.order_by('id')),)},
+        'available_quantity': {},
+        **image_sources(('image',)),
+    }
 
-class CakeOptionViewSet(viewsets.ReadOnlyModelViewSet):
+    def get_pickup_date(self):
+        """The ?pickup_date=YYYY-MM-DD that available_quantity is counted for, today by default."""
+        value = self.request.query_params.get('pickup_date')
+        if not value:
+            return timezone.localdate()
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise serializers.ValidationError({'pickup_date': ['Provide a date as YYYY-MM-DD.']})
+
+    def get_variant(self, request):
+        # The default pickup day rolls over at midnight without any write
+        return [self.get_pickup_date().isoformat()]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        selection = self.get_field_selection()
+        if selection is None or 'available_quantity' in selection:
+            queryset = inventory.with_availability(queryset, self.get_pickup_date())
+        return queryset
+
+    # FAST_JSON serves the same bytes from .values() rows via LeanProductSerializer
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if settings.FAST_JSON:
+            queryset = LeanProductSerializer.rows(queryset, self.get_field_selection())
+        return queryset
+
+    def get_serializer_class(self):
+        return LeanProductSerializer if settings.FAST_JSON else ProductSerializer
+
+class CakeOptionViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    change_tokens = (CakeOption,)
     queryset = CakeOption.objects.all()
     serializer_class = CakeOptionSerializer
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all()
+class OrderViewSet(IdempotentCreateMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Order.objects.prefetch_related('items')
     serializer_class = OrderSerializer
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ['created_at', 'pickup_datetime']
+    ordering = ['-created_at']
+    sparse_sources = {'items': {'prefetch': ('items',)}}
     # In a real app, you might restrict this to authenticated users or specific order tracking
 
-class SiteContentView(APIView):
+class QuoteView(APIView):
+    """Prices a whole bag in one call using the server-side price table."""
+    def post(self, request):
+        serializer = QuoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            lines, total = get_price_table().quote(serializer.validated_data['items'])
+        except PricingError as e:
+            return Response({'items': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'items': QuoteLineSerializer(lines, many=True).data,
+            'total': f'{total:.2f}',
+        })
+
+class PickupSlotView(APIView):
+    """Remaining capacity of each pickup window on ?date=YYYY-MM-DD (optionally &product_class=custom_cake)."""
     def get(self, request):
-        config = SiteContent.load()
-        serializer = SiteContentSerializer(config, context={'request': request})
-        return Response(serializer.data)
+        try:
+            day = date.fromisoformat(request.query_params.get('date', ''))
+        except ValueError:
+            return Response({'date': ['Provide a date as YYYY-MM-DD.']}, status=status.HTTP_400_BAD_REQUEST)
+        product_class = request.query_params.get('product_class', 'regular')
+        if product_class not in dict(PickupSlot.PRODUCT_CLASSES):
+            return Response({'product_class': ['Unknown product class.']}, status=status.HTTP_400_BAD_REQUEST)
+        slots = scheduling.availability(day, product_class)
+        return Response(PickupSlotAvailabilitySerializer(slots, many=True).data)
+
+class ProductionPlanView(APIView):
+    """What the kitchen must make for pickups on ?date=YYYY-MM-DD (default today), read from the production plan rollup."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        try:
+            day = date.fromisoformat(request.query_params['date']) if request.query_params.get('date') else timezone.localdate()
+        except ValueError:
+            return Response({'date': ['Provide a date as YYYY-MM-DD.']}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'date': day, 'products': production.plan(day)})
+
+class CatalogView(ConditionalGetMixin, APIView):
+    """
+    The whole shop in one pre-built document: categories with their products,
+    and cake options once in a lookup table that products reference by id.
+    Warm requests copy stored bytes, gzip'd when the client accepts it.
+    """
+    change_tokens = (catalog.CATALOG_CACHE,)
+
+    def accepts_gzip(self, request):
+        return 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+
+    def get_validators(self, request):
+        etag, last_modified = super().get_validators(request)
+        if self.accepts_gzip(request):
+            etag = etag[:-1] + '-gzip"'
+        return etag, last_modified
+
+    def get(self, request):
+        catalog.wait_for_refresh()
+        response = self.conditional_response(request, self.render_snapshot)
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    def render_snapshot(self, request):
+        snapshot = catalog.snapshot(request.build_absolute_uri)
+        if self.accepts_gzip(request):
+            response = HttpResponse(snapshot['gzip'], content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(snapshot['json'], content_type='application/json')
+        return response
+
+class RequestMetricsView(APIView):
+    """Per-route latency histograms from this worker process; DELETE clears them."""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            'enabled': settings.REQUEST_METRICS['ENABLED'],
+            'pid': os.getpid(),
+            'routes': instrumentation.snapshot(),
+        })
+
+    def delete(self, request):
+        instrumentation.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class SiteContentView(SparseFieldsetMixin, ConditionalGetMixin, APIView):
+    change_tokens = (SITE_CONTENT_CACHE,)
+    # Leaving out features or gallery_images skips their queries entirely
+    sparse_sources = {
+        'features': {},
+        'gallery_images': {},
+        **image_sources(('hero_main_image', 'about_side_image', 'about_side_image_2')),
+    }
+
+    def get_serializer_class(self):
+        return SiteContentSerializer
+
+    def get(self, request):
+        selection = self.get_field_selection()
+        return self.conditional_response(request, self.render_content, selection)
+
+    def render_content(self, request, selection):
+        def build():
+            if selection is None:
+                config = SiteContent.load()
+            else:
+                config = self.prune_queryset(SiteContent.objects.filter(pk=1), selection).first() or SiteContent.load()
+            context = {'request': request, 'field_selection': selection}
+            return SiteContentSerializer(config, context=context).data
+
+        # Image URLs are absolute, so each host gets its own cached copy
+        variant = request.build_absolute_uri('/')
+        if selection is not None:
+            variant = f'{variant}|{selection.key}'
+        payload = cached_payload(SITE_CONTENT_CACHE, variant, build)
+        return Response(payload)
 
-class UIAssetViewSet(viewsets.ReadOnlyModelViewSet):
+class UIAssetViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    change_tokens = (UIAsset,)
     queryset = UIAsset.objects.all()
     serializer_class = UIAssetSerializer
     lookup_field = 'key'
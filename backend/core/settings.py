@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -24,6 +25,15 @@ BAKERY_METADATA = {
     }
 }
 
+# Pickup windows are cut from BAKERY_METADATA['HOURS']; capacity is orders per window
+PICKUP_SLOTS = {
+    'INTERVAL_MINUTES': 15,
+    'CAPACITY': {
+        'regular': 8,
+        'custom_cake': 2,
+    },
+}
+
 
 INSTALLED_APPS = [
     'jazzmin',
@@ -61,6 +71,7 @@ JAZZMIN_SETTINGS = {
         "api.Product": "fas fa-birthday-cake",
         "api.CakeOption": "fas fa-cogs",
         "api.Order": "fas fa-shopping-cart",
+        "api.DailySales": "fas fa-chart-line",
         "api.SiteContent": "fas fa-globe",
         "api.UIAsset": "fas fa-image",
     },
@@ -100,6 +111,7 @@ JAZZMIN_UI_TWEAKS = {
 }
 
 MIDDLEWARE = [
+    'api.instrumentation.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -147,6 +159,130 @@ if os.getenv('DB_NAME'):
         'PORT': os.getenv('DB_PORT', '5432'),
     }
 
+# The cache holds the version numbers that ETags, cached payloads and the
+# catalog snapshot are keyed on, so every process that writes (web workers,
+# run_worker, import_catalog, square_sync) should share it. Point REDIS_URL
+# at a Redis server, or CACHE_DIR at a directory for a single-host setup.
+# The in-process default only suits a single process; `manage.py check
+# --deploy` warns about it (api.W001).
+CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'natalie-bakery',
+}}
+if os.getenv('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL'),
+    }
+elif os.getenv('CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR'),
+    }
+
+# Minimum pg_trgm word similarity for product search to accept a misspelt term
+PRODUCT_SEARCH_SIMILARITY = float(os.getenv('PRODUCT_SEARCH_SIMILARITY', 0.3))
+# Upper bound on ranked matches the SQLite FTS5 backend hands back per search
+PRODUCT_SEARCH_MAX_RESULTS = int(os.getenv('PRODUCT_SEARCH_MAX_RESULTS', 500))
+
+# Responsive copies rendered next to every uploaded image (see api.images).
+# Add 'avif' to FORMATS on a Pillow build with AVIF support.
+IMAGE_DERIVATIVES = {
+    'WIDTHS': (160, 320, 640, 1024, 1600),
+    'FORMATS': ('webp', 'jpeg'),
+    'QUALITY': 80,
+    # Longest side, in pixels, of the inline blur placeholder
+    'PLACEHOLDER_WIDTH': 16,
+    # Render synchronously on save; turn off to leave it to generate_image_derivatives
+    'ON_UPLOAD': os.getenv('IMAGE_DERIVATIVES_ON_UPLOAD', 'True') == 'True',
+}
+
+# Seconds a cached API payload may live; entries are also invalidated by version bumps
+API_CACHE_TIMEOUT = int(os.getenv('API_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# Per-request query counts and timings (Server-Timing header, JSON logs on
+# 'api.requests', histograms at /api/metrics/requests/). Off by default.
+REQUEST_METRICS = {
+    'ENABLED': os.getenv('REQUEST_METRICS', 'False') == 'True',
+    'SERVER_TIMING': os.getenv('REQUEST_METRICS_SERVER_TIMING', 'True') == 'True',
+    'SLOW_REQUEST_MS': float(os.getenv('SLOW_REQUEST_MS', 500)),
+    'SLOW_QUERY_MS': float(os.getenv('SLOW_QUERY_MS', 100)),
+    # Project frames kept in the call stack of each slow query
+    'STACK_DEPTH': 8,
+}
+
+# Square catalog pull and order push (see api.square and the square_sync command).
+# Point BASE_URL at a local stub in development; tests run against one.
+SQUARE = {
+    'BASE_URL': os.getenv('SQUARE_BASE_URL', 'https://connect.squareupsandbox.com'),
+    'ACCESS_TOKEN': os.getenv('SQUARE_ACCESS_TOKEN', ''),
+    'API_VERSION': os.getenv('SQUARE_API_VERSION', '2024-10-17'),
+    'LOCATION_ID': os.getenv('SQUARE_LOCATION_ID', ''),
+    'CURRENCY': os.getenv('SQUARE_CURRENCY', 'CAD'),
+    'TIMEOUT': float(os.getenv('SQUARE_TIMEOUT', 10)),
+    # Attempts after the first on connection errors, 429 and 5xx, with exponential backoff
+    'MAX_RETRIES': int(os.getenv('SQUARE_MAX_RETRIES', 4)),
+    'BACKOFF_SECONDS': 0.5,
+    'BACKOFF_MAX_SECONDS': 30,
+    # Upper bound on orders pushed per run, so one sync stays short
+    'ORDERS_PER_RUN': int(os.getenv('SQUARE_ORDERS_PER_RUN', 200)),
+}
+
+# Background jobs on the main database (see api.jobs and the run_worker command)
+JOBS = {
+    # Idle wait between polls for new jobs
+    'POLL_SECONDS': float(os.getenv('JOBS_POLL_SECONDS', 1)),
+    # Workers renew a running job's lease every third of this; one not renewed for this long
+    # (its worker crashed or was killed) is handed to another worker
+    'LEASE_SECONDS': int(os.getenv('JOBS_LEASE_SECONDS', 300)),
+    # Retries wait BACKOFF_SECONDS * 2 ** (attempt - 1), with jitter, up to BACKOFF_MAX_SECONDS
+    'BACKOFF_SECONDS': 5,
+    'BACKOFF_MAX_SECONDS': 60 * 60,
+    'MAX_ATTEMPTS': int(os.getenv('JOBS_MAX_ATTEMPTS', 5)),
+    'KEEP_DONE_DAYS': 7,
+}
+
+# Order submissions carrying an Idempotency-Key header (see api.idempotency)
+IDEMPOTENCY = {
+    # Retries within this long of the first request get its response back
+    'TTL_SECONDS': int(os.getenv('IDEMPOTENCY_TTL_SECONDS', 24 * 60 * 60)),
+    # A key still unanswered after this long is treated as abandoned by a crashed request
+    'LOCK_SECONDS': 60,
+}
+
+# Sales rollups behind the admin dashboard (see api.analytics)
+ANALYTICS = {
+    # New orders trigger at most one refresh per window, run at the window's end
+    'REFRESH_SECONDS': int(os.getenv('ANALYTICS_REFRESH_SECONDS', 300)),
+    # Orders created this recently may still be uncommitted, so the watermark stays behind them
+    'SETTLE_SECONDS': 60,
+}
+
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', f"{BAKERY_METADATA['NAME']} <orders@nataliebakery.ca>")
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'requests': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+        # Swap for a handler that feeds the kitchen printer
+        'kitchen': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'api.requests': {'handlers': ['requests'], 'level': 'INFO', 'propagate': False},
+        'api.kitchen': {'handlers': ['kitchen'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -167,9 +303,21 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True # In production, restrict this to the frontend URL
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
+    # Lists stay unpaginated unless the client sends ?limit= or ?cursor=
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CatalogPagination',
 }
+
+# High-throughput mode for read-heavy endpoints: orjson rendering and
+# .values()-based product serialization. Output is byte-identical either way.
+FAST_JSON = os.getenv('FAST_JSON', 'False') == 'True'
+if FAST_JSON:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] = [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ]
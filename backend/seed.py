@@ -1,99 +1,128 @@
 import os
+import random
+from datetime import timedelta
+from decimal import Decimal
 import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
-from api.models import Category, Product, CakeOption
+from django.utils import timezone
+from api import production
+from api.imports import import_catalog
+from api.models import Category, Product, CakeOption, Order, OrderItem
+
+SEED_OPTIONS = [
+    ('FLAVOR', 'Cardamom & Rose'),
+    ('FLAVOR', 'Saffron Vanilla'),
+    ('FLAVOR', 'Pistachio Dream'),
+    ('FILLING', 'Apricot Jam'),
+    ('FILLING', 'Honey Buttercream'),
+    ('FILLING', 'Pomegranate Reduction'),
+    ('SIZE', 'Regular'),
+    ('SIZE', '6" Small (Serves 8-10)'),
+    ('SIZE', '10" Large (Serves 25-30)'),
+]
+
+# All items get the 'Regular' size; the custom cake offers every option
+SEED_PRODUCTS = [
+    {
+        'name': 'Saffron & Rosewater Baklava', 'category': 'Pastries', 'price': '24.03', 'unit': 'kg',
+        'description': 'Luxurious layers of phyllo with premium pistachios and saffron syrup.',
+        'is_featured': True, 'options': ['SIZE:Regular'],
+    },
+    {
+        'name': 'Signature Custom Celebration Cake', 'category': 'Cakes', 'price': '85.00', 'unit': 'ea',
+        'description': 'A masterpiece tailored to your celebration. Select your flavor and filling.',
+        'is_custom_cake': True, 'is_featured': True, 'options': [f'{t}:{n}' for t, n in SEED_OPTIONS],
+    },
+    {
+        'name': 'Barbari Bread', 'category': 'Bread', 'price': '4.50', 'unit': 'ea',
+        'description': 'Traditional Persian flatbread, topped with sesame seeds.',
+        'options': ['SIZE:Regular'],
+    },
+    {
+        'name': 'Assorted Persian Cookies', 'category': 'Pastries', 'price': '18.00', 'unit': 'lb',
+        'description': 'A delicate selection of traditional chickpea, rice, and walnut cookies.',
+        'options': ['SIZE:Regular'],
+    },
+]
 
 def seed():
-    # Categories
-    pastries, _ = Category.objects.get_or_create(name='Pastries')
-    cakes, _ = Category.objects.get_or_create(name='Cakes')
-    bread, _ = Category.objects.get_or_create(name='Bread')
+    # Cleanup: Remove Medium if it exists
+    CakeOption.objects.filter(option_type='SIZE', name='8" Medium (Serves 15-20)').delete()
 
-    # Products
-    Product.objects.update_or_create(
-        name='Saffron & Rosewater Baklava',
-        defaults={
-            'category': pastries,
-            'price': 24.03,
-            'unit': 'kg',
-            'description': 'Luxurious layers of phyllo with premium pistachios and saffron syrup.',
-            'is_custom_cake': False,
-            'is_featured': True
-        }
+    existing = set(CakeOption.objects.values_list('option_type', 'name'))
+    CakeOption.objects.bulk_create(
+        [CakeOption(option_type=t, name=n) for t, n in SEED_OPTIONS if (t, n) not in existing]
     )
+    import_catalog(SEED_PRODUCTS)
 
-    Product.objects.update_or_create(
-        name='Signature Custom Celebration Cake',
-        defaults={
-            'category': cakes,
-            'price': 85.00,
-            'unit': 'ea',
-            'description': 'A masterpiece tailored to your celebration. Select your flavor and filling.',
-            'is_custom_cake': True,
-            'is_featured': True
-        }
-    )
+    print("Database seeded successfully!")
 
-    Product.objects.update_or_create(
-        name='Barbari Bread',
-        defaults={
-            'category': bread,
-            'price': 4.50,
-            'unit': 'ea',
-            'description': 'Traditional Persian flatbread, topped with sesame seeds.',
-        }
-    )
+def seed_scale(categories=10, products=1000, options=30, orders=1000, items_per_order=3, seed_value=42):
+    """
+    Bulk-generate a synthetic catalog of the given size for benchmarks and
+    load tests. The same arguments always produce the same rows.
+    """
+    rng = random.Random(seed_value)
+    option_types = [t for t, _ in CakeOption.OPTION_TYPES]
 
-    Product.objects.update_or_create(
-        name='Assorted Persian Cookies',
-        defaults={
-            'category': pastries,
-            'price': 18.00,
-            'unit': 'lb',
-            'description': 'A delicate selection of traditional chickpea, rice, and walnut cookies.',
-        }
+    cats = Category.objects.bulk_create(
+        [Category(name=f"Category {i}", slug=f"bench-category-{i}") for i in range(categories)]
+    )
+    opts = CakeOption.objects.bulk_create([
+        CakeOption(option_type=option_types[i % len(option_types)], name=f"Option {i}", price_modifier=rng.randint(0, 20))
+        for i in range(options)
+    ])
+    prods = Product.objects.bulk_create(
+        [
+            Product(
+                category=cats[i % categories], name=f"Bench Product {i}", slug=f"bench-product-{i}",
+                description=f"Synthetic product {i} with saffron, rosewater and pistachio.",
+                price=Decimal(rng.randint(200, 9000)) / 100, unit=rng.choice(['ea', 'kg', 'lb']),
+                is_custom_cake=i % 10 == 0, is_featured=i % 25 == 0,
+            )
+            for i in range(products)
+        ],
+        batch_size=1000,
     )
 
-    # Cake Options
-    options = [
-        ('FLAVOR', 'Cardamom & Rose'),
-        ('FLAVOR', 'Saffron Vanilla'),
-        ('FLAVOR', 'Pistachio Dream'),
-        ('FILLING', 'Apricot Jam'),
-        ('FILLING', 'Honey Buttercream'),
-        ('FILLING', 'Pomegranate Reduction'),
-        ('SIZE', 'Regular'),
-        ('SIZE', '6" Small (Serves 8-10)'),
-        ('SIZE', '10" Large (Serves 25-30)'),
-    ]
-
-    # Cleanup: Remove Medium if it exists
-    CakeOption.objects.filter(option_type='SIZE', name='8" Medium (Serves 15-20)').delete()
+    # Custom cakes offer one option of each type; everything else a single size
+    through = Product.available_options.through
+    links = []
+    for product in prods:
+        chosen = rng.sample(opts, min(len(option_types), len(opts))) if product.is_custom_cake else opts[:1]
+        links.extend(through(product_id=product.id, cakeoption_id=opt.id) for opt in chosen)
+    through.objects.bulk_create(links, batch_size=1000, ignore_conflicts=True)
 
-    created_options = []
-    regular_opt = None
-    for opt_type, name in options:
-        opt, _ = CakeOption.objects.get_or_create(option_type=opt_type, name=name)
-        created_options.append(opt)
-        if name == 'Regular':
-            regular_opt = opt
+    now = timezone.now()
+    statuses = [s for s, _ in Order.STATUS_CHOICES]
+    baskets = [rng.sample(prods, min(items_per_order, len(prods))) for _ in range(orders)]
+    created_orders = Order.objects.bulk_create(
+        [
+            Order(
+                customer_name=f"Customer {i}", email=f"customer{i}@example.com", phone="555-0100",
+                total_price=sum(p.price for p in basket), status=rng.choice(statuses),
+                pickup_datetime=now + timedelta(hours=rng.randint(-2000, 2000)),
+            )
+            for i, basket in enumerate(baskets)
+        ],
+        batch_size=1000,
+    )
+    OrderItem.objects.bulk_create(
+        [
+            OrderItem(order=order, product=product, quantity=1, price=product.price)
+            for order, basket in zip(created_orders, baskets)
+            for product in basket
+        ],
+        batch_size=1000,
+    )
+    # bulk_create skips the signals that keep the plan in step
+    production.rebuild()
 
-    # Link options to products
-    all_products = Product.objects.all()
-    sig_cake = Product.objects.filter(name='Signature Custom Celebration Cake').first()
-    
-    for product in all_products:
-        if product == sig_cake:
-            product.available_options.set(created_options)
-        else:
-            # All other items get 'Regular' size by default
-            if regular_opt:
-                product.available_options.add(regular_opt)
+    print(f"Seeded {categories} categories, {products} products, {options} options and {orders} orders.")
 
-    print("Database seeded successfully!")
 
 if __name__ == "__main__":
     seed()
@@ -1,6 +1,7 @@
 "use client";
-import { useState } from "react";
+import { useState, useEffect } from "react";
 import { useCartStore } from "@/store/useCartStore";
+import { getQuote } from "@/utils/api";
 import Link from "next/link";
 import { Trash2, ShoppingBag, ArrowRight, X } from "lucide-react";
 
@@ -10,6 +11,17 @@ export default function Cart() {
   const { items, removeItem, updateQuantity, getTotalPrice, clearCart } = useCartStore();
   const [itemToConfirmRemove, setItemToConfirmRemove] = useState<any>(null);
   const [isClearingAll, setIsClearingAll] = useState(false);
+  const [serverTotal, setServerTotal] = useState<number | null>(null);
+
+  // The server is the source of truth for prices; fall back to the local sum if it is unreachable
+  useEffect(() => {
+    if (items.length === 0) return;
+    getQuote(items)
+      .then((quote) => setServerTotal(parseFloat(quote.total)))
+      .catch(() => setServerTotal(null));
+  }, [items]);
+
+  const total = serverTotal ?? getTotalPrice();
 
   const handleDecreaseQuantity = (item: any) => {
     if (item.quantity === 1) {
@@ -128,7 +140,7 @@ export default function Cart() {
               <div className="space-y-4 mb-8">
                 <div className="flex justify-between text-charcoal/60">
                   <span>Subtotal</span>
-                  <span>${getTotalPrice().toFixed(2)}</span>
+                  <span>${total.toFixed(2)}</span>
                 </div>
                 <div className="flex justify-between text-charcoal/60">
                   <span>Estimated Shipping</span>
@@ -136,7 +148,7 @@ export default function Cart() {
                 </div>
                 <div className="flex justify-between text-xl font-bold border-t border-gold/10 pt-4 mt-4">
                   <span>Total</span>
-                  <span>${getTotalPrice().toFixed(2)}</span>
+                  <span>${total.toFixed(2)}</span>
                 </div>
               </div>
 
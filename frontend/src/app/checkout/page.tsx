@@ -1,5 +1,5 @@
 "use client";
-import { useState } from "react";
+import { useState, useEffect, useRef } from "react";
 import { useCartStore } from "@/store/useCartStore";
 import { fetchAPI } from "@/utils/api";
 import { useRouter } from "next/navigation";
@@ -22,10 +22,28 @@ export default function Checkout() {
   const [isLoading, setIsLoading] = useState(false);
   const [error, setError] = useState("");
   const [success, setSuccess] = useState(false);
+  // Resubmitting the same order reuses its Idempotency-Key, so a retry after a dropped response cannot place it twice
+  const submission = useRef<{ body: string; key: string } | null>(null);
 
   const hasCustomCake = items.some(item => item.isCustomCake);
   const minDate = hasCustomCake ? format(addDays(new Date(), 3), 'yyyy-MM-dd') : format(addDays(new Date(), 1), 'yyyy-MM-dd');
 
+  // Only offer pickup windows that still have room; null means the lookup failed, so keep the static list
+  const [slots, setSlots] = useState<any[] | null>(null);
+
+  useEffect(() => {
+    const productClass = hasCustomCake ? 'custom_cake' : 'regular';
+    fetchAPI(`/pickup-slots/?date=${formData.pickupDate}&product_class=${productClass}`, { cache: 'no-store' } as any)
+      .then((data) => {
+        const open = data.filter((slot: any) => slot.available);
+        setSlots(open);
+        if (open.length && !open.some((slot: any) => slot.start === formData.pickupTime)) {
+          setFormData((current) => ({ ...current, pickupTime: open[0].start }));
+        }
+      })
+      .catch(() => setSlots(null));
+  }, [formData.pickupDate, hasCustomCake]);
+
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     setIsLoading(true);
@@ -37,7 +55,7 @@ export default function Checkout() {
       customer_name: formData.name,
       email: formData.email,
       phone: formData.phone,
-      total_price: getTotalPrice(),
+      total_price: getTotalPrice().toFixed(2),
       pickup_datetime,
       items: items.map(item => ({
         product: item.id,
@@ -45,14 +63,23 @@ export default function Checkout() {
         flavor: item.flavor || null,
         filling: item.filling || null,
         size: item.size || null,
-        price: item.price
+        price: item.price.toFixed(2)
       }))
     };
 
+    const body = JSON.stringify(orderData);
+    if (submission.current?.body !== body) {
+      const key = typeof crypto.randomUUID === 'function'
+        ? crypto.randomUUID()
+        : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+      submission.current = { body, key };
+    }
+
     try {
       await fetchAPI('/orders/', {
         method: 'POST',
-        body: JSON.stringify(orderData)
+        headers: { 'Idempotency-Key': submission.current.key },
+        body
       });
       setSuccess(true);
       clearCart();
@@ -183,15 +210,27 @@ export default function Checkout() {
                   value={formData.pickupTime}
                   onChange={(e) => setFormData({...formData, pickupTime: e.target.value})}
                 >
-                  <option value="10:00">10:00 AM</option>
-                  <option value="11:00">11:00 AM</option>
-                  <option value="12:00">12:00 PM</option>
-                  <option value="13:00">01:00 PM</option>
-                  <option value="14:00">02:00 PM</option>
-                  <option value="15:00">03:00 PM</option>
-                  <option value="16:00">04:00 PM</option>
-                  <option value="17:00">05:00 PM</option>
-                  <option value="18:00">06:00 PM</option>
+                  {slots ? (
+                    slots.length ? slots.map((slot: any) => (
+                      <option key={slot.start} value={slot.start}>
+                        {format(new Date(`1970-01-01T${slot.start}`), 'hh:mm a')}
+                      </option>
+                    )) : (
+                      <option value="" disabled>No pickup times left on this day</option>
+                    )
+                  ) : (
+                    <>
+                      <option value="10:00">10:00 AM</option>
+                      <option value="11:00">11:00 AM</option>
+                      <option value="12:00">12:00 PM</option>
+                      <option value="13:00">01:00 PM</option>
+                      <option value="14:00">02:00 PM</option>
+                      <option value="15:00">03:00 PM</option>
+                      <option value="16:00">04:00 PM</option>
+                      <option value="17:00">05:00 PM</option>
+                      <option value="18:00">06:00 PM</option>
+                    </>
+                  )}
                 </select>
               </div>
             </div>
@@ -10,12 +10,19 @@ export default async function Home() {
   let recentProducts = [];
   let siteContent = null;
 
+  // Cards only need these, so the API skips descriptions and the options prefetch
+  const cardFields = 'fields=id,slug,name,price,unit,image,image_srcset,image_placeholder,category_name,created_at,is_custom_cake';
+
   try {
-    [featuredProducts, recentProducts, siteContent] = await Promise.all([
-      fetchAPI('/products/?is_featured=1&limit=12', { cache: 'no-store' } as any),
-      fetchAPI('/products/?ordering=-created_at&limit=8', { cache: 'no-store' } as any),
+    const [featuredPage, recentPage, content] = await Promise.all([
+      fetchAPI(`/products/?is_featured=1&limit=12&${cardFields}`, { cache: 'no-store' } as any),
+      fetchAPI(`/products/?ordering=-created_at&limit=8&${cardFields}`, { cache: 'no-store' } as any),
       getSiteContent()
     ]);
+    // Limited lists come back paginated as { count, next, previous, results }
+    featuredProducts = featuredPage.results;
+    recentProducts = recentPage.results;
+    siteContent = content;
   } catch (err) {
     console.error("Failed to fetch data for home page", err);
   }
@@ -6,6 +6,7 @@ import { useCartStore, generateCartId } from "@/store/useCartStore";
 import { Plus, Minus, CheckCircle, ShoppingBag } from "lucide-react";
 import { useRouter } from "next/navigation";
 import Link from "next/link";
+import ResponsiveImage from "@/components/ResponsiveImage";
 
 
 export default function ProductDetail({ params }: { params: { slug: string } }) {
@@ -209,8 +210,11 @@ export default function ProductDetail({ params }: { params: { slug: string } })
         <div className="grid md:grid-cols-2 gap-8 md:gap-16 items-start">
           {/* Image */}
           <div className="card p-0 overflow-hidden shadow-2xl mx-auto max-w-[85%] md:max-w-full">
-            <img 
+            <ResponsiveImage 
               src={product.image || 'https://images.unsplash.com/photo-1555507036-ab1f4038808a?auto=format&fit=crop&w=1200&q=80'} 
+              srcset={product.image_srcset}
+              placeholder={product.image_placeholder}
+              sizes="(min-width: 768px) 50vw, 85vw"
               alt={product.name}
               className="w-full h-auto object-cover aspect-square md:aspect-[4/5] lg:aspect-square"
             />
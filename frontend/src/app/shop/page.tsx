@@ -12,12 +12,16 @@ export default function Shop() {
   useEffect(() => {
     const loadData = async () => {
       try {
-        const [cats, prods] = await Promise.all([
-          fetchAPI('/categories/'),
-          fetchAPI('/products/')
-        ]);
-        setCategories(cats);
-        setProducts(prods);
+        // One pre-built snapshot: categories carry their products, options sit in a shared table
+        const catalog = await fetchAPI('/catalog/');
+        setCategories(catalog.categories);
+        setProducts(catalog.categories.flatMap((cat: any) =>
+          cat.products.map((product: any) => ({
+            ...product,
+            category_name: cat.name,
+            available_options: product.options.map((id: number) => catalog.options[id]),
+          }))
+        ));
       } catch (err) {
         console.error(err);
       } finally {
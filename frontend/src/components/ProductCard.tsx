@@ -1,5 +1,6 @@
 "use client";
 import Link from "next/link";
+import ResponsiveImage from "./ResponsiveImage";
 
 interface ProductCardProps {
   product: any;
@@ -15,8 +16,11 @@ export default function ProductCard({ product, variant = 'featured' }: ProductCa
       className={`group/card flex flex-col h-full ${!isRecent ? 'card items-center text-center' : ''}`}
     >
       <div className={`relative w-full overflow-hidden ${isRecent ? 'aspect-[4/5] mb-4 bg-cream' : 'aspect-square mb-6'}`}>
-        <img 
+        <ResponsiveImage 
           src={product.image || 'https://images.unsplash.com/photo-1555507036-ab1f4038808a?auto=format&fit=crop&w=800&q=80'} 
+          srcset={product.image_srcset}
+          placeholder={product.image_placeholder}
+          sizes="(min-width: 1024px) 25vw, (min-width: 640px) 50vw, 100vw"
           alt={product.name}
           className={`object-cover w-full h-full transition-transform duration-700 ${isRecent ? 'group-hover/card:scale-105' : 'group-hover/card:scale-110'}`}
         />
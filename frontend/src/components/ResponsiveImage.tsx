@@ -0,0 +1,26 @@
+type Srcset = { [format: string]: string } | null | undefined;
+
+interface ResponsiveImageProps {
+  src: string;
+  srcset?: Srcset;
+  sizes: string;
+  alt: string;
+  className?: string;
+  placeholder?: string | null;
+}
+
+// Serves the backend's pre-rendered widths: WebP where supported, JPEG otherwise
+export default function ResponsiveImage({ src, srcset, sizes, alt, className, placeholder }: ResponsiveImageProps) {
+  // The inlined blur shows through until the real image has loaded over it
+  const style = placeholder ? { backgroundImage: `url(${placeholder})`, backgroundSize: 'cover' } : undefined;
+  if (!srcset) {
+    return <img src={src} alt={alt} className={className} style={style} loading="lazy" />;
+  }
+  return (
+    <picture>
+      {srcset.avif && <source type="image/avif" srcSet={srcset.avif} sizes={sizes} />}
+      {srcset.webp && <source type="image/webp" srcSet={srcset.webp} sizes={sizes} />}
+      <img src={src} srcSet={srcset.jpeg} sizes={sizes} alt={alt} className={className} style={style} loading="lazy" />
+    </picture>
+  );
+}
@@ -39,3 +39,20 @@ export const getSiteContent = async () => {
         return null;
     }
 };
+
+// Prices the whole bag on the server in one call
+export const getQuote = async (items: any[]) => {
+    return await fetchAPI('/quote/', {
+        method: 'POST',
+        cache: 'no-store',
+        body: JSON.stringify({
+            items: items.map(item => ({
+                product: item.id,
+                quantity: item.quantity,
+                flavor: item.flavor || null,
+                filling: item.filling || null,
+                size: item.size || null,
+            }))
+        })
+    });
+};
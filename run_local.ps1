@@ -27,6 +27,11 @@ if (-not (Test-Path venv)) {
     & $pythonPath -m venv venv
 }
 
+# The web server and management commands should share one cache (see core/settings.py)
+if (-not $env:REDIS_URL -and -not $env:CACHE_DIR) {
+    $env:CACHE_DIR = Join-Path $env:TEMP "natalie-bakery-cache"
+}
+
 Write-Host "Installing Dependencies & Migrating..." -ForegroundColor Gray
 .\venv\Scripts\Activate.ps1
 python -m pip install -q -r requirements.txt